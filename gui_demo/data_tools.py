@@ -16,19 +16,29 @@ from PyQt5.QtMultimedia import QMediaPlayer, QMediaContent
 # Miscellaneous imports
 #
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 import time
 from functools import partial
 from os.path import curdir, exists, join, abspath
-import copy
+import glob
+import os
+import shutil
+import sqlite3
+import tempfile
+from bisect import bisect_left, bisect_right
 from serial.tools.list_ports import comports
+import numpy as np
 
 #
 # Submodules in this repository
 #
 from pymyolinux import MyoDongle
+from pymyolinux.session import LabelTimeline, SessionCatalog, SessionWriter, SpillList, find_sessions, read_session
+from pymyolinux.session import csv_io, ninapro, spill
 from movements import *
 from param import *
+from signal_processing import PreprocessingStage
 
 
 # Old backend:
@@ -69,86 +79,253 @@ class DataTools(QWidget):
             gyro_ch         = 3
             add_data_lock   = QMutex() # Access from multiple data workers
 
-            def __init__(self, sync_data, is_master):
+            def __init__(self, sync_data, is_master, new_column):
                 """
                 :param sync_data: A function that is called to synchronize data with other ArmbandData objects.
                 :param is_master: True/False -> True: All data will be synchronized with respect to this armband's
                                                             timestamps.
+                :param new_column: A function of (name, dtype), that creates an empty column (see
+                                    "MyoData.new_column")
                 """
                 self.sync_data  = sync_data
                 self.is_master  = is_master
-                self.timestamps = []
-                self.labels     = []
-                self.emg        = [[] for x in range(self.emg_ch)]
-                self.accel      = [[] for x in range(self.accel_ch)]
-                self.gyro       = [[] for x in range(self.gyro_ch)]
-                self.orient     = [[] for x in range(self.orient_ch)]
+                self.new_column = new_column
+                self.timestamps = None
+                self.clear()
 
             def clear(self):
-                self.timestamps.clear()
-                self.labels.clear()
-                self.emg    = [[] for x in range(self.emg_ch)]
-                self.accel  = [[] for x in range(self.accel_ch)]
-                self.gyro   = [[] for x in range(self.gyro_ch)]
-                self.orient = [[] for x in range(self.orient_ch)]
+                # Previous columns are released (in bounded memory mode, their spill files are removed once
+                # snapshots of them are no longer used)
+                if self.timestamps is not None:
+                    for column in ([self.timestamps, self.imu_index, self.imu_timestamps] + self.emg + self.accel +
+                                   self.gyro + self.orient):
+                        spill.close(column)
+
+                # EMG samples (200 Hz)
+                self.timestamps = self.new_column("time", np.float64)
+                self.emg        = [self.new_column("emg", np.int8) for x in range(self.emg_ch)]
+                # Per EMG sample: index of the latest IMU sample received (see "imu_at")
+                self.imu_index  = self.new_column("imu_index", np.int64)
+
+                # IMU samples (50 Hz), stored as received (without rescaling)
+                self.imu_timestamps = self.new_column("imu_time", np.float64)
+                self.accel          = [self.new_column("accel", np.int16) for x in range(self.accel_ch)]
+                self.gyro           = [self.new_column("gyro", np.int16) for x in range(self.gyro_ch)]
+                self.orient         = [self.new_column("orient", np.int16) for x in range(self.orient_ch)]
 
             def trim(self, trim_samples):
                 """
-                    Remove the last "trim_samples" for all data types.
+                    Remove the last "trim_samples" EMG samples, and any IMU samples received after them.
 
                 :param trim_samples: Number of samples to trim
                 """
                 n               = len(self.timestamps)
-                self.timestamps = self.timestamps[:n - trim_samples]
-                self.labels     = self.labels[:n - trim_samples]
-                self.emg        = [x[:n - trim_samples] for x in self.emg]
-                self.accel      = [x[:n - trim_samples] for x in self.accel]
-                self.gyro       = [x[:n - trim_samples] for x in self.gyro]
-                self.orient     = [x[:n - trim_samples] for x in self.orient]
-
-            def add_sample(self, time_received, current_label, emg_list, accel_1, accel_2, accel_3, gyro_1, gyro_2,
-                           gyro_3, orient_w, orient_x, orient_y, orient_z):
+                self.timestamps = spill.truncate(self.timestamps, n - trim_samples)
+                self.emg        = [spill.truncate(x, n - trim_samples) for x in self.emg]
+                self.imu_index  = spill.truncate(self.imu_index, n - trim_samples)
+
+                num_imu = 0 if len(self.imu_index) == 0 else self.imu_index[-1] + 1
+                self.imu_timestamps = spill.truncate(self.imu_timestamps, num_imu)
+                self.accel          = [spill.truncate(x, num_imu) for x in self.accel]
+                self.gyro           = [spill.truncate(x, num_imu) for x in self.gyro]
+                self.orient         = [spill.truncate(x, num_imu) for x in self.orient]
+
+            def add_sample(self, time_received, emg_list):
                 """
 
-                    Acquire a lock, add a new data sample and update synchronization mapping in "MyoData" object
+                    Acquire a lock, add a new EMG sample and update synchronization mapping in "MyoData" object
+
+                    > The EMG sample is joined to the latest IMU sample received, see "imu_at".
 
                 :param time_received: Data packet timestamp
-                :param current_label: Ground truth label (0-52)
                 :param emg_list: A list of 8 channel emg data
-                :param accel_1/2/3: Accelerometer data
-                :param gyro_1/2/3: Gyroscope data
-                :param orient_w/x/y/z: Magnetometer data
                 """
 
+                # IMU data can only be joined once the first IMU packet arrives
+                num_imu = len(self.imu_timestamps)
+                if num_imu == 0:
+                    return
+
                 self.add_data_lock.lock()
 
                 self.timestamps.append(time_received)
-                self.labels.append(current_label)
 
                 for i, emg_channel in enumerate(emg_list):
                     self.emg[i].append(emg_channel)
+                self.imu_index.append(num_imu - 1)
+
+                self.sync_data(self.is_master)
+
+                self.add_data_lock.unlock()
+
+            def add_imu_sample(self, time_received, accel_1, accel_2, accel_3, gyro_1, gyro_2, gyro_3, orient_w,
+                               orient_x, orient_y, orient_z):
+                """
+                    Add a new IMU sample (at the IMU's native rate). Rescaling is deferred until the data is read.
 
-                self.accel[0].append(accel_1 / MYOHW_ACCELEROMETER_SCALE)
-                self.accel[1].append(accel_2 / MYOHW_ACCELEROMETER_SCALE)
-                self.accel[2].append(accel_3 / MYOHW_ACCELEROMETER_SCALE)
+                :param time_received: Data packet timestamp
+                :param accel_1/2/3: Accelerometer data
+                :param gyro_1/2/3: Gyroscope data
+                :param orient_w/x/y/z: Magnetometer data
+                """
+                self.accel[0].append(accel_1)
+                self.accel[1].append(accel_2)
+                self.accel[2].append(accel_3)
 
-                self.gyro[0].append(gyro_1 / MYOHW_GYROSCOPE_SCALE)
-                self.gyro[1].append(gyro_2 / MYOHW_GYROSCOPE_SCALE)
-                self.gyro[2].append(gyro_3 / MYOHW_GYROSCOPE_SCALE)
+                self.gyro[0].append(gyro_1)
+                self.gyro[1].append(gyro_2)
+                self.gyro[2].append(gyro_3)
 
-                self.orient[0].append(orient_w / MYOHW_ORIENTATION_SCALE)
-                self.orient[1].append(orient_x / MYOHW_ORIENTATION_SCALE)
-                self.orient[2].append(orient_y / MYOHW_ORIENTATION_SCALE)
-                self.orient[3].append(orient_z / MYOHW_ORIENTATION_SCALE)
+                self.orient[0].append(orient_w)
+                self.orient[1].append(orient_x)
+                self.orient[2].append(orient_y)
+                self.orient[3].append(orient_z)
 
-                self.sync_data(self.is_master)
+                # Appended last, EMG samples are only joined to complete IMU samples
+                self.imu_timestamps.append(time_received)
 
+            def imu_at(self, index):
+                """
+                    A (lazily) joined view of IMU data, for a single EMG sample.
+
+                :param index: Index of an EMG sample
+                :return: (orient_list, accel_list, gyro_list) -> The latest IMU sample received prior to the EMG
+                            sample (with correct rescaling)
+                """
+                imu_idx     = self.imu_index[index]
+                orient_list = [x[imu_idx] / MYOHW_ORIENTATION_SCALE for x in self.orient]
+                accel_list  = [x[imu_idx] / MYOHW_ACCELEROMETER_SCALE for x in self.accel]
+                gyro_list   = [x[imu_idx] / MYOHW_GYROSCOPE_SCALE for x in self.gyro]
+                return orient_list, accel_list, gyro_list
+
+            def snapshot(self):
+                """
+                    Capture all data collected so far, to be converted to arrays by a background worker (see
+                        "snapshot_arrays").
+
+                    > Lists are only appended to, or replaced (see "trim"/"clear"), so captured data never changes.
+
+                :return: A tuple of (captured lists, number of EMG samples, number of IMU samples)
+                """
+                self.add_data_lock.lock()
+                num_samples     = len(self.imu_index)
+                lists           = (spill.frozen(self.timestamps), [spill.frozen(x) for x in self.emg],
+                                   spill.frozen(self.imu_index), spill.frozen(self.imu_timestamps),
+                                   [spill.frozen(x) for x in self.orient + self.accel + self.gyro])
                 self.add_data_lock.unlock()
 
+                num_imu_samples = lists[2][num_samples - 1] + 1 if num_samples > 0 else 0
+                return lists, num_samples, num_imu_samples
+
+            @staticmethod
+            def snapshot_arrays(snapshot):
+                """
+                :param snapshot: A tuple returned by "snapshot"
+                :return: [dict] -> "time" (N,), "emg" (N, 8), "imu_index" (N,), "imu_time" (M,), "imu" (M, 10) raw
+                            (see "pymyolinux.session.SessionWriter")
+                """
+                (timestamps, emg, imu_index, imu_timestamps, imu), num_samples, num_imu_samples = snapshot
+
+                return {
+                        "time":         spill.as_array(timestamps, num_samples, np.float64),
+                        "emg":          np.array([spill.as_array(x, num_samples, np.int8) for x in emg],
+                                                 dtype=np.int8).T.reshape(-1, 8),
+                        "imu_index":    spill.as_array(imu_index, num_samples, np.int64),
+                        "imu_time":     spill.as_array(imu_timestamps, num_imu_samples, np.float64),
+                        "imu":          np.array([spill.as_array(x, num_imu_samples, np.int16) for x in imu],
+                                                 dtype=np.int16).T.reshape(-1, 10)
+                    }
+
+            def load(self, time, emg, imu_index, imu_time, imu, **kwargs):
+                """
+                    Replace all data with data read from a session (see "pymyolinux.session.read_session").
+
+                :param time: EMG sample timestamps, shape (N,)
+                :param emg: EMG samples, shape (N, 8)
+                :param imu_index: Index of the (latest) IMU sample of each EMG sample, shape (N,)
+                :param imu_time: IMU sample timestamps, shape (M,)
+                :param imu: Raw IMU samples (OR_W/X/Y/Z, ACC_1/2/3, GYRO_1/2/3), shape (M, 10)
+                """
+                self.clear()
+                self.timestamps.extend(time.tolist())
+                for i, x in enumerate(self.emg):
+                    x.extend(emg[:, i].tolist())
+                self.imu_index.extend(imu_index.tolist())
+
+                self.imu_timestamps.extend(imu_time.tolist())
+                for i, x in enumerate(self.orient + self.accel + self.gyro):
+                    x.extend(imu[:, i].tolist())
+
+            def spill(self, keep_samples):
+                """
+                    Move all but the latest "keep_samples" EMG samples (and IMU samples received before them) from
+                        memory to disk (see "pymyolinux.session.SpillList"), data remains accessible by index.
+
+                :param keep_samples: Number of (latest) EMG samples kept in memory
+                """
+                num_samples = len(self.imu_index)
+                if num_samples <= keep_samples:
+                    return
+                keep_imu_samples = len(self.imu_timestamps) - self.imu_index[num_samples - keep_samples]
+
+                for x in [self.timestamps, self.imu_index] + self.emg:
+                    x.spill(keep_samples)
+                for x in [self.imu_timestamps] + self.orient + self.accel + self.gyro:
+                    x.spill(keep_imu_samples)
+
+            def index_at(self, time_point):
+                """
+                    Find the sample closest in time to "time_point" (timestamps are strictly increasing).
+
+                :param time_point: A timestamp, in the same time base as self.timestamps
+                :return: [int] Index of the closest sample (the earlier sample on ties), None if no data is available
+                """
+                num_samples = len(self.timestamps)
+                if num_samples == 0:
+                    return None
+
+                idx = bisect_left(self.timestamps, time_point, 0, num_samples)
+                if idx == 0:
+                    return 0
+                if idx == num_samples:
+                    return num_samples - 1
+
+                if abs(time_point - self.timestamps[idx - 1]) <= abs(self.timestamps[idx] - time_point):
+                    return idx - 1
+                return idx
+
+            def range_between(self, start_time, end_time):
+                """
+                    Find the range of samples received within a time window (timestamps are strictly increasing).
+
+                :param start_time: Samples must have a timestamp greater than this value
+                :param end_time: Samples must have a timestamp less than or equal to this value
+                :return: (start, end) -> Indices such that self.timestamps[start:end] lies within the time window
+                """
+                num_samples = len(self.timestamps)
+                start       = bisect_right(self.timestamps, start_time, 0, num_samples)
+                end         = bisect_right(self.timestamps, end_time, start, num_samples)
+                return start, end
+
+
+        def __init__(self, memory_window=None, spill_dir=None):
+            """
+            :param memory_window: Bounded memory mode, only (about) this many of the latest samples (per armband) are
+                                    kept in memory, older samples are spilled to "spill_dir" (None: all in memory)
+            :param spill_dir: An (existing) directory, for data spilled from memory
+            """
+            self.memory_window  = memory_window
+            self.spill_dir      = spill_dir
+            self.spill_samples  = SPILL_CHUNK_SAMPLES   # Data is spilled in chunks of (at least) this many samples
+            self.num_columns    = 0
 
-        def __init__(self):
-            self.band_1 = self.ArmbandData(sync_data=self.synchronize_data, is_master=True)
-            self.band_2 = self.ArmbandData(sync_data=self.synchronize_data, is_master=False)
+            self.band_1 = self.ArmbandData(sync_data=self.synchronize_data, is_master=True,
+                                           new_column=self.new_column)
+            self.band_2 = self.ArmbandData(sync_data=self.synchronize_data, is_master=False,
+                                           new_column=self.new_column)
+
+            # Ground truth label transitions (shared by both armbands, looked up by sample timestamp)
+            self.label_timeline = LabelTimeline()
 
             # Synchronization states (update mapping)
             self.first_timestamp    = None
@@ -158,7 +335,92 @@ class DataTools(QWidget):
 
             self.invalid_map    = -1
             self.first_sync     = True
-            self.data_mapping   = []
+            self.data_mapping   = self.new_column("mapping", np.int64)
+
+            # Number of band_1 samples with final mapping entries, waited on by consumers (see "wait_for_data")
+            self.num_synchronized   = 0
+            self.sync_condition     = threading.Condition()
+
+            # Synchronized EMG samples, and their rectified/filtered envelope (shared by all consumers)
+            self.preprocessed = PreprocessingStage(self, memory_window, PREPROCESS_BATCH_SAMPLES,
+                                                   PREPROCESS_MAX_DELAY)
+            self.preprocessed.start()
+
+        def new_column(self, name, dtype):
+            """
+            :param name: Name of the column
+            :param dtype: Data type of values (once spilled to disk)
+            :return: An empty column -> A list, or a SpillList (bounded memory mode)
+            """
+            if self.memory_window is None:
+                return []
+
+            self.num_columns += 1
+            return SpillList(join(self.spill_dir, "{:05d}_{}.bin".format(self.num_columns, name)), dtype)
+
+        def wait_for_data(self, num_samples, timeout):
+            """
+                Block until more than "num_samples" band_1 samples are synchronized (their mapping entries are final).
+
+            :param num_samples: Number of synchronized samples already processed by the caller
+            :param timeout: Maximum time to wait (seconds)
+            :return: [bool] True if new synchronized samples are available
+            """
+            with self.sync_condition:
+                return self.sync_condition.wait_for(lambda: self.num_synchronized > num_samples, timeout)
+
+        def notify_synchronized(self):
+            """
+                Wake up consumers waiting on new synchronized samples (mapping entries up to first_offset are final),
+                    including the preprocessing stage's thread.
+
+                > Called while holding "ArmbandData.add_data_lock", samples are preprocessed outside of it.
+            """
+            num_synchronized = self.first_offset + 1
+            if num_synchronized > self.num_synchronized:
+                with self.sync_condition:
+                    self.num_synchronized = num_synchronized
+                    self.sync_condition.notify_all()
+
+        def limit_memory(self, is_master):
+            """
+                In bounded memory mode, spill older data (of an armband) to disk, once enough data is collected.
+
+            :param is_master: Is this ArmbandData object the master? (i.e. band_1)
+            """
+            band = self.band_1 if is_master else self.band_2
+            if len(band.timestamps.state[1]) >= self.memory_window + self.spill_samples:
+                band.spill(self.memory_window)
+
+            if is_master and (len(self.data_mapping.state[1]) >= self.memory_window + self.spill_samples):
+                self.data_mapping.spill(self.memory_window)
+
+        def load_session(self, session):
+            """
+                Replace all data with data read from a session (see "pymyolinux.session.read_session").
+
+            :param session: A dictionary returned by "read_session"
+            """
+            self.band_1.load(**session["band_1"])
+            self.band_2.load(**session["band_2"])
+
+            # Only final mapping entries are written to a session, the remainder could not be synchronized
+            spill.close(self.data_mapping)
+            self.data_mapping = self.new_column("mapping", np.int64)
+            self.data_mapping.extend(session["mapping"].tolist())
+            self.data_mapping.extend([self.invalid_map] * (len(self.band_1.timestamps) - len(self.data_mapping)))
+
+            if self.memory_window is not None:
+                for is_master in (True, False):
+                    self.limit_memory(is_master)
+
+            self.label_timeline.clear()
+            for transition in session["labels"]:
+                self.label_timeline.record(float(transition["time"]), int(transition["label"]))
+
+            with self.sync_condition:
+                self.num_synchronized = len(self.data_mapping)
+            self.preprocessed.reset(self.num_synchronized)
 
         def synchronize_data(self, is_master):
             """
@@ -171,6 +433,9 @@ class DataTools(QWidget):
             if is_master:
                 self.data_mapping.append(self.invalid_map)
 
+            if self.memory_window is not None:
+                self.limit_memory(is_master)
+
             #
             # Default offsets before synchronization begins
             #
@@ -260,6 +525,8 @@ class DataTools(QWidget):
                     if in_sync:
                         self.data_mapping[self.first_offset] = self.second_offset
 
+                self.notify_synchronized()
+
     def __init__(self, on_device_connected, on_device_disconnected, is_data_tools_open):
         """
         :param on_device_connected: This function is called on a user initiated connection
@@ -275,8 +542,14 @@ class DataTools(QWidget):
         self.second_port        = None
         self.is_data_tools_open = is_data_tools_open
 
-        # Holds all collected data
-        self.data_collected     = self.MyoData()
+        # Holds all collected data (in bounded memory mode, older data is spilled to disk)
+        #   Note: Trimmed samples (on a disconnect) are always kept in memory
+        if MEMORY_WINDOW_SAMPLES is None:
+            self.spill_dir      = None
+            self.data_collected = self.MyoData()
+        else:
+            self.spill_dir      = self.create_spill_dir()
+            self.data_collected = self.MyoData(max(MEMORY_WINDOW_SAMPLES, NUM_TRIM_SAMPLES), self.spill_dir)
 
         self.progress_bars  = []  # Progress bars, used when searching for Myo armband devies
         self.search_threads = []  # Background threads that scan for advertising packets from advertising
@@ -290,6 +563,7 @@ class DataTools(QWidget):
         # States
         self.ports_searching    = {}
         self.gt_helper_open     = False  # Ground truth helper
+        self.export_worker      = None   # Background CSV/NinaPro export (see save_clicked, ninapro_clicked)
         self.start_time         = time.time()
         self.data_directory     = None
 
@@ -299,6 +573,12 @@ class DataTools(QWidget):
 
         self.init_ui()
 
+        # Continuously write collected data to disk (recovering unsaved data from a previous run, if requested)
+        recovered_session       = self.recover_session()
+        self.session_worker     = SessionWriterWorker(self.data_collected, SESSION_SPOOL_DIR, self.start_time,
+                                                      self.warn_user, recovered_session)
+        QThreadPool.globalInstance().start(self.session_worker)
+
     def init_ui(self):
 
         # DataTools top layout
@@ -447,14 +727,19 @@ class DataTools(QWidget):
         self.save_data_button = QPushButton("Save")  # Save button
         self.save_data_button.clicked.connect(self.save_clicked)
 
+        self.ninapro_button = QPushButton("Export NinaPro")  # NinaPro export button
+        self.ninapro_button.clicked.connect(self.ninapro_clicked)
+
         self.gt_helper_button = QPushButton("GT Helper")  # Ground truth button
         self.gt_helper_button.clicked.connect(self.gt_helper_clicked)
-        self.gt_helper = GroundTruthHelper(close_function=self.gt_helper_closed)
+        self.gt_helper = GroundTruthHelper(close_function=self.gt_helper_closed,
+                                           label_changed=self.record_current_label)
 
         top_inner_layout.addLayout(path_layout)
         top_inner_layout.addWidget(separator)
         top_inner_layout.addLayout(buttons_layout)
         buttons_layout.addWidget(self.save_data_button)
+        buttons_layout.addWidget(self.ninapro_button)
         buttons_layout.addWidget(self.gt_helper_button)
         inner_box.setLayout(top_inner_layout)
         self.data_gen_box.setLayout(top_layout)
@@ -521,9 +806,78 @@ class DataTools(QWidget):
         if self.gt_helper_open:
             self.gt_helper.close()
 
+        #
+        # Wait on CSV export, then stop session writer (after data workers, to write all data collected)
+        #
+        while (self.export_worker is not None) and (not self.export_worker.complete):
+            time.sleep(self.worker_check_period)
+
+        self.session_worker.running = False
+        while not self.session_worker.complete:
+            time.sleep(self.worker_check_period)
+
+        if self.spill_dir is not None:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    def create_spill_dir(self):
+        """
+            Creates a directory for data spilled from memory (see "MyoData"), removing those left by previous runs.
+
+        :return: Path of the directory
+        """
+        os.makedirs(SESSION_SPOOL_DIR, exist_ok=True)
+        for old_dir in glob.glob(join(SESSION_SPOOL_DIR, "spill_*")):
+            shutil.rmtree(old_dir, ignore_errors=True)
+        return tempfile.mkdtemp(prefix="spill_", dir=SESSION_SPOOL_DIR)
+
+    def recover_session(self):
+        """
+            Offers to recover data from the latest session that was never saved (e.g. due to a crash).
+
+        :return: Path of the recovered session, None otherwise
+        """
+
+        # Saved/recovered sessions are no longer needed
+        for path in find_sessions(SESSION_SPOOL_DIR, [SessionWriter.STATE_FINALIZED, SessionWriter.STATE_RECOVERED]):
+            shutil.rmtree(path, ignore_errors=True)
+
+        unsaved_sessions = find_sessions(SESSION_SPOOL_DIR, [SessionWriter.STATE_ACTIVE])
+        if len(unsaved_sessions) == 0:
+            return None
+        path = unsaved_sessions[-1]
+
+        try:
+            session = read_session(path)
+        except (OSError, ValueError) as e:
+            self.warn_user("Unable to read unsaved session \"{}\" ({}).".format(path, e))
+            return None
+
+        num_samples_1 = session["band_1"]["time"].shape[0]
+        num_samples_2 = session["band_2"]["time"].shape[0]
+        if (num_samples_1 == 0) and (num_samples_2 == 0):
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+
+        reply = QMessageBox.question(self, "Recover Session",
+                                     "Unsaved data was found ({} + {} samples, recorded {}).\n\n"
+                                     "Recover this data? Otherwise, it will be discarded.".format(
+                                        num_samples_1, num_samples_2,
+                                        time.strftime("%Y-%m-%d %H:%M", time.localtime(session["header"]["created"]))
+                                     ),
+                                     QMessageBox.Yes | QMessageBox.No)
+
+        if reply != QMessageBox.Yes:
+            SessionWriter(path).set_state(SessionWriter.STATE_RECOVERED)
+            return None
+
+        self.data_collected.load_session(session)
+        if session["header"]["base_time"] is not None:
+            self.start_time = session["header"]["base_time"]
+        return path
+
     def get_current_label(self):
         """
-            Passes the current ground truth label of the movement being performed from GT helper to data workers.
+            Passes the current ground truth label of the movement being performed from GT helper.
 
         :return: [int] Ground truth label of current movement
         """
@@ -532,11 +886,24 @@ class DataTools(QWidget):
         else:
             return -1
 
+    def record_current_label(self):
+        """
+            Called on any change to the ground truth label (from the GT helper, or its background worker), to record
+                a label transition. Samples are labelled at export/training time, via the label timeline.
+
+                > Called from the GUI thread and the GT helper's worker thread, the label is read (and timestamped)
+                    while holding the timeline's lock, so that transitions are recorded in order.
+        """
+        label_timeline = self.data_collected.label_timeline
+        with label_timeline.lock:
+            label_timeline.record(time.time(), self.get_current_label())
+
     def gt_helper_closed(self):
         """
             Called when GT Helper window is closed
         """
         self.gt_helper_open = False
+        self.record_current_label()
 
     def file_browser_clicked(self):
         """
@@ -550,204 +917,106 @@ class DataTools(QWidget):
         if exists(self.data_directory):
             self.save_path.setText(self.data_directory)
 
-    def save_clicked(self):
-        """
-            Save button clicked, save all data to selected directory.
+    def check_save_directory(self):
         """
+            Checks that data can be saved to the selected directory (and that data collection has stopped).
 
+        :return: [bool] True if data can be saved
+        """
         if (((self.data_directory is None) or (not exists(self.data_directory))) and
                 (not exists(self.save_path.text()))):
             self.warn_user("Invalid path selected.")
-            return
+            return False
         else:
             self.data_directory = self.save_path.text()
 
         if (self.first_myo != None) or (self.second_myo != None):
             self.warn_user("Please disconnect Myo devices first.")
+            return False
+        return True
+
+    def start_export(self, text, worker_type, **kwargs):
+        """
+            Starts a background export worker, showing a progress dialog until it completes.
+
+        :param text: Progress dialog text
+        :param worker_type: CsvExportWorker/NinaProExportWorker
+        :param kwargs: Additional arguments of the worker
+        """
+        self.save_data_button.setEnabled(False)
+        self.ninapro_button.setEnabled(False)
+        self.save_progress = QProgressDialog(text, None, 0, 100, self)
+        self.save_progress.setWindowTitle("In Progress")
+        self.save_progress.setWindowModality(Qt.WindowModal)
+        self.save_progress.setMinimumDuration(0)
+        self.save_progress.setValue(0)
+
+        self.export_worker = worker_type(self.data_directory, self.data_collected, self.start_time,
+                                         self.save_progress, self.on_export_complete, self.on_export_failed, **kwargs)
+        QThreadPool.globalInstance().start(self.export_worker)
+
+    def save_clicked(self):
+        """
+            Save button clicked, save all data to selected directory.
+        """
+        if not self.check_save_directory():
             return
 
         #
-        # Helper function that saves one data point to a file descriptor (for a file containing a single device)
+        # Write all remaining data to the session on disk (copied to the selected directory, and indexed, by the export
+        # worker)
         #
-        def write_single(self, armband_data, index, fd):
-
-            # See "create_emg_event" for details:
-            base_time   = self.start_time
-            cur_time    = armband_data.timestamps[index]
-            emg_list    = [x[index] for x in armband_data.emg]
-            orient_list = [x[index] for x in armband_data.orient]
-            accel_list  = [x[index] for x in armband_data.accel]
-            gyro_list   = [x[index] for x in armband_data.gyro]
-            label       = armband_data.labels[index]
-
-            # Write to file descriptor
-            fd.write("{:.4f},{},{},{},{},{},{},{},{},{},{:.4f},{:.4f},{:.4f},{:.4f},{:.4f},{:.4f},{:.4f},{:.4f},"
-                     "{:.4f},{:.4f}\n".format(
-                cur_time - base_time, label,
-                emg_list[0], emg_list[1], emg_list[2], emg_list[3], emg_list[4],
-                emg_list[5], emg_list[6], emg_list[7],
-                orient_list[0], orient_list[1], orient_list[2], orient_list[3],
-                accel_list[0], accel_list[1], accel_list[2],
-                gyro_list[0], gyro_list[1], gyro_list[2]
-            ))
+        try:
+            session_path = self.session_worker.finalize()
+        except OSError as e:
+            self.warn_user("Unable to save session data ({}).".format(e))
+            return
 
         if (len(self.data_collected.band_1.timestamps) == 0) and (len(self.data_collected.band_2.timestamps) == 0):
             self.warn_user("No data available to save.")
+            return
 
-        # Multiple myo devices to save data from
-        elif (len(self.data_collected.band_1.timestamps) != 0) and (len(self.data_collected.band_2.timestamps) != 0):
-
-            full_path_1     = join(self.data_directory, FILENAME_1)
-            full_path_2     = join(self.data_directory, FILENAME_2)
-            full_path_all   = join(self.data_directory, FILENAME_all)
-
-            first_myo_data  = self.data_collected.band_1
-            sec_myo_data    = self.data_collected.band_2
-            data_mapping    = self.data_collected.data_mapping
-
-            # File descriptors for 3 created files
-            fd_1    = open(full_path_1, "w")
-            fd_2    = open(full_path_2, "w")
-            fd_all  = open(full_path_all, "w")
-
-            # Headers
-            fd_1.write(
-                "Time, Label, EMG_1, EMG_2, EMG_3, EMG_4, EMG_5, EMG_6, EMG_7, EMG_8, OR_W, OR_X, OR_Y, OR_Z,"
-                "ACC_1, ACC_2, ACC_3, GYRO_1, GYRO_2, GYRO_3\n")
-            fd_2.write(
-                "Time, Label, EMG_1, EMG_2, EMG_3, EMG_4, EMG_5, EMG_6, EMG_7, EMG_8, OR_W, OR_X, OR_Y, OR_Z,"
-                "ACC_1, ACC_2, ACC_3, GYRO_1, GYRO_2, GYRO_3\n")
-            fd_all.write("Time_1, Time_2, Label, D1_EMG_1, D1_EMG_2, D1_EMG_3, D1_EMG_4, D1_EMG_5, D1_EMG_6, D1_EMG_7,"
-                         " D1_EMG_8, D1_OR_W, D1_OR_X, D1_OR_Y, D1_OR_Z, D1_ACC_1, D1_ACC_2, D1_ACC_3, D1_GYRO_1,"
-                         " D1_GYRO_2, D1_GYRO_3,"
-                         " D2_EMG_1, D2_EMG_2, D2_EMG_3, D2_EMG_4, D2_EMG_5, D2_EMG_6, D2_EMG_7, D2_EMG_8, D2_OR_W,"
-                         " D2_OR_X, D2_OR_Y, D2_OR_Z, D2_ACC_1, D2_ACC_2, D2_ACC_3, D2_GYRO_1, D2_GYRO_2, D2_GYRO_3\n")
-
-            # Find
-            #   1) Time of which both devices are recording,
-            #   2) Time of which the first device stops recording
-            max_first = float("-inf")
-            min_last = float("inf")
-
-            if max_first < first_myo_data.timestamps[0]:
-                max_first = first_myo_data.timestamps[0]
-            if max_first < sec_myo_data.timestamps[0]:
-                max_first = sec_myo_data.timestamps[0]
-            if min_last > first_myo_data.timestamps[len(first_myo_data.timestamps) - 1]:
-                min_last = first_myo_data.timestamps[len(first_myo_data.timestamps) - 1]
-            if min_last > sec_myo_data.timestamps[len(sec_myo_data.timestamps) - 1]:
-                min_last = sec_myo_data.timestamps[len(sec_myo_data.timestamps) - 1]
-
-            # Define time of first data point (using a buffer period)
-            start_time = max_first + BUFFER_PERIOD
-            if start_time > min_last:
-                self.warn_user("Less than {} seconds worth of data collected.".format(BUFFER_PERIOD))
-                fd_1.close()
-                fd_2.close()
-                fd_all.close()
-                return
-
-            #
-            # Save data to individual files, and find start indices
-            #
-            min_first_dist  = float("inf")
-            first_idx       = None
-
-            for i, time in enumerate(first_myo_data.timestamps):
-                if abs(start_time - time) < min_first_dist:
-                    min_first_dist  = abs(start_time - time)
-                    first_idx       = i
-                write_single(self, first_myo_data, i, fd_1)
-            for i, time in enumerate(sec_myo_data.timestamps):
-                write_single(self, sec_myo_data, i, fd_2)
+        # Export data to CSV files in the background
+        self.start_export("Saving data...", CsvExportWorker, session_path=session_path)
 
-            #
-            # Attempt to create a file with (previously) synchronized data
-            #
-            for first_offset in range(len(first_myo_data.timestamps)):
-                if first_offset < first_idx:
-                    continue
-                second_offset = data_mapping[first_offset]
+    def ninapro_clicked(self):
+        """
+            Export NinaPro button clicked, save all data to selected directory, as NinaPro-style arrays (see
+                "pymyolinux.session.ninapro").
+        """
+        if not self.check_save_directory():
+            return
 
-                # Impossible to synchronize data (adequately)
-                if (second_offset == self.data_collected.invalid_map) or (second_offset >= len(sec_myo_data.timestamps)):
-                    continue
+        if (len(self.data_collected.band_1.timestamps) == 0) and (len(self.data_collected.band_2.timestamps) == 0):
+            self.warn_user("No data available to save.")
+            return
 
-                #
-                # See "create_emg_event" for details:
-                #
-                cur_time    = first_myo_data.timestamps[first_offset]
-                emg_list    = [x[first_offset] for x in first_myo_data.emg]
-                orient_list = [x[first_offset] for x in first_myo_data.orient]
-                accel_list  = [x[first_offset] for x in first_myo_data.accel]
-                gyro_list   = [x[first_offset] for x in first_myo_data.gyro]
-                label_one   = first_myo_data.labels[first_offset]  # Label, as per device one (not device two)
-
-                # Second device sample
-                cur_time_2      = sec_myo_data.timestamps[second_offset]
-                emg_list_2      = [x[second_offset] for x in sec_myo_data.emg]
-                orient_list_2   = [x[second_offset] for x in sec_myo_data.orient]
-                accel_list_2    = [x[second_offset] for x in sec_myo_data.accel]
-                gyro_list_2     = [x[second_offset] for x in sec_myo_data.gyro]
-
-                # Time since opening of GUI program
-                base_time           = self.start_time  # Single data point (device one)
-                first_delta_time    = cur_time - base_time
-                sec_delta_time      = cur_time_2 - base_time
-
-                # Write to file descriptor
-                fd_all.write("{:.4f},{:.4f},{},{},{},{},{},{},{},{},{},{:.4f},{:.4f},{:.4f},{:.4f},{:.4f},{:.4f},"
-                             "{:.4f},{:.4f},{:.4f},{:.4f},{},{},{},{},{},{},{},{},{:.4f},{:.4f},{:.4f},{:.4f},{:.4f},"
-                             "{:.4f},{:.4f},{:.4f},{:.4f},{:.4f}\n".
-                        format(
-                        first_delta_time, sec_delta_time, label_one,
-                        emg_list[0], emg_list[1], emg_list[2], emg_list[3], emg_list[4],
-                        emg_list[5], emg_list[6], emg_list[7],
-                        orient_list[0], orient_list[1], orient_list[2], orient_list[3],
-                        accel_list[0], accel_list[1], accel_list[2],
-                        gyro_list[0], gyro_list[1], gyro_list[2],
-
-                        emg_list_2[0], emg_list_2[1], emg_list_2[2], emg_list_2[3], emg_list_2[4],
-                        emg_list_2[5], emg_list_2[6], emg_list_2[7],
-                        orient_list_2[0], orient_list_2[1], orient_list_2[2], orient_list_2[3],
-                        accel_list_2[0], accel_list_2[1], accel_list_2[2],
-                        gyro_list_2[0], gyro_list_2[1], gyro_list_2[2]
-                    )
-                )
-
-            fd_1.close()
-            fd_2.close()
-            fd_all.close()
-
-            self.update = QMessageBox()
-            self.update.setText("Saved data from two Myo devices.")
-            self.update.show()
+        self.start_export("Exporting data...", NinaProExportWorker)
 
-        # Only a single Myo device to save data from (simpler)
-        else:
-
-            full_path = join(self.data_directory, SINGLE_MYO_FILENAME)
+    def on_export_complete(self, message):
+        """
+            Called once a background export worker completes.
 
-            # Select data from valid device
-            if len(self.data_collected.band_1.timestamps) == 0:
-                data_ref = copy.deepcopy(self.data_collected.band_2)
-            else:
-                data_ref = copy.deepcopy(self.data_collected.band_1)
+        :param message: A message to display
+        """
+        self.save_progress.close()
+        self.save_data_button.setEnabled(True)
+        self.ninapro_button.setEnabled(True)
 
-            # Create file, write header
-            fd = open(full_path, "w")
-            fd.write(
-                "Time, Label, EMG_1, EMG_2, EMG_3, EMG_4, EMG_5, EMG_6, EMG_7, EMG_8, OR_W, OR_X, OR_Y, OR_Z,"
-                "ACC_1, ACC_2, ACC_3, GYRO_1, GYRO_2, GYRO_3\n")
+        self.update = QMessageBox()
+        self.update.setText(message)
+        self.update.show()
 
-            # Save data points
-            for idx in range(len(data_ref.timestamps)):
-                write_single(self, data_ref, idx, fd)
-            fd.close()
+    def on_export_failed(self, message):
+        """
+            Called if a background export worker fails.
 
-            self.update = QMessageBox()
-            self.update.setText("Saved data from one Myo device.")
-            self.update.show()
+        :param message: The error message to display
+        """
+        self.save_progress.close()
+        self.save_data_button.setEnabled(True)
+        self.ninapro_button.setEnabled(True)
+        self.warn_user(message)
 
     def gt_helper_clicked(self):
         """
@@ -756,6 +1025,7 @@ class DataTools(QWidget):
         if not self.gt_helper_open:
             self.gt_helper_open = True
             self.gt_helper.show()
+            self.record_current_label()
 
     def find_ports(self):
         """
@@ -893,8 +1163,7 @@ class DataTools(QWidget):
             # Holds relevant information about Myo found, and reacts to user actions
             #
             widget = MyoFoundWidget(port, device, self.connection_made, self.connection_dropped,
-                                            self.get_current_label, partial(self.battery_update,
-                                                                            device_address=device["sender_address"]),
+                                            partial(self.battery_update, device_address=device["sender_address"]),
                                             self.data_tab_signals, self.is_data_tools_open
                                     )
 
@@ -995,6 +1264,7 @@ class DataTools(QWidget):
 
             self.first_myo = address
             self.first_port = port
+            self.session_worker.set_device(1, address)
             self.top_tab.addTab(self.myo_1_tab, "Myo Device 1")
 
             return (self.top_tab.currentIndex,
@@ -1010,6 +1280,7 @@ class DataTools(QWidget):
             else:
                 self.second_myo = address
                 self.second_port = port
+                self.session_worker.set_device(2, address)
 
                 self.top_tab.addTab(self.myo_2_tab, "Myo Device 2")
 
@@ -1042,15 +1313,14 @@ class MyoFoundWidget(QWidget):
         A Widget for a Myo found list entry, that provides the ability to connect/disconnect.
     """
 
-    def __init__(self, port, myo_device, connect_notify, disconnect_notify, get_current_label, battery_notify,
-                 data_tab_signals, is_data_tools_open):
+    def __init__(self, port, myo_device, connect_notify, disconnect_notify, battery_notify, data_tab_signals,
+                 is_data_tools_open):
         """
 
         :param port: The port used to find this device.
         :param myo_device: The hardware (MAC) address of this device.
         :param connect_notify: A function called prior to connection attempts.
         :param disconnect_notify: A function called prior to disconnect attempts.
-        :param get_current_label: A function that returns the current ground truth label.
         :param battery_notify: A function called on battery update evenets.
         :param data_tab_signals: A DataTabUpdate object, allowing one to emit disconnect/connect signals
         :param is_data_tools_open: Is the DataTools tab open?
@@ -1063,7 +1333,6 @@ class MyoFoundWidget(QWidget):
         self.port               = port
         self.connect_notify     = connect_notify
         self.disconnect_notify  = disconnect_notify
-        self.get_current_label  = get_current_label
         self.battery_notify     = battery_notify
         self.data_tab_signals   = data_tab_signals
         self.is_data_tools_open = is_data_tools_open
@@ -1073,8 +1342,8 @@ class MyoFoundWidget(QWidget):
         self.worker     = None
 
         # Configurable parameters
-        self.num_trim_samples = 400  # On unexpected disconnect, or user-initiated disconnect, trim this many samples
-                                     #       from the list of all collected data thus far.
+        self.num_trim_samples = NUM_TRIM_SAMPLES    # On unexpected disconnect, or user-initiated disconnect, trim this
+                                                    #   many samples from the list of all collected data thus far.
         self.init_ui()
 
     def init_ui(self):
@@ -1195,8 +1464,8 @@ class MyoFoundWidget(QWidget):
                                         self.on_axes_update, self.on_new_data, self.data_collected,
                                         self.on_worker_started,
                                         self.on_worker_stopped, self.connect_failed, self.on_discon_occurred,
-                                        self.battery_notify, self.create_event, self.get_current_label,
-                                        self.data_tab_signals, self.is_data_tools_open)
+                                        self.battery_notify, self.create_event, self.data_tab_signals,
+                                        self.is_data_tools_open)
 
             self.worker.setAutoDelete(False)  # We reuse this worker
 
@@ -1382,12 +1651,15 @@ class GroundTruthHelper(QMainWindow):
     def closeEvent(self, event):
         self.close_event.exitClicked.emit()
 
-    def __init__(self, close_function=None):
+    def __init__(self, close_function=None, label_changed=None):
         """
         :param close_function: A function called upon user exit of the GroundTruthHelper window.
+        :param label_changed: A function called whenever the current ground truth label may have changed.
         """
         super().__init__()
 
+        self.label_changed = label_changed
+
         self.close_event = self.Exit()
         if close_function is not None:
             self.close_event.exitClicked.connect(close_function)
@@ -1697,7 +1969,7 @@ class GroundTruthHelper(QMainWindow):
                                         self.current_movement, self.video_player, self.all_video_paths,
                                         self.collect_duration, self.rest_duration, self.repetitions,
                                         self.on_worker_started, self.on_worker_unpaused, self.on_worker_paused,
-                                        self.on_worker_stopped)
+                                        self.on_worker_stopped, self.notify_label_changed)
         QThreadPool.globalInstance().start(self.worker)
 
     def on_worker_started(self):
@@ -1706,6 +1978,7 @@ class GroundTruthHelper(QMainWindow):
         """
         self.playing = True
         self.enable_video_buttons(False, True, True)
+        self.notify_label_changed()
 
     def on_worker_unpaused(self):
         """
@@ -1714,6 +1987,7 @@ class GroundTruthHelper(QMainWindow):
         self.playing = True
         self.enable_video_buttons(False, True, True)
         self.unpausing = False
+        self.notify_label_changed()
 
     def on_worker_paused(self):
         """
@@ -1722,6 +1996,7 @@ class GroundTruthHelper(QMainWindow):
         self.playing = False
         self.pausing = False
         self.enable_video_buttons(True, False, True)
+        self.notify_label_changed()
 
     def on_worker_stopped(self):
         """
@@ -1730,6 +2005,7 @@ class GroundTruthHelper(QMainWindow):
         self.playing = False
         self.shutdown = False
         self.worker = None
+        self.notify_label_changed()
 
         # Update GUI appearance
         self.status_label.setText("Waiting to Start...")
@@ -1809,8 +2085,15 @@ class GroundTruthHelper(QMainWindow):
         return exercises_found
 
     #
-    # Used for data logging, by TopLevel
+    # Used for data logging, by DataTools
     #
+    def notify_label_changed(self):
+        """
+            Called whenever the current ground truth label may have changed (playback state, or worker label updates).
+        """
+        if self.label_changed is not None:
+            self.label_changed()
+
     def get_current_label(self):
         """
         :return: [int] Ground truth label for current movement
@@ -1855,6 +2138,15 @@ class GTWorkerUpdate(QObject):
     workerPaused = pyqtSignal()
     workerStopped = pyqtSignal()
 
+# Used by SessionWriterWorker
+class SessionWriterUpdate(QObject):
+    writeFailed = pyqtSignal([str])
+
+# Used by CsvExportWorker, NinaProExportWorker
+class ExportUpdate(QObject):
+    exportComplete  = pyqtSignal([str])
+    exportFailed    = pyqtSignal([str])
+
 
 
 ########################################################################################################################
@@ -1879,7 +2171,7 @@ class MyoDataWorker(QRunnable):
 
     def __init__(self, port, myo_device, series_list, indices_list, axes_callback, data_call_back, data_collected,
                  on_worker_started, on_worker_stopped, on_connect_failed, on_discon_occurred, battery_notify,
-                 create_event, get_current_label, data_tab_signals, is_data_tools_open):
+                 create_event, data_tab_signals, is_data_tools_open):
         """
         :param port: Port used to create MyoFoundWidget widget.
         :param myo_device: Address of Myo device to interact with.
@@ -1894,7 +2186,6 @@ class MyoDataWorker(QRunnable):
         :param on_discon_occurred: A function called when the corresponding Myo device disconnects unexpectedly.
         :param battery_notify: A function called on receipt of battery level update.
         :param create_event: A function that determines whether to push data updates, based on open tabs.
-        :param get_current_label: A function that returns the current ground truth label being collected.
         :param data_tab_signals: A DataTabUpdate object, allowing the emission of disconnect/connect signals.
         :param is_data_tools_open: Is the DataTools tab open?
         """
@@ -1906,7 +2197,6 @@ class MyoDataWorker(QRunnable):
         self.data_collected     = data_collected
         self.update             = DataWorkerUpdate()
         self.create_event       = create_event
-        self.get_current_label  = get_current_label
         self.data_tab_signals   = data_tab_signals
         self.is_data_tools_open = is_data_tools_open
 
@@ -1960,7 +2250,8 @@ class MyoDataWorker(QRunnable):
         self.dongle.set_sleep_mode(False)
         self.dongle.enable_imu_readings()
         self.dongle.enable_emg_readings()
-        self.dongle.add_joint_emg_imu_handler(self.create_emg_event)
+        self.dongle.add_emg_handler(self.create_emg_event)
+        self.dongle.add_imu_handler(self.create_imu_event)
 
         disconnect_occurred = False
         while self.running and (not disconnect_occurred):
@@ -1977,19 +2268,30 @@ class MyoDataWorker(QRunnable):
         self.complete = True
 
 
-    def create_emg_event(self, emg_list, orient_w, orient_x, orient_y, orient_z,
-                         accel_1, accel_2, accel_3, gyro_1, gyro_2, gyro_3, sample_num):
+    def create_imu_event(self, orient_w, orient_x, orient_y, orient_z, accel_1, accel_2, accel_3, gyro_1, gyro_2,
+                         gyro_3):
         """
-            On receipt of a data packet from a Myo device, triggered by "scan_for_data_packets", this function is
-            called.
-        :param emg_list: A list of 8 EMG readings.
+            On receipt of an IMU data packet from a Myo device (~50 Hz), triggered by "scan_for_data_packets", this
+            function is called.
         :param orient_w/x/y/z: Magnetometer readings, corresponding to a unit quaternion.
         :param accel_1/2/3: Accelerometer readings.
         :param gyro_1/2/3: Gyroscope readings.
-        :param sample_num: [int] 1/2 : Sample 1 or 2 (data is sent in pairs)
         """
 
         if self.running:
+            self.data_collected.add_imu_sample(time.time(), accel_1, accel_2, accel_3, gyro_1, gyro_2, gyro_3,
+                                               orient_w, orient_x, orient_y, orient_z)
+
+    def create_emg_event(self, emg_list, sample_num):
+        """
+            On receipt of an EMG data packet from a Myo device, triggered by "scan_for_data_packets", this function is
+            called.
+        :param emg_list: A list of 8 EMG readings.
+        :param sample_num: [int] 1/2 : Sample 1 or 2 (data is sent in pairs)
+        """
+
+        # EMG samples are only stored once the first IMU sample has been received
+        if self.running and (len(self.data_collected.imu_timestamps) > 0):
 
             #########################################################################################################
             #
@@ -2054,16 +2356,462 @@ class MyoDataWorker(QRunnable):
                     self.update.dataUpdate.emit()
 
             #
-            # Update list of all data collected (with correct rescaling)
+            # Update list of all data collected
+            #   Note: Ground truth labels are recorded separately, as transitions (see DataTools.record_current_label)
+            #   Note: IMU samples are stored separately at their native rate (see create_imu_event)
             #
-            current_label = self.get_current_label()  # Grabbed from GT Helper
-
-            self.data_collected.add_sample(self.time_received, current_label, emg_list, accel_1, accel_2, accel_3,
-                                           gyro_1, gyro_2, gyro_3, orient_w, orient_x, orient_y, orient_z)
+            self.data_collected.add_sample(self.time_received, emg_list)
 
             self.samples_count += 1
 
 
+class SessionWriterWorker(QRunnable):
+    """
+        A background Qt thread that continuously writes all data collected (in a MyoData object) to a session on disk
+            (see "pymyolinux.session.SessionWriter"), so that:
+                1) Data collected is not lost on a crash (see "DataTools.recover_session")
+                2) Saving only requires writing the last few samples (see "finalize")
+    """
+
+    def __init__(self, myo_data, spool_dir, base_time, on_write_failed, recovered_session=None):
+        """
+        :param myo_data: A MyoData object, holding all data collected from both Myo armbands
+        :param spool_dir: Directory in which new sessions are created
+        :param base_time: Reference time of the session (saved timestamps are relative to this time)
+        :param on_write_failed: A function called with an error message, if data cannot be written
+        :param recovered_session: Path of a session that "myo_data" was recovered from (marked as recovered once its
+                                    data is written to a new session)
+        """
+        super().__init__()
+        self.myo_data           = myo_data
+        self.spool_dir          = spool_dir
+        self.base_time          = base_time
+        self.recovered_session  = recovered_session
+        self.update             = SessionWriterUpdate()
+        self.update.writeFailed.connect(on_write_failed)
+
+        # Configurable parameters
+        self.flush_samples  = SESSION_FLUSH_SAMPLES
+        self.holdback       = NUM_TRIM_SAMPLES      # The last samples collected may be trimmed (on disconnect)
+        self.check_period   = 1                     # seconds
+
+        # States
+        self.running            = False
+        self.complete           = True
+        self.failed             = False
+        self.flush_lock         = threading.Lock()  # Flushes from this thread, and "finalize" (GUI thread)
+        self.writer             = None
+        self.flushed_rows       = [0, 0]            # Per armband, number of EMG/IMU samples written
+        self.flushed_imu_rows   = [0, 0]
+        self.flushed_mapping    = 0
+        self.flushed_labels     = 0
+        self.finalized_lengths  = None              # Amount of data collected, when the session was last finalized
+        self.devices            = {}                # Band name -> address of the Myo device (stored in the header)
+
+    def run(self):
+        self.running    = True
+        self.complete   = False
+
+        while self.running:
+            time.sleep(self.check_period)
+            self.flush(self.holdback, self.flush_samples)
+
+        # Write all remaining data (the session can be recovered on the next run, if it was not saved)
+        self.flush(0, 0)
+        with self.flush_lock:
+            if self.writer is not None:
+                self.writer.close()
+        self.complete = True
+
+    def flush(self, holdback, min_samples):
+        """
+        :param holdback: Number of the latest samples (per armband) not to write yet
+        :param min_samples: Only write data once this many new samples are available (for either armband)
+        """
+        with self.flush_lock:
+            if self.failed:
+                return
+            try:
+                self.write_pending(holdback, min_samples)
+            except (OSError, ValueError) as e:
+                self.failed = True
+                self.update.writeFailed.emit("Unable to write session data to \"{}\" ({}). Data will only be kept "
+                                             "in memory until saved.".format(self.spool_dir, e))
+
+    def set_device(self, band_num, address):
+        """
+            Record the address of the Myo device that data of an armband is collected from.
+
+        :param band_num: 1/2 (band_1/band_2)
+        :param address: Address of the Myo device (hex)
+        """
+        with self.flush_lock:
+            self.devices[SessionWriter.band_names[band_num - 1]] = address
+            if (self.writer is not None) and (not self.failed):
+                try:
+                    self.writer.header["devices"] = dict(self.devices)
+                    self.writer.write_header()
+                except OSError:
+                    pass  # Written with the next header update
+
+    def finalize(self):
+        """
+            Write all remaining data to the session, and mark it as finalized (to be copied, see "copy_session").
+
+                > Called from the GUI thread, once all Myo devices are disconnected (only the last samples remain).
+                > Data collected afterwards is written to a new session, a finalized session no longer changes.
+
+        :return: Path of the finalized session, None if no data has been collected
+        """
+        with self.flush_lock:
+            if not self.failed:
+                self.write_pending(0, 0)
+            if self.writer is None:
+                return None
+
+            self.writer.set_state(SessionWriter.STATE_FINALIZED)
+            self.finalized_lengths = self.data_lengths()[0]
+            return self.writer.path
+
+    @staticmethod
+    def copy_session(session_path, save_directory):
+        """
+            Copy a finalized session into "save_directory" (called by the export worker).
+
+        :param session_path: Path of the finalized session (see "finalize")
+        :param save_directory: Directory in which data is saved
+        :return: Path of the copied session
+        """
+        save_path = join(save_directory, SESSION_DIRNAME)
+        if exists(save_path):
+            shutil.rmtree(save_path)
+        shutil.copytree(session_path, save_path)
+        return save_path
+
+    ####################################################################################################################
+    # Helper functions
+    ####################################################################################################################
+
+    def data_lengths(self):
+        """
+        :return: ([(num_samples, num_imu_samples) per armband, len(data_mapping)], number of final mapping entries)
+        """
+        myo_data    = self.myo_data
+        bands       = (myo_data.band_1, myo_data.band_2)
+
+        myo_data.ArmbandData.add_data_lock.lock()
+        lengths = [(len(band.imu_index), len(band.imu_timestamps)) for band in bands] + [len(myo_data.data_mapping)]
+
+        # Mapping entries prior to the current offset are no longer updated
+        if myo_data.first_sync:
+            num_final_mapping = 0
+        else:
+            num_final_mapping = min(myo_data.first_offset, len(myo_data.data_mapping))
+        myo_data.ArmbandData.add_data_lock.unlock()
+
+        return lengths, num_final_mapping
+
+    def new_session(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.writer             = None
+        self.flushed_rows       = [0, 0]
+        self.flushed_imu_rows   = [0, 0]
+        self.flushed_mapping    = 0
+        self.flushed_labels     = 0
+        self.finalized_lengths  = None
+
+    def write_pending(self, holdback, min_samples):
+        lengths, num_final_mapping  = self.data_lengths()
+        bands                       = (self.myo_data.band_1, self.myo_data.band_2)
+        label_timeline              = self.myo_data.label_timeline
+
+        #
+        # Data has not changed since the session was saved
+        #
+        if (self.finalized_lengths is not None) and (lengths == self.finalized_lengths):
+            return
+
+        # Data collected after a save, or data removed (trimmed/cleared) after being written -> rewrite all data
+        if ((self.finalized_lengths is not None) or
+                any(lengths[i][0] < self.flushed_rows[i] for i in range(len(bands))) or
+                (lengths[2] < self.flushed_mapping)):
+            self.new_session()
+
+        end_rows = [max(lengths[i][0] - holdback, self.flushed_rows[i]) for i in range(len(bands))]
+        if max(end_rows[i] - self.flushed_rows[i] for i in range(len(bands))) < max(min_samples, 1):
+            return
+
+        if self.writer is None:
+            session_name    = time.strftime("session_%Y%m%d_%H%M%S_") + "{:03d}".format(int(time.time() * 1000) % 1000)
+            self.writer     = SessionWriter(join(self.spool_dir, session_name), base_time=self.base_time,
+                                            metadata={"devices": dict(self.devices)}, codec=SESSION_CODEC)
+        self.writer.set_state(SessionWriter.STATE_ACTIVE)
+
+        #
+        # EMG samples (and the IMU samples they refer to)
+        #
+        for i, band in enumerate(bands):
+            start, end  = self.flushed_rows[i], end_rows[i]
+            imu_start   = self.flushed_imu_rows[i]
+            imu_end     = band.imu_index[end - 1] + 1 if end > 0 else 0
+            if end == start:
+                continue
+
+            self.writer.append_band(i + 1, band.timestamps[start:end],
+                                    np.array([x[start:end] for x in band.emg], dtype=np.int8).T,
+                                    band.imu_index[start:end],
+                                    band.imu_timestamps[imu_start:imu_end],
+                                    np.array([x[imu_start:imu_end] for x in band.orient + band.accel + band.gyro],
+                                             dtype=np.int16).T)
+            self.flushed_rows[i]        = end
+            self.flushed_imu_rows[i]    = imu_end
+
+        #
+        # Synchronization mapping (all entries are written once data collection ends), and ground truth labels
+        #
+        end_mapping = lengths[2] if holdback == 0 else num_final_mapping
+        if end_mapping > self.flushed_mapping:
+            self.writer.append_mapping(self.myo_data.data_mapping[self.flushed_mapping:end_mapping])
+            self.flushed_mapping = end_mapping
+
+        end_labels = len(label_timeline)
+        if end_labels > self.flushed_labels:
+            self.writer.append_labels(label_timeline.timestamps[self.flushed_labels:end_labels],
+                                      label_timeline.labels[self.flushed_labels:end_labels])
+            self.flushed_labels = end_labels
+
+        # All data of a recovered session now exists in this session
+        if self.recovered_session is not None:
+            SessionWriter(self.recovered_session).set_state(SessionWriter.STATE_RECOVERED)
+            self.recovered_session = None
+
+
+class CsvExportWorker(QRunnable):
+    """
+        A background Qt thread that exports all data collected to CSV files (see "pymyolinux.session.csv_io"):
+            1) Rows are formatted in blocks, from NumPy arrays
+            2) Files of both devices (and the synchronized file) are written concurrently
+            3) A progress dialog is updated
+            4) The finalized session (if any) is copied alongside CSV files, and added to the session catalog
+    """
+
+    def __init__(self, data_directory, myo_data, base_time, progress_dialog, on_complete, on_failed,
+                 session_path=None):
+        """
+        :param data_directory: Directory in which to save CSV files
+        :param myo_data: A MyoData object, holding all data collected from both Myo armbands (captured on creation)
+        :param base_time: Saved times are relative to this time
+        :param progress_dialog: A QProgressDialog (range of 0 - 100)
+        :param on_complete: A function called with a message, upon completion
+        :param on_failed: A function called with an error message, if data could not be saved
+        :param session_path: Path of a finalized session to copy (see "SessionWriterWorker.finalize"), None: none
+        """
+        super().__init__()
+        self.data_directory     = data_directory
+        self.session_path       = session_path
+        self.base_time          = base_time
+        self.progress_dialog    = progress_dialog
+        self.update             = ExportUpdate()
+        self.update.exportComplete.connect(on_complete)
+        self.update.exportFailed.connect(on_failed)
+
+        # Capture data collected so far (converted to arrays in run())
+        self.snapshots      = [myo_data.band_1.snapshot(), myo_data.band_2.snapshot()]
+        self.data_mapping   = spill.as_array(myo_data.data_mapping, dtype=np.int64)
+        self.label_timeline = myo_data.label_timeline.copy()
+        self.invalid_map    = myo_data.invalid_map
+
+        # States
+        self.complete       = False
+        self.progress_lock  = threading.Lock()
+        self.rows_written   = {}
+        self.total_rows     = 0
+        self.cur_progress   = 0
+
+    def run(self):
+        try:
+            message = self.export()
+        except (OSError, ValueError) as e:
+            self.complete = True
+            self.update.exportFailed.emit(str(e))
+            return
+
+        self.complete = True
+        self.update.exportComplete.emit(message)
+
+    def export(self):
+        """
+        :return: [str] A message describing data saved
+        """
+        message = self.export_csv()
+
+        #
+        # Copy the session to the selected directory, and index it
+        #
+        if self.session_path is not None:
+            try:
+                save_path = SessionWriterWorker.copy_session(self.session_path, self.data_directory)
+            except OSError as e:
+                raise OSError("Unable to save session data ({}).".format(e))
+
+            if SESSION_CATALOG is not None:
+                try:
+                    with SessionCatalog(SESSION_CATALOG) as catalog:
+                        catalog.add(save_path)
+                except (OSError, ValueError, sqlite3.Error) as e:
+                    message += "\nUnable to add session to the catalog \"{}\" ({}).".format(SESSION_CATALOG, e)
+
+        return message
+
+    def export_csv(self):
+        """
+        :return: [str] A message describing data saved
+        """
+        bands = [DataTools.MyoData.ArmbandData.snapshot_arrays(snapshot) for snapshot in self.snapshots]
+
+        #
+        # Only a single Myo device to save data from (simpler)
+        #
+        if (bands[0]["time"].shape[0] == 0) or (bands[1]["time"].shape[0] == 0):
+            band                = bands[0] if bands[0]["time"].shape[0] > 0 else bands[1]
+            self.total_rows     = band["time"].shape[0]
+            self.write_file(join(self.data_directory, SINGLE_MYO_FILENAME), csv_io.SINGLE_HEADER,
+                            partial(csv_io.write_single_csv, band=band, label_timeline=self.label_timeline,
+                                    base_time=self.base_time))
+            return "Saved data from one Myo device."
+
+        #
+        # Multiple myo devices to save data from
+        #
+        file_paths = [join(self.data_directory, FILENAME_1), join(self.data_directory, FILENAME_2),
+                      join(self.data_directory, FILENAME_all)]
+        try:
+            rows_1, rows_2 = csv_io.synchronized_rows(bands[0]["time"], bands[1]["time"], self.data_mapping,
+                                                      BUFFER_PERIOD, self.invalid_map)
+        except ValueError:
+            # Files are created (with headers only), as before
+            for file_path, header in zip(file_paths, (csv_io.SINGLE_HEADER, csv_io.SINGLE_HEADER,
+                                                      csv_io.ALL_HEADER)):
+                with open(file_path, "w") as fd:
+                    fd.write(header)
+            raise
+
+        self.total_rows = bands[0]["time"].shape[0] + bands[1]["time"].shape[0] + rows_1.shape[0]
+        write_functions = [
+                            partial(csv_io.write_single_csv, band=bands[0], label_timeline=self.label_timeline,
+                                    base_time=self.base_time),
+                            partial(csv_io.write_single_csv, band=bands[1], label_timeline=self.label_timeline,
+                                    base_time=self.base_time),
+                            partial(csv_io.write_all_csv, band_1=bands[0], band_2=bands[1], rows_1=rows_1,
+                                    rows_2=rows_2, label_timeline=self.label_timeline, base_time=self.base_time)
+                        ]
+        headers = [csv_io.SINGLE_HEADER, csv_io.SINGLE_HEADER, csv_io.ALL_HEADER]
+
+        with ThreadPoolExecutor(max_workers=len(file_paths)) as executor:
+            futures = [executor.submit(self.write_file, file_path, header, write_function)
+                       for file_path, header, write_function in zip(file_paths, headers, write_functions)]
+            for future in futures:
+                future.result()
+
+        return "Saved data from two Myo devices."
+
+    def write_file(self, file_path, header, write_function):
+        """
+        :param file_path: CSV file to create
+        :param header: Header line of the CSV file
+        :param write_function: A function of (fd, progress=...) that writes all rows
+        """
+        with open(file_path, "w") as fd:
+            fd.write(header)
+            write_function(fd, progress=partial(self.on_progress, file_path))
+
+    def on_progress(self, file_path, rows_written):
+        """
+            Update the progress dialog (called from any file writing thread).
+
+        :param file_path: CSV file being written
+        :param rows_written: Number of rows written to the file so far
+        """
+        with self.progress_lock:
+            self.rows_written[file_path] = rows_written
+            progress = int(100 * sum(self.rows_written.values()) / max(self.total_rows, 1))
+
+            if progress != self.cur_progress:
+                self.cur_progress = progress
+                QMetaObject.invokeMethod(self.progress_dialog, "setValue", Qt.QueuedConnection,
+                                         Q_ARG(int, min(progress, 99)))
+
+
+class NinaProExportWorker(QRunnable):
+    """
+        A background Qt thread that exports all data collected as NinaPro-style arrays (see
+            "pymyolinux.session.ninapro"), directly from the collected data (without a CSV round trip).
+    """
+
+    def __init__(self, data_directory, myo_data, base_time, progress_dialog, on_complete, on_failed):
+        """
+        :param data_directory: Directory in which to save files (NINAPRO_FILENAMES)
+        :param myo_data: A MyoData object, holding all data collected from both Myo armbands (captured on creation)
+        :param base_time: Saved times are relative to this time
+        :param progress_dialog: A QProgressDialog (range of 0 - 100)
+        :param on_complete: A function called with a message, upon completion
+        :param on_failed: A function called with an error message, if data could not be saved
+        """
+        super().__init__()
+        self.data_directory     = data_directory
+        self.base_time          = base_time
+        self.progress_dialog    = progress_dialog
+        self.update             = ExportUpdate()
+        self.update.exportComplete.connect(on_complete)
+        self.update.exportFailed.connect(on_failed)
+
+        # Capture data collected so far (converted to arrays in run())
+        self.snapshots      = [myo_data.band_1.snapshot(), myo_data.band_2.snapshot()]
+        self.data_mapping   = spill.as_array(myo_data.data_mapping, dtype=np.int64)
+        self.label_timeline = myo_data.label_timeline.copy()
+        self.invalid_map    = myo_data.invalid_map
+
+        # States
+        self.complete = False
+
+    def run(self):
+        try:
+            message = self.export()
+        except (OSError, ValueError, ImportError) as e:
+            self.complete = True
+            self.update.exportFailed.emit(str(e))
+            return
+
+        self.complete = True
+        self.update.exportComplete.emit(message)
+
+    def export(self):
+        """
+        :return: [str] A message describing data saved
+        """
+        bands = [DataTools.MyoData.ArmbandData.snapshot_arrays(snapshot) for snapshot in self.snapshots]
+        bands = [band for band in bands if band["time"].shape[0] > 0]
+
+        if len(bands) == 2:
+            rows = list(csv_io.synchronized_rows(bands[0]["time"], bands[1]["time"], self.data_mapping,
+                                                 BUFFER_PERIOD, self.invalid_map))
+        else:
+            rows = [np.arange(band["time"].shape[0]) for band in bands]
+
+        arrays = ninapro.ninapro_arrays(bands, rows, self.label_timeline, self.base_time)
+        self.set_progress(50)
+
+        for i, file_name in enumerate(NINAPRO_FILENAMES):
+            ninapro.save_ninapro(join(self.data_directory, file_name), arrays)
+            self.set_progress(50 + 50 * (i + 1) // len(NINAPRO_FILENAMES))
+
+        return "Exported NinaPro data from {} Myo device{}.".format(len(bands), "s" if len(bands) > 1 else "")
+
+    def set_progress(self, progress):
+        QMetaObject.invokeMethod(self.progress_dialog, "setValue", Qt.QueuedConnection, Q_ARG(int, min(progress, 99)))
+
+
 class MyoSearchWorker(QRunnable):
     """
         A background Qt thread that:
@@ -2143,7 +2891,7 @@ class GroundTruthWorker(QRunnable):
 
     def __init__(self, status_label, progress_label, desc_title, desc_explain, cur_movement, video_player,
                  all_video_paths, collect_duration, rest_duration, num_reps, on_worker_started, on_worker_unpaused,
-                 on_worker_paused, on_worker_stopped):
+                 on_worker_paused, on_worker_stopped, on_label_changed):
         """
         :param status_label: A QLabel displaying a message of what the GT Helper is currently performing.
         :param progress_label:  A QLabel displaying the current progress of data collection.
@@ -2159,9 +2907,11 @@ class GroundTruthWorker(QRunnable):
         :param on_worker_unpaused: A callback function used once this background worker has unpaused.
         :param on_worker_paused: A callback function used once this background worker has paused.
         :param on_worker_stopped: A callback function used once this background worker has stopped.
+        :param on_label_changed: A function called (from this worker's thread) on each ground truth label update.
         """
         super().__init__()
 
+        self.on_label_changed   = on_label_changed
         self.status_label       = status_label
         self.progress_label     = progress_label
         self.desc_title         = desc_title
@@ -2267,7 +3017,7 @@ class GroundTruthWorker(QRunnable):
                 QMetaObject.invokeMethod(self.status_label, "setStyleSheet", Qt.QueuedConnection,
                                          Q_ARG(str, "font-weight: bold; font-size: 18pt; color: blue;"))
                 self.play_video(video_path, self.preparation_period)
-                self.current_label = None
+                self.change_label(None)
 
                 while self.video_playing or (self.paused and not self.stopped):
                     time.sleep(self.timer_interval / 1000)
@@ -2303,12 +3053,12 @@ class GroundTruthWorker(QRunnable):
                         QMetaObject.invokeMethod(self.status_label, "setStyleSheet", Qt.QueuedConnection,
                                                  Q_ARG(str, "font-weight: bold; font-size: 18pt; color: orange;"))
                         self.play_video(video_path, self.rest_duration)
-                        self.current_label = 0
+                        self.change_label(0)
 
                         while self.video_playing or (self.paused and not self.stopped):
                             time.sleep(self.timer_interval / 1000)
                     else:
-                        self.current_label = None
+                        self.change_label(None)
 
                     if self.stopped:
                         break
@@ -2365,11 +3115,19 @@ class GroundTruthWorker(QRunnable):
         :param movement_num: [int] Movement number
         """
         if ex_label == "A":
-            self.current_label = movement_num
+            self.change_label(movement_num)
         elif ex_label == "B":
-            self.current_label = movement_num + self.num_class_A
+            self.change_label(movement_num + self.num_class_A)
         else:
-            self.current_label = movement_num + self.num_class_A + self.num_class_B
+            self.change_label(movement_num + self.num_class_A + self.num_class_B)
+
+    def change_label(self, label):
+        """
+            Updates the ground truth label, and notifies listeners of the transition.
+        :param label: [int] New ground truth label (None: no valid label)
+        """
+        self.current_label = label
+        self.on_label_changed()
 
     def stop_state(self):
         """
@@ -0,0 +1,205 @@
+#
+# Imports for online prediction tasks
+#
+import numpy as np
+
+
+########################################################################################################################
+########################################################################################################################
+########################################################################################################################
+#
+# Time-domain EMG features (computed incrementally, for sliding windows)
+#
+########################################################################################################################
+########################################################################################################################
+########################################################################################################################
+
+class TimeDomainFeatures():
+    """
+        Classic time-domain EMG features, per channel: mean absolute value (MAV), root mean square (RMS), waveform
+            length (WL), zero crossings (ZC), slope sign changes (SSC), and a histogram (HIST).
+
+            > Can be used as the feature extractor of a ClassifierModel ("extract_feature_point").
+            > For sliding windows, features are updated as samples enter and leave the window ("update", "features"):
+                each feature is a sum of terms of one sample (MAV, RMS, HIST), two consecutive samples (WL, ZC), or
+                three consecutive samples (SSC), so only the terms of entering/leaving samples are computed, in
+                O(number of channels) per sample. Sums are exact for integer-valued samples (e.g. Myo EMG).
+            > Features are ordered by type: MAV (per channel), RMS, WL, ZC, SSC, then HIST (bins of each channel).
+    """
+
+    def __init__(self, window_samples=200, zc_threshold=0, ssc_threshold=0, hist_bins=10, hist_range=(-128, 128)):
+        """
+        :param window_samples: Sliding window length (number of samples), at least 3
+        :param zc_threshold: Consecutive samples of opposite sign must differ by at least this much (to count a ZC)
+        :param ssc_threshold: Products of slopes must exceed this value (to count a SSC)
+        :param hist_bins: Number of histogram bins
+        :param hist_range: (min, max) of histogram bins, samples outside of this range are counted in the edge bins
+        """
+        if window_samples < 3:
+            raise ValueError("A window of at least 3 samples is required.")
+
+        self.window_samples = window_samples
+        self.zc_threshold   = zc_threshold
+        self.ssc_threshold  = ssc_threshold
+        self.hist_bins      = hist_bins
+        self.hist_range     = hist_range
+        self.reset()
+
+    def copy(self, window_samples=None):
+        """
+        :param window_samples: Sliding window length of the copy (None: the same length)
+        :return: [TimeDomainFeatures] A new extractor with the same parameters (and an empty sliding window)
+        """
+        return TimeDomainFeatures(self.window_samples if window_samples is None else window_samples,
+                                  self.zc_threshold, self.ssc_threshold, self.hist_bins, self.hist_range)
+
+    def reset(self):
+        """
+            Remove all samples from the sliding window.
+        """
+        self.count  = 0         # Number of samples received (sample i is held at self.ring[i % window_samples])
+        self.ring   = None
+        self.sums   = None      # Sums of terms of each feature (in the window), see "term_sums"
+
+    ####################################################################################################################
+    #
+    # Feature terms
+    #
+    ####################################################################################################################
+
+    def term_sums(self, samples, sample_range, pair_range, triple_range):
+        """
+            Sum the terms of (a range of) samples, pairs and triples of consecutive samples.
+
+        :param samples: Consecutive samples, shape (N, number of channels)
+        :param sample_range: (start, end) -> Terms of samples[start:end] (MAV, RMS, HIST)
+        :param pair_range: (start, end) -> Terms of pairs ending at samples[start:end] (WL, ZC)
+        :param triple_range: (start, end) -> Terms of triples ending at samples[start:end] (SSC)
+        :return: [np.ndarray] Sums of terms, in the order of features (MAV/RMS terms are not normalized)
+        """
+        num_channels    = samples.shape[1]
+        low, high       = self.hist_range
+
+        # Histogram bin of each sample, offset by channel (bins of all channels are counted at once)
+        single          = samples[sample_range[0]:sample_range[1]]
+        bins            = ((single - low) * (self.hist_bins / (high - low))).astype(np.int64)
+        bins            = np.minimum(np.maximum(bins, 0), self.hist_bins - 1)
+        bins           += np.arange(0, num_channels * self.hist_bins, self.hist_bins)
+        hist            = np.bincount(bins.reshape(-1), minlength=num_channels * self.hist_bins)
+
+        start, end      = pair_range
+        first, second   = samples[start - 1:end - 1], samples[start:end]
+        diff            = np.abs(second - first)
+
+        start, end      = triple_range
+        prev, center    = samples[start - 2:end - 2], samples[start - 1:end - 1]
+        following       = samples[start:end]
+
+        return np.concatenate((np.abs(single).sum(axis=0), (single * single).sum(axis=0), diff.sum(axis=0),
+                               ((first * second < 0) & (diff >= self.zc_threshold)).sum(axis=0),
+                               ((center - prev) * (center - following) > self.ssc_threshold).sum(axis=0), hist))
+
+    def window_sums(self, samples):
+        """
+        :param samples: All samples of a window, shape (N, number of channels)
+        :return: [np.ndarray] Sums of terms of the window (see "term_sums")
+        """
+        num_samples = samples.shape[0]
+        return self.term_sums(samples, (0, num_samples), (min(1, num_samples), num_samples),
+                              (min(2, num_samples), num_samples))
+
+    def to_features(self, sums, num_samples, num_channels):
+        """
+        :param sums: Sums of terms of a window (see "term_sums")
+        :param num_samples: Number of samples in the window
+        :param num_channels: Number of channels
+        :return: [np.ndarray] Features of the window -> MAV, RMS (per channel), WL, ZC, SSC, HIST (bins per channel)
+        """
+        features                            = sums.astype(np.float64)
+        features[:num_channels]            /= max(num_samples, 1)
+        features[num_channels:2 * num_channels] = np.sqrt(features[num_channels:2 * num_channels] / max(num_samples, 1))
+        return features
+
+    ####################################################################################################################
+    #
+    # Feature extraction
+    #
+    ####################################################################################################################
+
+    def extract_feature_point(self, raw_samples):
+        """
+            Extract features of a single window (all samples of the window, as ClassifierModel feature extractors).
+
+        :param raw_samples: EMG samples, shape (N, number of channels), or a list of EMG, ACC and GYRO samples (the mean
+                                of each ACC/GYRO channel is appended to EMG features)
+        :return: [np.ndarray] Features
+        """
+        if isinstance(raw_samples, (list, tuple)):
+            imu         = [np.asarray(x, dtype=np.float64).mean(axis=0) for x in raw_samples[1:]]
+            raw_samples = raw_samples[0]
+        else:
+            imu         = []
+
+        samples = np.asarray(raw_samples, dtype=np.float64)
+        return np.concatenate([self.to_features(self.window_sums(samples), samples.shape[0], samples.shape[1])] + imu)
+
+    def update(self, new_samples):
+        """
+            Add samples to the sliding window (the oldest samples leave the window, once full).
+
+        :param new_samples: New EMG samples, shape (N, number of channels)
+        """
+        new_samples = np.asarray(new_samples, dtype=np.float64)
+        num_new     = new_samples.shape[0]
+        if num_new == 0:
+            return
+
+        window = self.window_samples
+        if (self.ring is None) or (num_new >= window):
+            # (Re)start from the latest samples
+            if self.ring is None:
+                self.ring = np.zeros((window, new_samples.shape[1]))
+            latest      = new_samples[-window:]
+            self.count += num_new
+            self.sums   = self.window_sums(latest)
+            self.ring[np.arange(self.count - latest.shape[0], self.count) % window] = latest
+            return
+
+        count       = self.count
+        new_count   = count + num_new
+        old_start   = max(count - window, 0)
+        new_start   = max(new_count - window, 0)
+
+        def samples_between(start, end):
+            # Consecutive samples (by index), received before or within "new_samples"
+            return np.concatenate((self.ring[np.arange(start, min(end, count)) % window],
+                                   new_samples[max(start, count) - count:max(end, count) - count]))
+
+        #
+        # Entering terms: new samples, pairs/triples ending with a new sample
+        #
+        entering    = samples_between(max(count - 2, 0), new_count)
+        first_new   = count - max(count - 2, 0)
+        self.sums   = self.sums + self.term_sums(entering, (first_new, entering.shape[0]),
+                                                 (max(first_new, 1), entering.shape[0]),
+                                                 (max(first_new, 2), entering.shape[0]))
+
+        #
+        # Leaving terms: samples leaving the window, pairs/triples starting with a leaving sample
+        #
+        num_leaving = new_start - old_start
+        if num_leaving > 0:
+            leaving     = samples_between(old_start, new_start + 2)
+            self.sums   = self.sums - self.term_sums(leaving, (0, num_leaving), (1, num_leaving + 1),
+                                                     (2, num_leaving + 2))
+
+        self.ring[np.arange(count, new_count) % window] = new_samples
+        self.count = new_count
+
+    def features(self):
+        """
+        :return: [np.ndarray] Features of the sliding window (the latest "window_samples" samples), None if empty
+        """
+        if self.sums is None:
+            return None
+        return self.to_features(self.sums, min(self.count, self.window_samples), self.ring.shape[1])
@@ -19,6 +19,7 @@ from param import *
 from data_tools import DataTools
 from online_train import OnlineTraining
 from online_test import OnlineTesting
+from model_registry import ModelRegistry
 
 ########################################################################################################################
 ########################################################################################################################
@@ -89,8 +90,13 @@ class TopLevel(QWidget):
 
         self.data_tools_tab         = DataTools(self.on_device_connected, self.on_device_disconnected,
                                                     self.is_data_tools_open)
-        self.online_training_tab    = OnlineTraining(self.data_tools_tab.data_collected)
-        self.online_pred_tab        = OnlineTesting(self.data_tools_tab.data_collected)
+        # Models selected by online training/testing are loaded once (in the background), and shared
+        self.model_registry         = ModelRegistry(int(round(SLIDING_WINDOW_MS / 1000 * 200)), MODEL_WARMUP_WINDOWS,
+                                                    MODEL_PROFILE_RUNS, max_entries=MODEL_REGISTRY_SIZE,
+                                                    in_process=not INFERENCE_PROCESS)
+        self.online_training_tab    = OnlineTraining(self.data_tools_tab.data_collected, self.on_model_trained,
+                                                     self.model_registry)
+        self.online_pred_tab        = OnlineTesting(self.data_tools_tab.data_collected, self.model_registry)
 
         self.tool_tabs.addTab(self.data_tools_tab, "Data Collection")
         self.tool_tabs.addTab(self.online_training_tab, "Online Training")
@@ -120,6 +126,14 @@ class TopLevel(QWidget):
         self.online_pred_tab.device_disconnected(address)
         self.online_training_tab.device_disconnected(address)
 
+    def on_model_trained(self, pred_model):
+        """
+            Called when online training updates a model
+
+        :param pred_model: The updated model, may be used by online predictions (if running)
+        """
+        self.online_pred_tab.on_model_trained(pred_model)
+
     def on_tab_changed(self, value):
         """
             Intercepts a user attempting to switch tabs (to ensure a valid tab switch is taking place)
@@ -0,0 +1,332 @@
+#
+# Imports for online prediction tasks
+#
+import numpy as np
+
+try:
+    import cPickle as pickle
+except:
+    import pickle
+
+#
+# Miscellaneous imports
+#
+import multiprocessing
+import threading
+from concurrent.futures import Future
+from queue import Queue
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None    # Python < 3.8, inference runs in the calling process
+
+
+########################################################################################################################
+########################################################################################################################
+########################################################################################################################
+#
+# Feature extraction & classification (shared by the GUI, and the inference process)
+#
+########################################################################################################################
+########################################################################################################################
+########################################################################################################################
+
+def extract_features(feat_extractor, windows):
+    """
+        Extract features of a batch of windows (e.g. all windows pending classification), to be classified at once.
+
+    :param feat_extractor: The feature extractor of a prediction model (of type ClassifierModel)
+    :param windows: A list of windows, each an EMG array (window length, number of channels), or a list of EMG, ACC and
+                        GYRO arrays
+    :return: [np.ndarray] Features, shape (number of windows, number of features)
+    """
+    return np.array([feat_extractor.extract_feature_point(window).reshape(-1) for window in windows])
+
+
+def classify(pred_model, windows):
+    """
+    :param pred_model: A prediction model (of type ClassifierModel)
+    :param windows: A list of windows (see "extract_features")
+    :return: [np.ndarray] Class probabilities, shape (number of windows, number of classes)
+    """
+    return classify_features(pred_model, extract_features(pred_model.feat_extractor, windows))
+
+
+def classify_features(pred_model, features):
+    """
+    :param pred_model: A prediction model (of type ClassifierModel)
+    :param features: Features of each window, shape (number of windows, number of features)
+    :return: [np.ndarray] Class probabilities, shape (number of windows, number of classes)
+    """
+    return np.asarray(pred_model.get_class_probabilities(np.asarray(features)))
+
+
+def synthetic_windows(num_windows, window_samples, use_imu=False, seed=0):
+    """
+        Windows of random samples, in the range of Myo data (e.g. to warm up, or profile, a prediction model).
+
+    :param num_windows: Number of windows
+    :param window_samples: Number of samples per window
+    :param use_imu: Windows include ACC and GYRO samples (see "extract_features")
+    :param seed: Random seed
+    :return: [list] Windows
+    """
+    rng     = np.random.RandomState(seed)
+    windows = []
+    for i in range(num_windows):
+        emg = rng.randint(-128, 128, (window_samples, 16)).astype(np.float64)
+        if use_imu:
+            windows.append([emg, rng.normal(0, 1, (window_samples, 6)), rng.normal(0, 100, (window_samples, 6))])
+        else:
+            windows.append(emg)
+    return windows
+
+
+def classify_slots(pred_model, slots, slot_windows):
+    """
+    :param pred_model: A prediction model (of type ClassifierModel)
+    :param slots: Shared memory slots, shape (number of slots, rows per slot, columns per slot)
+    :param slot_windows: A list of (slot, number of rows, number of columns, column splits) of each window
+    :return: [np.ndarray] Class probabilities of each window (see "classify")
+    """
+    windows = []
+    for slot, num_rows, num_cols, splits in slot_windows:
+        window = slots[slot, :num_rows, :num_cols]
+        windows.append(window if splits is None else np.split(window, splits, axis=1))
+    return classify(pred_model, windows)
+
+
+def inference_server(pickled_model, shm_name, slots_shape, connection):
+    """
+        The inference process: classifies windows held in shared memory slots, on request, until a None request.
+
+            > Requests are (request id, [(slot, number of rows, number of columns, column splits), ...], features), replies
+                are (request id, class probabilities, error message). Requests of (already extracted) features hold
+                no slots, features are sent along with the request.
+
+    :param pickled_model: A pickled prediction model (of type ClassifierModel)
+    :param shm_name: Name of the shared memory block holding all slots
+    :param slots_shape: (number of slots, rows per slot, columns per slot)
+    :param connection: A multiprocessing Connection, requests are received (and replies sent) through it
+    """
+    pred_model  = pickle.loads(pickled_model)
+    shm         = shared_memory.SharedMemory(name=shm_name)
+    slots       = np.ndarray(slots_shape, dtype=np.float64, buffer=shm.buf)
+
+    try:
+        while True:
+            request = connection.recv()
+            if request is None:
+                break
+
+            request_id, slot_windows, features = request
+            try:
+                if features is None:
+                    prob_dists = classify_slots(pred_model, slots, slot_windows)
+                else:
+                    prob_dists = classify_features(pred_model, features)
+                connection.send((request_id, prob_dists, None))
+            except Exception as e:
+                connection.send((request_id, None, "{}: {}".format(e.__class__.__name__, e)))
+    finally:
+        del slots
+        shm.close()
+
+
+class InferenceService():
+    """
+        Runs a prediction model in a separate process, so that feature extraction and classification do not hold the
+            GIL of the GUI process (serial readers, Qt event loop).
+
+            > Windows are copied into slots of a shared memory block, only slot indices cross the process boundary.
+            > Predictions are returned asynchronously, as Futures (see "submit").
+            > Without multiprocessing.shared_memory (Python < 3.8), or if "in_process" is set, windows are classified
+                in the calling thread.
+    """
+
+    def __init__(self, pred_model, slot_rows, num_slots, slot_cols=28, in_process=False):
+        """
+        :param pred_model: The loaded prediction model (of type ClassifierModel)
+        :param slot_rows: Maximum number of samples per window
+        :param num_slots: Maximum number of windows pending classification (submit blocks until slots are free)
+        :param slot_cols: Maximum number of channels per window (by default, EMG/ACC/GYRO channels of two devices)
+        :param in_process: Classify windows in the calling thread
+        """
+        self.pred_model     = pred_model
+        self.slots_shape    = (num_slots, slot_rows, slot_cols)
+        self.in_process     = in_process or (shared_memory is None)
+
+        # States
+        self.next_id        = 0
+        self.pending        = {}        # Request id -> (Future, slots used)
+        self.free_slots     = Queue()
+        self.send_lock      = threading.Lock()
+        self.closed         = False
+
+        if self.in_process:
+            return
+
+        self.shm    = shared_memory.SharedMemory(create=True, size=int(np.prod(self.slots_shape)) * 8)
+        self.slots  = np.ndarray(self.slots_shape, dtype=np.float64, buffer=self.shm.buf)
+        for slot in range(num_slots):
+            self.free_slots.put(slot)
+
+        # Avoid forking the GUI process (threads, Qt), the inference process starts from scratch
+        context                     = multiprocessing.get_context("spawn")
+        self.connection, child_conn = context.Pipe()
+        self.process                = context.Process(target=inference_server, daemon=True,
+                                                      args=(pickle.dumps(pred_model), self.shm.name, self.slots_shape,
+                                                            child_conn))
+        self.process.start()
+        child_conn.close()
+
+        self.reader = threading.Thread(target=self.read_replies, daemon=True)
+        self.reader.start()
+
+    def submit(self, windows):
+        """
+        :param windows: A list of windows, each an EMG array (window length, number of channels), or a list of EMG,
+                            ACC and GYRO arrays
+        :return: [Future] Class probabilities of each window, shape (number of windows, number of classes)
+        """
+        future = Future()
+        if self.in_process:
+            try:
+                future.set_result(classify(self.pred_model, windows))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        if self.closed:
+            future.set_exception(RuntimeError("The inference process is no longer running."))
+            return future
+        if len(windows) > self.slots_shape[0]:
+            raise ValueError("Too many windows ({}) for {} slots.".format(len(windows), self.slots_shape[0]))
+
+        # Copy windows to free slots
+        slot_windows = []
+        for window in windows:
+            if isinstance(window, (list, tuple)):
+                arrays = [np.asarray(x, dtype=np.float64) for x in window]
+                splits = np.cumsum([x.shape[1] for x in arrays])[:-1].tolist()
+                window = np.hstack(arrays)
+            else:
+                window = np.asarray(window, dtype=np.float64)
+                splits = None
+
+            if (window.shape[0] > self.slots_shape[1]) or (window.shape[1] > self.slots_shape[2]):
+                for slot_window in slot_windows:
+                    self.free_slots.put(slot_window[0])
+                raise ValueError("Window of shape {} exceeds slots of shape {}.".format(window.shape,
+                                                                                       self.slots_shape[1:]))
+
+            slot = self.free_slots.get()
+            self.slots[slot, :window.shape[0], :window.shape[1]] = window
+            slot_windows.append((slot, window.shape[0], window.shape[1], splits))
+
+        self.send_request(future, slot_windows, None)
+        return future
+
+    def warm_up(self, num_windows=1, use_imu=False):
+        """
+            Classify synthetic windows (as long as slots allow), so that the inference process pays any lazy
+                initialization of the model before predictions are made.
+
+        :param num_windows: Number of windows classified at once (at most the number of slots)
+        :param use_imu: Windows include ACC and GYRO samples
+        :return: [Future] See "submit"
+        """
+        return self.submit(synthetic_windows(min(num_windows, self.slots_shape[0]), self.slots_shape[1], use_imu))
+
+    def submit_features(self, features):
+        """
+            Classify features extracted by the caller (e.g. incrementally, see "features.TimeDomainFeatures").
+
+        :param features: Features of each window, shape (number of windows, number of features)
+        :return: [Future] Class probabilities of each window, shape (number of windows, number of classes)
+        """
+        future = Future()
+        if self.in_process:
+            try:
+                future.set_result(classify_features(self.pred_model, features))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        if self.closed:
+            future.set_exception(RuntimeError("The inference process is no longer running."))
+            return future
+
+        self.send_request(future, [], np.asarray(features, dtype=np.float64))
+        return future
+
+    def send_request(self, future, slot_windows, features):
+        """
+        :param future: The Future of the request, completed once a reply is received (see "read_replies")
+        :param slot_windows: Windows copied to slots, [(slot, number of rows, number of columns, column splits), ...]
+        :param features: Features of each window (None: windows are held in slots)
+        """
+        with self.send_lock:
+            request_id      = self.next_id
+            self.next_id   += 1
+            self.pending[request_id] = (future, [slot_window[0] for slot_window in slot_windows])
+            try:
+                self.connection.send((request_id, slot_windows, features))
+            except (OSError, ValueError):
+                self.pending.pop(request_id)
+                for slot_window in slot_windows:
+                    self.free_slots.put(slot_window[0])
+                future.set_exception(RuntimeError("The inference process is no longer running."))
+
+    def read_replies(self):
+        """
+            Complete Futures as replies arrive from the inference process (in a background thread).
+        """
+        while True:
+            try:
+                request_id, prob_dists, error = self.connection.recv()
+            except (EOFError, OSError):
+                break
+
+            with self.send_lock:
+                future, used_slots = self.pending.pop(request_id)
+            for slot in used_slots:
+                self.free_slots.put(slot)
+
+            if error is None:
+                future.set_result(prob_dists)
+            else:
+                future.set_exception(RuntimeError("Inference failed, {}".format(error)))
+
+        # The inference process has exited, fail outstanding requests
+        with self.send_lock:
+            self.closed = True
+            pending, self.pending = self.pending, {}
+        for future, used_slots in pending.values():
+            for slot in used_slots:
+                self.free_slots.put(slot)
+            future.set_exception(RuntimeError("The inference process is no longer running."))
+
+    def close(self):
+        """
+            Stop the inference process, and release shared memory.
+        """
+        if self.in_process or (self.shm is None):
+            return
+
+        try:
+            with self.send_lock:
+                self.connection.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.reader.join(5)
+        self.connection.close()
+
+        del self.slots
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
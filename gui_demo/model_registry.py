@@ -0,0 +1,241 @@
+#
+# Imports for online prediction tasks
+#
+import numpy as np
+
+try:
+    import cPickle as pickle
+except:
+    import pickle
+
+#
+# Miscellaneous imports
+#
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from os.path import abspath, getmtime
+
+from inference import InferenceService, synthetic_windows
+
+
+########################################################################################################################
+########################################################################################################################
+########################################################################################################################
+#
+# Prediction models, loaded in the background
+#
+########################################################################################################################
+########################################################################################################################
+########################################################################################################################
+
+class ModelEntry():
+    """
+        A loaded (and warmed up) prediction model, with its inference latency profile.
+    """
+
+    def __init__(self, file_path, mtime, model):
+        """
+        :param file_path: Absolute path of the pickled model
+        :param mtime: Modification time of the file, when loaded
+        :param model: The prediction model (of type ClassifierModel)
+        """
+        self.file_path      = file_path
+        self.mtime          = mtime
+        self.model          = model
+        self.load_time      = None  # Seconds spent unpickling the model
+        self.warmup_time    = None  # Seconds spent classifying the first batch of windows (None: not warmed up)
+        self.latencies      = {}    # Percentile -> latency of a single window (ms), see "ModelRegistry.profile"
+
+    def describe(self):
+        """
+        :return: [str] Model and feature extractor names, and latency percentiles (if profiled)
+        """
+        text = self.model.__class__.__name__
+        if hasattr(self.model, "feat_extractor"):
+            text += " - " + self.model.feat_extractor.__class__.__name__
+        if len(self.latencies) > 0:
+            text += " ({})".format(", ".join("p{} {:.1f} ms".format(percentile, latency)
+                                             for percentile, latency in sorted(self.latencies.items())))
+        return text
+
+
+class ModelRegistry():
+    """
+        Loads prediction models in a background thread, so that selecting a model does not block the GUI.
+
+            > Each model is unpickled, validated, warmed up on a batch of synthetic windows (so that lazy
+                initialization is not paid by the first prediction), then profiled: the latency of classifying
+                single windows is measured, and summarized as percentiles.
+            > Unless "in_process" is set, windows are classified by an inference process (see "InferenceService"),
+                as predictions are made, so that latencies include the round trip to the serving process (and the
+                GIL of the GUI process is not held by classification).
+            > Loaded models are kept (per file, until the file is modified), switching back to a model is immediate.
+                Models are shared by their users, and must not be modified (see "TrainingProcess").
+            > Only the "max_entries" most recently used models are kept (users keep their own reference to the
+                models they use).
+    """
+
+    def __init__(self, window_samples=200, warmup_windows=8, profile_runs=20, percentiles=(50, 90, 99),
+                 max_entries=4, in_process=False):
+        """
+        :param window_samples: Number of samples per synthetic window (e.g. the length of sliding windows)
+        :param warmup_windows: Number of windows classified (at once) to warm up a model
+        :param profile_runs: Number of single windows classified to measure latencies (0: no profiling)
+        :param percentiles: Latency percentiles recorded
+        :param max_entries: Number of loaded models kept, the least recently used are dropped beyond this
+        :param in_process: Warm up and profile models in the background thread (rather than in an inference process)
+        """
+        self.window_samples = window_samples
+        self.warmup_windows = warmup_windows
+        self.profile_runs   = profile_runs
+        self.percentiles    = percentiles
+        self.max_entries    = max(max_entries, 1)
+        self.in_process     = in_process
+
+        # States
+        self.entries        = OrderedDict()     # Absolute file path -> ModelEntry, least recently used first
+        self.loading        = {}    # Absolute file path -> Future of the ModelEntry being loaded
+        self.lock           = threading.Lock()
+        self.executor       = ThreadPoolExecutor(max_workers=1)
+
+    def load(self, file_path, required_member, on_loaded=None, on_error=None):
+        """
+        :param file_path: A pickled prediction model
+        :param required_member: The model must have this member (e.g. "perform_inference")
+        :param on_loaded: If not None, a function called with the ModelEntry (from a background thread, or directly if
+                            the model was loaded before)
+        :param on_error: If not None, a function called with an error message
+        :return: [Future] The ModelEntry (the exception is a ValueError if the model is invalid)
+        """
+        file_path = abspath(file_path)
+        try:
+            mtime = getmtime(file_path)
+        except OSError:
+            mtime = None
+
+        with self.lock:
+            entry = self.lookup(file_path, mtime)
+            if entry is not None:
+                future = Future()
+                future.set_result(entry)
+            else:
+                future = self.loading.get(file_path)
+                if future is None:
+                    future = self.executor.submit(self.prepare, file_path)
+                    self.loading[file_path] = future
+
+        def validate(done):
+            error = done.exception()
+            if (error is None) and (not hasattr(done.result().model, required_member)):
+                error = "Invalid model selected, no \"{}\" member available.".format(required_member)
+
+            if error is None:
+                if on_loaded is not None:
+                    on_loaded(done.result())
+            elif on_error is not None:
+                on_error(str(error))
+
+        future.add_done_callback(validate)
+        return future
+
+    def prepare(self, file_path):
+        """
+            Unpickle, warm up and profile a model (in the background thread).
+
+        :param file_path: Absolute path of a pickled prediction model
+        :return: [ModelEntry]
+        """
+        try:
+            start_time = time.perf_counter()
+            try:
+                mtime = getmtime(file_path)
+                with open(file_path, 'rb') as f:
+                    model = pickle.load(f)
+            except Exception:
+                raise ValueError("Pickle was unable to decode the selected file.")
+
+            entry           = ModelEntry(file_path, mtime, model)
+            entry.load_time = time.perf_counter() - start_time
+
+            if hasattr(model, "perform_inference"):
+                inference = None
+                try:
+                    inference = InferenceService(model, self.window_samples, max(self.warmup_windows, 1),
+                                                 in_process=self.in_process)
+                    self.warm_up(entry, inference)
+                    self.profile(entry, inference)
+                except Exception as e:
+                    raise ValueError("The selected model was unable to classify a window of {} samples ({}: {})."
+                                     .format(self.window_samples, e.__class__.__name__, e))
+                finally:
+                    if inference is not None:
+                        inference.close()
+
+            with self.lock:
+                self.entries[file_path] = entry
+                self.entries.move_to_end(file_path)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+            return entry
+        finally:
+            with self.lock:
+                self.loading.pop(file_path, None)
+
+    def warm_up(self, entry, inference):
+        """
+        :param entry: A ModelEntry, its model classifies a batch of synthetic windows
+        :param inference: An InferenceService of the model
+        """
+        start_time          = time.perf_counter()
+        inference.warm_up(self.warmup_windows).result()
+        entry.warmup_time   = time.perf_counter() - start_time
+
+    def profile(self, entry, inference):
+        """
+        :param entry: A ModelEntry, its latency percentiles are recorded (classifying single synthetic windows)
+        :param inference: An InferenceService of the model
+        """
+        if self.profile_runs <= 0:
+            return
+
+        latencies = []
+        for window in synthetic_windows(self.profile_runs, self.window_samples, seed=1):
+            start_time = time.perf_counter()
+            inference.submit([window]).result()
+            latencies.append((time.perf_counter() - start_time) * 1000)
+
+        entry.latencies = dict(zip(self.percentiles, np.percentile(latencies, self.percentiles).tolist()))
+
+    def get(self, file_path):
+        """
+        :param file_path: A pickled prediction model
+        :return: [ModelEntry] The loaded model, None if not loaded (or the file was modified since)
+        """
+        file_path = abspath(file_path)
+        try:
+            mtime = getmtime(file_path)
+        except OSError:
+            return None
+
+        with self.lock:
+            return self.lookup(file_path, mtime)
+
+    def lookup(self, file_path, mtime):
+        """
+            Find a loaded model, and mark it as most recently used (called with "lock" held).
+
+        :param file_path: Absolute path of a pickled prediction model
+        :param mtime: Modification time of the file
+        :return: [ModelEntry] The loaded model, None if not loaded (or the file was modified since, it is then dropped)
+        """
+        entry = self.entries.get(file_path)
+        if entry is None:
+            return None
+        if entry.mtime != mtime:
+            del self.entries[file_path]
+            return None
+
+        self.entries.move_to_end(file_path)
+        return entry
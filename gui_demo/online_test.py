@@ -4,7 +4,7 @@
 from PyQt5.QtWidgets import (QListWidget, QListWidgetItem, QProgressDialog, QFileDialog, QWidget, QLabel, QHBoxLayout,
                                 QVBoxLayout, QFrame, QMainWindow, QPushButton, QGridLayout, QSizePolicy, QGroupBox,
                                 QTextEdit, QLineEdit, QErrorMessage, QProgressBar, QStackedWidget, QTableWidget,
-                                QTableWidgetItem, QHeaderView)
+                                QTableWidgetItem, QHeaderView, QMessageBox)
 
 from PyQt5.QtGui import QPixmap, QIcon, QFont
 from PyQt5.QtCore import (QSize, QThreadPool, Qt, QRunnable, QMetaObject, Q_ARG, QObject, pyqtSignal, QTimer, QUrl,\
@@ -16,21 +16,19 @@ from PyQt5.QtMultimedia import QMediaPlayer, QMediaContent
 #
 # Imports for online prediction tasks
 #
-from scipy.signal import butter, lfilter
 from scipy.stats import multivariate_normal
 import numpy as np
 import ninaeval
 from ninaeval.utils.gt_tools import optimize_start_end
 
-try:
-    import cPickle as pickle
-except:
-    import pickle
-
 #
 # Miscellaneous imports
 #
+from collections import deque
+from concurrent import futures
 from enum import Enum
+from functools import partial
+import threading
 import time
 from os.path import curdir, exists, join, abspath
 
@@ -40,6 +38,10 @@ from os.path import curdir, exists, join, abspath
 from movements import *
 from param import *
 from shared_workers import *
+from signal_processing import threshold_scan
+from inference import InferenceService
+from features import TimeDomainFeatures
+from model_registry import ModelRegistry
 
 
 class OnlineTesting(QWidget):
@@ -333,9 +335,11 @@ class OnlineTesting(QWidget):
             infoLayout.setStretchFactor(self.battery_level, 2)
             self.setLayout(infoLayout)
 
-    def __init__(self, myo_data):
+    def __init__(self, myo_data, model_registry=None):
         """
         :param myo_data: All data collected from both Myo armband devices
+        :param model_registry: Loads selected models in the background (a ModelRegistry, may be shared with online
+                                training), None: a registry of this tab
         """
         super().__init__()
         self.myo_data = myo_data
@@ -351,6 +355,19 @@ class OnlineTesting(QWidget):
         self.classifier_model   = None
         self.noise_worker       = None
         self.pred_worker        = None
+        self.model_file         = None
+        self.model_description  = ""    # Name (and latency profile) of the model displayed
+        self.pending_swap       = None  # (swap id, model, description) of the model being swapped in while predicting
+
+        # Selected models are loaded, warmed up and profiled in the background (see "on_model_select")
+        if model_registry is None:
+            model_registry = ModelRegistry(int(round(SLIDING_WINDOW_MS / 1000 * 200)), MODEL_WARMUP_WINDOWS,
+                                           MODEL_PROFILE_RUNS, max_entries=MODEL_REGISTRY_SIZE,
+                                           in_process=not INFERENCE_PROCESS)
+        self.model_registry     = model_registry
+        self.model_updates      = ModelUpdates()
+        self.model_updates.modelLoaded.connect(self.on_model_loaded)
+        self.model_updates.loadFailed.connect(self.on_model_load_failed)
 
         #
         # For video playing
@@ -471,14 +488,19 @@ class OnlineTesting(QWidget):
         self.controls_pause.setStyleSheet("font-weight: bold")
         self.controls_stop  = QPushButton("Stop")
         self.controls_stop.setStyleSheet("font-weight: bold")
+        self.controls_model = QPushButton("Switch Model")
+        self.controls_model.setStyleSheet("font-weight: bold")
+        self.controls_model.clicked.connect(self.on_model_select)
         controls_layout.addWidget(self.controls_start, 0, 1)
         controls_layout.addWidget(self.controls_pause, 0, 2)
         controls_layout.addWidget(self.controls_stop, 0, 3)
+        controls_layout.addWidget(self.controls_model, 0, 4)
         controls_layout.setColumnStretch(0, 1)
         controls_layout.setColumnStretch(1, 1)
         controls_layout.setColumnStretch(2, 1)
         controls_layout.setColumnStretch(3, 1)
         controls_layout.setColumnStretch(4, 1)
+        controls_layout.setColumnStretch(5, 1)
         self.controls_box.setLayout(controls_layout)
 
         #
@@ -770,53 +792,76 @@ class OnlineTesting(QWidget):
         # Check if ready to start online testing
         self.check_ready_to_start()
 
+    def predicting(self):
+        """
+        :return: [bool] A background worker is making predictions (the controls box is shown until it stops)
+        """
+        return (self.pred_worker is not None) and (self.bottom_panel.currentIndex() == 1)
+
     def on_model_select(self):
         """
-            On press of the model select button, allow the user to select a model, and check for validity
+            On press of the model select (or switch) button, allow the user to select a model, which is loaded (and
+                checked for validity) in the background, see "on_model_loaded"
         """
 
         self.enable_pred_buttons(False, False)
-        dialog          = QFileDialog()
-        self.model_file = dialog.getOpenFileName(self, 'Choose Model')[0]
+        self.controls_model.setEnabled(False)
+        dialog      = QFileDialog()
+        model_file  = dialog.getOpenFileName(self, 'Choose Model')[0]
 
-        if len(self.model_file) == 0:
+        if len(model_file) == 0:
             self.enable_pred_buttons(True, True)
+            self.controls_model.setEnabled(True)
             return
 
-        # Clear states
-        self.valid_model    = False
-        self.samples_field.setText("")
-        self.model_name.setText("")
-        self.classifier_model = None
+        # Clear states (while making predictions, the current model is used until the selected model is loaded)
+        self.model_file = abspath(model_file)
+        if not self.predicting():
+            self.valid_model        = False
+            self.classifier_model   = None
+            self.model_description  = ""
+            self.samples_field.setText("")
+        self.model_name.setText("Loading...")
 
-        try:
-            with open(self.model_file, 'rb') as f:
-                self.classifier_model = pickle.load(f)
-        except:
-            self.warn_user("Pickle was unable to decode the selected file.")
-            self.enable_pred_buttons(True, True)
-            return
+        self.model_registry.load(self.model_file, "perform_inference", self.model_updates.modelLoaded.emit,
+                                 partial(self.model_updates.loadFailed.emit, self.model_file))
 
-        valid_model = hasattr(self.classifier_model, "perform_inference")
-        if not valid_model:
-            self.warn_user("Invalid model selected, no \"perform_inferfence\" member available.")
-            self.enable_pred_buttons(True, True)
-            return
+    def on_model_loaded(self, entry):
+        """
+            Called once a selected model is loaded, warmed up and profiled (see "ModelRegistry")
 
-        self.valid_model    = True
-        model_name          = self.classifier_model.__class__.__name__
-        feat_name           = self.classifier_model.feat_extractor.__class__.__name__
-        self.model_name.setText(model_name + " - " + feat_name)
+        :param entry: The ModelEntry of the model
+        """
+        if entry.file_path != self.model_file:
+            return
 
-        if self.classifier_model.num_samples is None:
-            self.samples_field.setText("N/A")
-        else:
-            self.samples_field.setText(str(self.classifier_model.num_samples))
+        self.valid_model = True
         self.enable_pred_buttons(True, True)
+        self.controls_model.setEnabled(True)
+
+        if self.predicting():
+            # The new inference process starts up (and is warmed up) in the background, predictions continue meanwhile
+            self.request_swap(entry.model, entry.describe())
+            return
+
+        self.show_model(entry.model, entry.describe())
 
         # Check if ready to start online testing
         self.check_ready_to_start()
 
+    def on_model_load_failed(self, file_path, message):
+        """
+        :param file_path: The selected model
+        :param message: Why the model could not be used
+        """
+        if file_path != self.model_file:
+            return
+
+        self.warn_user(message)
+        self.model_name.setText(self.model_description if self.pending_swap is None else "Switching...")
+        self.enable_pred_buttons(True, True)
+        self.controls_model.setEnabled(True)
+
     def check_ready_to_start(self):
         """
             Check if we are ready to start online testing, if so, enable the start button for online testing
@@ -899,6 +944,11 @@ class OnlineTesting(QWidget):
         if self.min_pred_duration < 250/200:
             return self.throw_error_message("Please pick a minimum duration greater than {}.".format(250/200))
 
+        # Similarly, each window classified in continuous (sliding window) mode needs at least 200 samples
+        if SLIDING_WINDOW_MODE and (SLIDING_WINDOW_MS < 1000):
+            return self.throw_error_message("Please pick a sliding window length (SLIDING_WINDOW_MS) of at least "
+                                            "1000 ms.")
+
         ################################################################################################################
 
         control_box_idx = 1
@@ -921,6 +971,7 @@ class OnlineTesting(QWidget):
 
         # Start background worker, reponsible for gesture detection
         self.prediction_visualization.show()
+        self.pending_swap = None
         self.pred_worker = GesturePredictionWorker(self.myo_data, self.noise_worker.smooth_avg,
                                                     self.noise_worker.smooth_std, self.classifier_model,
                                                     self.status_label, self.progress_label, self.desc_title,
@@ -929,6 +980,7 @@ class OnlineTesting(QWidget):
                                                     self.timer, self.close_prediction_worker, self.min_pred_duration,
                                                     self.max_pred_duration, self.worker_prediction
                                                    )
+        self.pred_worker.worker_event.onModelSwapped.connect(self.on_model_swapped)
         QThreadPool.globalInstance().start(self.pred_worker)
 
     def close_prediction_worker(self):
@@ -961,6 +1013,70 @@ class OnlineTesting(QWidget):
         self.prediction_visualization.display_predictions(self.pred_worker.class_probabilities,
                                                             self.pred_worker.num_samples_used)
 
+    def on_model_trained(self, pred_model):
+        """
+            Called with each model updated by online training, which may replace the model making predictions.
+
+        :param pred_model: The updated model (of type ClassifierModel)
+        """
+        if (self.pred_worker is None) or (not self.pred_worker.running):
+            return
+        if not hasattr(pred_model, "perform_inference"):
+            return
+
+        response = QMessageBox.question(self, "Model Updated", "Would you like to make predictions with the updated "
+                                                               "model?", QMessageBox.Yes | QMessageBox.No)
+        if response != QMessageBox.Yes:
+            return
+
+        # The new inference process starts up in the background, predictions continue meanwhile
+        self.request_swap(pred_model, "{} - {} (updated)".format(pred_model.__class__.__name__,
+                                                                 pred_model.feat_extractor.__class__.__name__))
+
+    def request_swap(self, pred_model, description):
+        """
+            Have the background worker make predictions with another model, the model is displayed once swapped in
+                (see "on_model_swapped").
+
+        :param pred_model: The new prediction model (of type ClassifierModel)
+        :param description: Name of the model, to display
+        """
+        self.pending_swap = (self.pred_worker.request_swap(pred_model), pred_model, description)
+        self.model_name.setText("Switching...")
+
+    def on_model_swapped(self, swap_id, swapped):
+        """
+            Called once the background worker is done swapping in a model (see "GesturePredictionWorker.request_swap")
+
+        :param swap_id: Id of the swap
+        :param swapped: True if the model makes predictions, False if the previous model still does
+        """
+        if (self.pending_swap is None) or (self.pending_swap[0] != swap_id):
+            return  # Superseded by a later swap
+
+        _, pred_model, description = self.pending_swap
+        self.pending_swap = None
+
+        if swapped:
+            self.show_model(pred_model, description)
+        else:
+            self.model_name.setText(self.model_description)
+            self.warn_user("The model was unable to make predictions, the previous model is still used.")
+
+    def show_model(self, pred_model, description):
+        """
+        :param pred_model: The prediction model used (of type ClassifierModel)
+        :param description: Name of the model, to display
+        """
+        self.classifier_model   = pred_model
+        self.model_description  = description
+        self.model_name.setText(description)
+
+        if pred_model.num_samples is None:
+            self.samples_field.setText("N/A")
+        else:
+            self.samples_field.setText(str(pred_model.num_samples))
+
     def warn_user(self, message):
         """
             Generates a pop-up warning message
@@ -998,8 +1114,9 @@ class GesturePredictionWorker(QRunnable):
         InvalidMedia        = 8
 
     class GPWSignal(QObject):
-        onShutdown   = pyqtSignal()
-        onPrediction = pyqtSignal()
+        onShutdown      = pyqtSignal()
+        onPrediction    = pyqtSignal()
+        onModelSwapped  = pyqtSignal(int, bool)     # (swap id, model swapped in), see "request_swap"
 
     def __init__(self, myo_data, smooth_avg, smooth_std, pred_model, status_label, progress_label, desc_title,
                     desc_explain, video_player, enable_control_buttons, controls_start, controls_pause,
@@ -1076,7 +1193,7 @@ class GesturePredictionWorker(QRunnable):
         self.max_samples    = 2000   # 5 seconds
         self.trim_samples   = 200
         self.detect_window  = 400 / 1000
-        self.check_period   = 50 / 1000
+        self.check_period   = 50 / 1000     # Maximum time to wait for new data (before checking for a stop)
         self.setup_time     = 2000 / 1000
         self.wait_period    = 1000 / 1000  # Wait for movement signal to die out
         self.min_duration   = 2000 / 1000
@@ -1085,17 +1202,37 @@ class GesturePredictionWorker(QRunnable):
         self.rest_label     = 0
         self.use_imu        = False
 
+        # Configurable parameters (continuous, sliding window classification mode)
+        self.sliding_window = SLIDING_WINDOW_MODE
+        self.window_samples = int(round(SLIDING_WINDOW_MS / 1000 * self.emg_rate))
+        self.hop_samples    = max(int(round(SLIDING_HOP_MS / 1000 * self.emg_rate)), 1)
+        self.vote_windows   = max(SLIDING_VOTE_WINDOWS, 1)
+        self.max_pending    = 40    # If classification falls behind, only this many of the latest windows are
+                                    #   classified
+        self.max_in_flight  = 1     # Batches (of windows) submitted for classification at a time, windows arriving
+                                    #   meanwhile join the next batch (more batches only queue in the inference process)
+
         # States
         self.cur_count      = 0
         self.err_count      = 0
         self.running        = False
         self.emg_list       = []
+        self.filt_data      = None  # Filtered (rectified) self.emg_list, see "PreprocessingStage"
+        self.filt_origin    = None  # Row (of the preprocessing stage) of self.emg_list[0], filtering starts there
+        self.emg_times      = []    # Timestamp of each sample of self.emg_list (first device)
+        self.latencies      = []    # Onset detection latencies (sample completing a detection -> detection)
+        self.decision_latencies = []  # Sliding window mode: latencies (last sample of a window -> decision)
         self.acc_list       = []
         self.gyro_list      = []
         self.mag_list       = []
         self.last_end_idx   = None
         self.playing        = False
         self.started        = False
+        self.inference      = None  # Makes predictions, in a separate process (see "InferenceService")
+        self.retired        = []    # Inference services of previous models, closed once their predictions are made
+        self.model_lock     = threading.Lock()
+        self.swap_lock      = threading.Lock()  # Held while a model is swapped in (swaps are made one at a time)
+        self.swap_id        = 0     # Id of the latest swap requested (see "request_swap")
 
 
         #
@@ -1172,81 +1309,64 @@ class GesturePredictionWorker(QRunnable):
         """
 
         #
-        # Extract data in time window
+        # Extract data in time window (synchronized samples, preprocessed once for all consumers)
         #
         first_myo_data  = self.myo_data.band_1
         second_myo_data = self.myo_data.band_2
-        data_mapping    = self.myo_data.data_mapping
-
-        # Find start/end indices of first dataset
-        first_end_idx   = len(first_myo_data.timestamps) - 1
+        preprocessed    = self.myo_data.preprocessed
+        end_row         = preprocessed.num_rows - 1
 
-        # Skip seen samples
+        # Skip seen samples (rows of the preprocessing stage)
         if self.last_end_idx is not None:
-            new_emg_count   = first_end_idx - self.last_end_idx
-            first_start_idx = self.last_end_idx + 1
+            start_row = self.last_end_idx + 1
 
         # Get all samples within "detection window"
         else:
+            # Last sample received before the detection window
             start_time      = time.time()
-            idx             = first_end_idx
-            first_start_idx = None
+            window_start    = start_time - (self.detect_window + 2 * COPY_THRESHOLD)
+            start_row       = preprocessed.rows_between(window_start, start_time)[0] - 1
+            start_row       = min(max(start_row, preprocessed.first_row), end_row + 1)
 
-            while first_start_idx is None:
-                data_time = first_myo_data.timestamps[idx]
-
-                if (start_time - data_time > self.detect_window + 2 * COPY_THRESHOLD):
-                    first_start_idx = idx
-                else:
-                    idx -= 1
-
-            new_emg_count   = first_end_idx - first_start_idx + 1
+        new_emg_count = end_row - start_row + 1
 
         # Add new emg\imu samples:
-        for first_idx in range(first_start_idx, first_end_idx + 1):
-            sec_idx = data_mapping[first_idx]
-
-            if (sec_idx != self.myo_data.invalid_map) and (sec_idx < len(second_myo_data.timestamps)):
-                # EMG
-                first_emg   = [x[first_idx] for x in first_myo_data.emg]
-                second_emg  = [x[sec_idx] for x in second_myo_data.emg]
-                self.emg_list.append(first_emg + second_emg)
+        if self.filt_data is None:
+            self.filt_origin = start_row
+        new_emg     = preprocessed.get("emg", start_row, end_row + 1)
+        new_filt    = preprocessed.envelope(start_row, end_row + 1, self.filt_origin)
+        self.emg_list.extend(new_emg.tolist())
+        self.emg_times.extend(preprocessed.get("time", start_row, end_row + 1).tolist())
 
-                if self.use_imu:
-                    # ACC
-                    first_acc   = [x[first_idx] for x in first_myo_data.accel]
-                    second_acc  = [x[sec_idx] for x in second_myo_data.accel]
-                    self.acc_list.append(first_acc + second_acc)
+        if self.use_imu:
+            # IMU data is stored at its native rate, join it to the EMG samples
+            for first_idx, sec_idx in preprocessed.get("band_rows", start_row, end_row + 1).tolist():
+                first_mag, first_acc, first_gyro    = first_myo_data.imu_at(first_idx)
+                second_mag, second_acc, second_gyro = second_myo_data.imu_at(sec_idx)
 
-                    # GYRO
-                    first_gyro   = [x[first_idx] for x in first_myo_data.gyro]
-                    second_gyro  = [x[sec_idx] for x in second_myo_data.gyro]
-                    self.gyro_list.append(first_gyro + second_gyro)
+                # ACC
+                self.acc_list.append(first_acc + second_acc)
 
-                    # MAG
-                    # first_mag   = [x[first_idx] for x in first_myo_data.orient]
-                    # second_mag  = [x[sec_idx] for x in second_myo_data.orient]
-                    # self.mag_list.append(first_mag + second_mag)
+                # GYRO
+                self.gyro_list.append(first_gyro + second_gyro)
 
-        emg_samples = np.array(self.emg_list)
+                # MAG
+                # self.mag_list.append(first_mag + second_mag)
 
         #
-        # Apply sixth-order digital butterworth lowpass filter with 50 Hz cutoff frequency to rectified signal
+        # Rectified signal, filtered with a sixth-order digital butterworth lowpass filter (50 Hz cutoff frequency)
+        #   Note: Samples are filtered once, by the preprocessing stage, as if filtering started at self.emg_list[0]
         #
-        fs          = 200
-        nyquist     = 0.5 * fs
-        cutoff      = 50
-        order       = 6
-        b, a        = butter(order, cutoff / nyquist, btype='lowpass')
-        emg_samples = np.abs(emg_samples)
-        filt_data   = lfilter(b, a, emg_samples, axis=0)
+        if self.filt_data is None:
+            self.filt_data = new_filt
+        else:
+            self.filt_data = np.concatenate((self.filt_data, new_filt))
+        filt_data = self.filt_data
 
         #
-        # Use test function to determine onset/end of signal
+        # Use test function to determine onset/end of signal (all new samples are tested at once)
         #
-        max_idx         = emg_samples.shape[0] - 1
-        emg_start_idx   = None
-        max_count       = 0
+        max_idx = len(self.emg_list) - 1
 
         if self.last_end_idx is None:
             cur_idx = self.window_size
@@ -1258,43 +1378,30 @@ class GesturePredictionWorker(QRunnable):
         else:
             min_samples = self.min_rest_samples
 
-        while (emg_start_idx is None) and (cur_idx <= max_idx):
-
-            # Test for non-noise data
-            cur_test_func = (np.mean(filt_data[cur_idx - self.window_size: cur_idx],
-                                     axis=0) - self.smooth_avg) / self.smooth_std
-
-            success = np.any(np.greater(cur_test_func, self.h))
-            if not detect_start:
-                success = not success
-
-            # Keeps track of number of successes and failures
-            if success:
-                self.cur_count += 1
-            else:
-                self.err_count += 1
-
-            if self.err_count >= self.max_err:
-                self.err_count = 0
-                self.cur_count = 0
+        emg_start_idx, self.cur_count, self.err_count = threshold_scan(filt_data, cur_idx, self.window_size,
+                                                                       self.smooth_avg, self.smooth_std, self.h,
+                                                                       min_samples, self.max_err, detect_start,
+                                                                       self.cur_count, self.err_count)
 
-            if (self.cur_count + self.err_count) > max_count:
-                max_count = (self.cur_count + self.err_count)
-
-            if max_count >= min_samples:
-                emg_start_idx = cur_idx - min_samples + 1
-            else:
-                cur_idx += 1
-
-        self.last_end_idx = first_end_idx
+        self.last_end_idx = end_row
 
         if emg_start_idx is not None:
             self.cur_count = 0
             self.err_count = 0
+
+            if detect_start:
+                self.latencies.append(time.time() - self.emg_times[emg_start_idx + min_samples - 1])
             return emg_start_idx
 
         return None
 
+    def wait_for_data(self):
+        """
+            Wait until new synchronized samples arrive (or "check_period" elapses), rather than polling.
+        """
+        num_processed = 0 if self.last_end_idx is None else self.last_end_idx + 1
+        self.myo_data.preprocessed.wait_for_rows(num_processed, self.check_period)
+
     def run(self):
 
         #
@@ -1318,13 +1425,24 @@ class GesturePredictionWorker(QRunnable):
             return
 
         self.running = True
+
+        # The inference process starts up (and is warmed up) during the setup time
+        self.inference = self.create_inference(self.pred_model)
+        self.inference.warm_up(MODEL_WARMUP_WINDOWS, self.use_imu)
+
         time.sleep(self.setup_time)
         self.enable_control_buttons(False, False, False)
 
+        if self.sliding_window:
+            self.run_sliding_window()
+            self.close_inference()
+            return
+
         #
         # Until user initiates a "stop", indefinitely make predictions
         #
         while self.running:
+            self.close_retired()
 
             start_idx = self.detect_movement(True)
             if start_idx is None:
@@ -1333,11 +1451,17 @@ class GesturePredictionWorker(QRunnable):
                 #
                 if len(self.emg_list) > self.max_samples:
                    self.emg_list = self.emg_list[self.trim_samples:]
-                time.sleep(self.check_period)
+                   self.emg_times = self.emg_times[self.trim_samples:]
+                   self.filt_origin += self.trim_samples
+                   self.filt_data = self.myo_data.preprocessed.envelope(self.filt_origin,
+                                                                        self.filt_origin + len(self.emg_list),
+                                                                        self.filt_origin)
+                self.wait_for_data()
 
             else:
                 QMetaObject.invokeMethod(self.status_label, "setText", Qt.QueuedConnection,
-                                         Q_ARG(str, "Collecting Movement Data..."))
+                                         Q_ARG(str, "Collecting Movement Data... (onset detected in {:.0f} ms)".format(
+                                               1000 * self.latencies[-1])))
                 QMetaObject.invokeMethod(self.status_label, "setStyleSheet", Qt.QueuedConnection,
                                          Q_ARG(str, "font-weight: bold; font-size: 16pt; color: gold;"))
 
@@ -1345,7 +1469,7 @@ class GesturePredictionWorker(QRunnable):
                 while (end_idx is None) and (self.running):
                     end_idx = self.detect_movement(False)
                     if end_idx is None:
-                        time.sleep(self.check_period)
+                        self.wait_for_data()
 
                 if not self.running:
                     break
@@ -1393,18 +1517,28 @@ class GesturePredictionWorker(QRunnable):
                                 break
 
                             #
-                            # Make a prediction
+                            # Make a prediction (in the inference process)
                             #
                             if self.use_imu:
-                                test_feat   = self.pred_model.feat_extractor.extract_feature_point(combined_samples).reshape(1, -1)
+                                prediction = self.inference.submit([combined_samples])
                             else:
-                                test_feat   = self.pred_model.feat_extractor.extract_feature_point(emg_samp).reshape(1, -1)
+                                prediction = self.inference.submit([emg_samp])
 
-                            prob_dist  = self.pred_model.get_class_probabilities(test_feat)[0]
-                            pred       = np.argmax(prob_dist)
+                            try:
+                                prob_dist   = prediction.result()[0]
+                                pred        = np.argmax(prob_dist)
+                            except RuntimeError as e:
+                                QMetaObject.invokeMethod(self.status_label, "setText", Qt.QueuedConnection,
+                                                         Q_ARG(str, "Prediction failed... ({})".format(e)))
+                                QMetaObject.invokeMethod(self.status_label, "setStyleSheet", Qt.QueuedConnection,
+                                                         Q_ARG(str,
+                                                               "font-weight: bold; font-size: 16pt; color: red;"))
+                                pred        = None
 
+                            if pred is None:
+                                pass
 
-                            if pred != self.rest_label:
+                            elif pred != self.rest_label:
                                 self.class_probabilities    = prob_dist
                                 self.num_samples_used       = num_samples
                                 self.worker_event.onPrediction.emit()
@@ -1444,12 +1578,265 @@ class GesturePredictionWorker(QRunnable):
                 # # Clear states
                 # #
                 self.emg_list.clear()
+                self.emg_times.clear()
+                self.filt_data = None
                 self.acc_list.clear()
                 self.gyro_list.clear()
                 self.mag_list.clear()
                 self.last_end_idx = None
 
+        self.close_inference()
+
+    ####################################################################################################################
+    #
+    # Prediction models
+    #
+    ####################################################################################################################
+
+    def create_inference(self, pred_model):
+        """
+        :param pred_model: A prediction model (of type ClassifierModel)
+        :return: [InferenceService] Makes predictions with the model, sized for the classification mode
+        """
+        if self.sliding_window:
+            return InferenceService(pred_model, self.window_samples, self.max_pending * self.max_in_flight,
+                                    in_process=not INFERENCE_PROCESS)
+        return InferenceService(pred_model, self.max_samples, 1, in_process=not INFERENCE_PROCESS)
+
+    def request_swap(self, pred_model):
+        """
+            Swap in another model (see "swap_model") in a background thread, swaps are made in the order requested,
+                and a swap requested later supersedes those not yet made. The result is reported by "onModelSwapped".
+
+        :param pred_model: The new prediction model (of type ClassifierModel)
+        :return: [int] Id of the swap
+        """
+        with self.model_lock:
+            self.swap_id += 1
+            swap_id = self.swap_id
+
+        def run_swap():
+            with self.swap_lock:
+                swapped = self.swap_model(pred_model, swap_id)
+            self.worker_event.onModelSwapped.emit(swap_id, swapped)
+
+        threading.Thread(target=run_swap, daemon=True).start()
+        return swap_id
+
+    def swap_model(self, pred_model, swap_id=None):
+        """
+            Make predictions with another model, without stopping (e.g. a model updated by online training).
+
+                > Called from any thread, blocks while the new inference process starts up, and is warmed up (the
+                    first predictions of the new model do not pay its lazy initialization). Predictions already
+                    submitted are made by the previous model.
+
+        :param pred_model: The new prediction model (of type ClassifierModel)
+        :param swap_id: If not None, the model is not swapped in if a later swap was requested (see "request_swap")
+        :return: [bool] The model was swapped in, False if it failed to classify warm-up windows (or was superseded)
+        """
+        def superseded():
+            return (swap_id is not None) and (swap_id != self.swap_id)
+
+        with self.model_lock:
+            if superseded():
+                return False
+            if self.inference is None:
+                self.pred_model = pred_model    # Not making predictions
+                return True
+
+        inference = self.create_inference(pred_model)
+        try:
+            inference.warm_up(MODEL_WARMUP_WINDOWS, self.use_imu).result()
+        except Exception:
+            inference.close()                   # The previous model keeps making predictions
+            return False
+
+        with self.model_lock:
+            if superseded():
+                inference.close()
+                return False
+            if self.inference is None:
+                inference.close()               # Stopped meanwhile
+                self.pred_model = pred_model
+                return True
+            self.retired.append(self.inference)
+            self.pred_model, self.inference = pred_model, inference
+        return True
+
+    def close_retired(self):
+        """
+            Close inference services of previous models (once no predictions of theirs are pending).
+        """
+        with self.model_lock:
+            retired, self.retired = self.retired, []
+        for inference in retired:
+            inference.close()
+
+    def close_inference(self):
+        with self.model_lock:
+            inference, self.inference = self.inference, None
+        inference.close()
+        self.close_retired()
+
+
+
+    def run_sliding_window(self):
+        """
+            Continuous classification mode: every "hop_samples" new samples, classify the window of the latest
+                "window_samples" samples, and display the majority vote of the latest "vote_windows" predictions.
+
+                > All windows pending classification are classified at once (a single batch of features), by the
+                    inference service. Up to "max_in_flight" batches are classified while new samples arrive.
+                > With time-domain features (of EMG data only), features are updated as samples enter and leave the
+                    window (see "features.TimeDomainFeatures"), windows are not extracted again at every hop.
+        """
+        preprocessed    = self.myo_data.preprocessed
+        first_myo_data  = self.myo_data.band_1
+        second_myo_data = self.myo_data.band_2
+        votes           = deque(maxlen=self.vote_windows)
+        decision        = None
+        in_flight       = deque()   # (Future, time of the last sample) of each batch submitted, in order
+
+        # Incremental features (of tracker_model's extractor), tracker_row: next (absolute) row to add to the window
+        tracker         = None
+        tracker_row     = None
+        tracker_model   = None
+
+        # Windows end at (exclusive) rows next_end, next_end + hop_samples, ...
+        next_end = max(preprocessed.num_rows, preprocessed.first_row + self.window_samples)
+
+        self.on_worker_started()
+        while not self.stopped:
+            # Wait for the oldest batch to be classified, or for new samples
+            if len(in_flight) > 0:
+                futures.wait([in_flight[0][0]], timeout=self.check_period)
+            else:
+                preprocessed.wait_for_rows(next_end - 1, self.check_period)
+
+            while (len(in_flight) > 0) and in_flight[0][0].done():
+                future, last_time = in_flight.popleft()
+                decision = self.display_decision(future, last_time, votes, decision)
+
+            if len(in_flight) == 0:
+                self.close_retired()
+
+            # (Re)start incremental features, for a new model (see "swap_model")
+            with self.model_lock:
+                model, inference = self.pred_model, self.inference
+            if model is not tracker_model:
+                tracker_model   = model
+                tracker         = None
+                tracker_row     = None
+                if (not self.use_imu) and isinstance(tracker_model.feat_extractor, TimeDomainFeatures):
+                    tracker = tracker_model.feat_extractor.copy(self.window_samples)
+
+            num_rows = preprocessed.num_rows
+
+            # Windows are skipped while paused
+            if self.paused:
+                next_end = max(next_end, num_rows)
+                continue
+            if (num_rows < next_end) or (len(in_flight) >= self.max_in_flight):
+                continue
+
+            window_ends = list(range(next_end, num_rows + 1, self.hop_samples))[-self.max_pending:]
+            next_end    = window_ends[-1] + self.hop_samples
+            window_ends = [end for end in window_ends if end - self.window_samples >= preprocessed.first_row]
+            if len(window_ends) == 0:
+                continue
+            first_row   = window_ends[0] - self.window_samples
+            last_row    = window_ends[-1]
+            last_time   = preprocessed.get("time", last_row - 1, last_row)[0]
+
+            if tracker is not None:
+                features = []
+                for end in window_ends:
+                    # Restart from the start of the window, after a gap (e.g. windows skipped while paused)
+                    if (tracker_row is None) or (tracker_row < end - self.window_samples):
+                        tracker.reset()
+                        tracker_row = end - self.window_samples
+                    tracker.update(preprocessed.get("emg", tracker_row, end))
+                    tracker_row = end
+                    features.append(tracker.features())
+
+                in_flight.append((inference.submit_features(features), last_time))
+                continue
+
+            #
+            # Extract windows (of all pending predictions)
+            #
+            emg_samp = preprocessed.get("emg", first_row, last_row)
+            if self.use_imu:
+                # IMU data is stored at its native rate, join it to the EMG samples
+                acc_samp, gyro_samp = [], []
+                for first_idx, sec_idx in preprocessed.get("band_rows", first_row, last_row).tolist():
+                    first_mag, first_acc, first_gyro    = first_myo_data.imu_at(first_idx)
+                    second_mag, second_acc, second_gyro = second_myo_data.imu_at(sec_idx)
+                    acc_samp.append(first_acc + second_acc)
+                    gyro_samp.append(first_gyro + second_gyro)
+                acc_samp, gyro_samp = np.array(acc_samp), np.array(gyro_samp)
+
+            windows = []
+            for end in window_ends:
+                start, stop = end - self.window_samples - first_row, end - first_row
+                if self.use_imu:
+                    windows.append([emg_samp[start:stop], acc_samp[start:stop], gyro_samp[start:stop]])
+                else:
+                    windows.append(emg_samp[start:stop])
+
+            #
+            # Make predictions (of all pending windows at once)
+            #
+            in_flight.append((inference.submit(windows), last_time))
 
+        self.on_worker_stopped()
+
+    def display_decision(self, future, last_time, votes, decision):
+        """
+            Display the (smoothed) decision, once a batch of windows is classified.
+
+        :param future: A Future of class probabilities of the batch (see "InferenceService.submit")
+        :param last_time: Time of the last sample of the batch
+        :param votes: A deque of the latest predictions (updated)
+        :param decision: The decision displayed
+        :return: The new decision displayed
+        """
+        try:
+            prob_dists = future.result()
+        except RuntimeError as e:
+            QMetaObject.invokeMethod(self.status_label, "setText", Qt.QueuedConnection,
+                                     Q_ARG(str, "Prediction failed... ({})".format(e)))
+            QMetaObject.invokeMethod(self.status_label, "setStyleSheet", Qt.QueuedConnection,
+                                     Q_ARG(str, "font-weight: bold; font-size: 16pt; color: red;"))
+            return None
+
+        votes.extend(int(pred) for pred in np.argmax(prob_dists, axis=1))
+        self.decision_latencies.append(time.time() - last_time)
+
+        self.class_probabilities    = prob_dists[-1]
+        self.num_samples_used       = self.window_samples
+        self.worker_event.onPrediction.emit()
+
+        new_decision = majority_vote(list(votes))
+        if new_decision != decision:
+            if new_decision == self.rest_label:
+                current_description = ("No Movement", "No description available.")
+            else:
+                self.set_label(new_decision)
+                current_description = MOVEMENT_DESC[self.cur_ex][self.movement_num]
+
+            QMetaObject.invokeMethod(self.desc_title, "setText", Qt.QueuedConnection,
+                                     Q_ARG(str, current_description[0]))
+            QMetaObject.invokeMethod(self.desc_explain, "setText", Qt.QueuedConnection,
+                                     Q_ARG(str, current_description[1]))
+            QMetaObject.invokeMethod(self.status_label, "setStyleSheet", Qt.QueuedConnection,
+                                     Q_ARG(str, "font-weight: bold; font-size: 16pt; color: blue;"))
+
+        QMetaObject.invokeMethod(self.status_label, "setText", Qt.QueuedConnection,
+                                 Q_ARG(str, "Continuous Prediction... (decision latency {:.0f} ms)".format(
+                                       1000 * self.decision_latencies[-1])))
+        return new_decision
 
     ################################################################################################################
     ################################################################################################################
@@ -22,15 +22,12 @@ from scipy.stats import multivariate_normal
 import numpy as np
 import ninaeval
 from ninaeval.utils.gt_tools import refine_start_end
-
-try:
-    import cPickle as pickle
-except:
-    import pickle
+from pymyolinux.train import FeatureCache, RepetitionPool, TrainingProcess
 
 #
 # Miscellaneous imports
 #
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 import time
 from os.path import curdir, exists, join, abspath
@@ -42,6 +39,7 @@ from functools import partial
 from movements import *
 from param import *
 from shared_workers import *
+from model_registry import ModelRegistry
 
 
 class OnlineTraining(QWidget):
@@ -338,9 +336,25 @@ class OnlineTraining(QWidget):
             self.setLayout(infoLayout)
 
 
-    def __init__(self, myo_data):
+    class TrainingSignals(QObject):
+        """
+            Signals of the training process (emitted from a background thread, handled by the GUI thread)
+        """
+        onProgress  = pyqtSignal(int, float)     # (training id, seconds elapsed)
+        onComplete  = pyqtSignal(int, object)    # (training id, updated model)
+        onError     = pyqtSignal(int, str)       # (training id, error message)
+
+    def __init__(self, myo_data, on_model_trained=None, model_registry=None):
+        """
+        :param myo_data: A MyoData object containing all data collected from both Myo armband devices
+        :param on_model_trained: If not None, a function called with each updated model (e.g. to use it for online
+                                    predictions)
+        :param model_registry: Loads selected models in the background (a ModelRegistry, may be shared with online
+                                testing), None: a registry of this tab
+        """
         super().__init__()
-        self.myo_data = myo_data
+        self.myo_data           = myo_data
+        self.on_model_trained   = on_model_trained
 
         # Configurable
         self.min_noise_duration = 2 # seconds
@@ -353,6 +367,27 @@ class OnlineTraining(QWidget):
         self.classifier_model   = None
         self.noise_worker       = None
         self.pred_worker        = None
+        self.collecting         = False     # A GestureTrainingWorker is running
+        self.model_file         = None
+
+        # Selected models are loaded (and warmed up) in the background, see "on_model_select"
+        if model_registry is None:
+            model_registry = ModelRegistry(int(round(SLIDING_WINDOW_MS / 1000 * 200)), MODEL_WARMUP_WINDOWS,
+                                           MODEL_PROFILE_RUNS, max_entries=MODEL_REGISTRY_SIZE,
+                                           in_process=not INFERENCE_PROCESS)
+        self.model_registry     = model_registry
+        self.model_updates      = ModelUpdates()
+        self.model_updates.modelLoaded.connect(self.on_model_loaded)
+        self.model_updates.loadFailed.connect(self.on_model_load_failed)
+
+        # Models are updated by a training process, while data collection continues (see "start_training")
+        self.training           = None      # The running TrainingProcess
+        self.training_id        = 0         # Identifies the running TrainingProcess (signals of others are ignored)
+        self.pending_training   = None      # (features, labels, epochs) collected while a model was being trained
+        self.training_signals   = self.TrainingSignals()
+        self.training_signals.onProgress.connect(self.on_training_progress)
+        self.training_signals.onComplete.connect(self.on_training_complete)
+        self.training_signals.onError.connect(self.on_training_error)
 
         #
         # For video playing
@@ -763,40 +798,40 @@ class OnlineTraining(QWidget):
 
     def on_model_select(self):
         """
-            On press of the model select button, allow the user to select a model, and check for validity
+            On press of the model select button, allow the user to select a model, which is loaded (and checked for
+                validity) in the background, see "on_model_loaded"
         """
         self.enable_train_buttons(False, False)
-        dialog              = QFileDialog()
-        self.model_file     = dialog.getOpenFileName(self, 'Choose Model')[0]
+        dialog      = QFileDialog()
+        model_file  = dialog.getOpenFileName(self, 'Choose Model')[0]
 
-        if len(self.model_file) == 0:
+        if len(model_file) == 0:
             self.enable_train_buttons(True, True)
             return
 
         # Clear states
+        self.model_file     = abspath(model_file)
         self.valid_model    = False
         self.samples_field.setText("")
-        self.model_name.setText("")
+        self.model_name.setText("Loading...")
         self.classifier_model = None
+        self.cancel_training()
 
-        try:
-            with open(self.model_file, 'rb') as f:
-                self.classifier_model = pickle.load(f)
-        except:
-            self.warn_user("Pickle was unable to decode the selected file.")
-            self.enable_train_buttons(True, True)
-            return
+        self.model_registry.load(self.model_file, "update_training", self.model_updates.modelLoaded.emit,
+                                 partial(self.model_updates.loadFailed.emit, self.model_file))
 
-        valid_model = hasattr(self.classifier_model, "update_training")
-        if not valid_model:
-            self.warn_user("Invalid model selected, no \"update_training\" member available.")
-            self.enable_train_buttons(True, True)
+    def on_model_loaded(self, entry):
+        """
+            Called once a selected model is loaded and warmed up (see "ModelRegistry")
+
+        :param entry: The ModelEntry of the model
+        """
+        if entry.file_path != self.model_file:
             return
 
-        self.valid_model    = True
-        model_name          = self.classifier_model.__class__.__name__
-        feat_name           = self.classifier_model.feat_extractor.__class__.__name__
-        self.model_name.setText(model_name + " - " + feat_name)
+        self.valid_model        = True
+        self.classifier_model   = entry.model
+        self.model_name.setText(entry.describe())
 
         if self.classifier_model.num_samples is None:
             self.samples_field.setText("N/A")
@@ -807,6 +842,18 @@ class OnlineTraining(QWidget):
         # Check if ready to start online training
         self.check_ready_to_start()
 
+    def on_model_load_failed(self, file_path, message):
+        """
+        :param file_path: The selected model
+        :param message: Why the model could not be used
+        """
+        if file_path != self.model_file:
+            return
+
+        self.warn_user(message)
+        self.model_name.setText("")
+        self.enable_train_buttons(True, True)
+
     def check_ready_to_start(self):
         """
             Check if we are ready to start online training, if so, enable the start button for online training
@@ -862,6 +909,7 @@ class OnlineTraining(QWidget):
         self.bottom_panel.adjustSize()
 
         # Start background worker, responsible for training data collection
+        self.collecting  = True
         self.pred_worker = GestureTrainingWorker(self.myo_data, self.noise_worker.smooth_avg,
                                                     self.noise_worker.smooth_std, self.classifier_model,
                                                     self.status_label, self.progress_label, self.desc_title,
@@ -889,23 +937,130 @@ class OnlineTraining(QWidget):
         self.parameters_box.adjustSize()
         self.bottom_panel.adjustSize()
 
-        # If we updated a model succesfully
-        if self.pred_worker.complete:
-            response = QMessageBox.question(self, "Training Complete", "Would you like to save the updated model?",
-                                                QMessageBox.Yes | QMessageBox.No)
-
-            if response == QMessageBox.Yes:
-                dialog = QFileDialog()
-                dialog.setFileMode(QFileDialog.Directory)
-                dialog.setOption(QFileDialog.ShowDirsOnly)
-                self.data_directory = dialog.getExistingDirectory(self, 'Choose Directory', curdir)
+        self.collecting = False
 
-                if exists(self.data_directory):
-                    self.classifier_model.save_model(self.data_directory)
+        # If training samples were collected succesfully, update the model (in the background)
+        if self.pred_worker.complete:
+            training = (self.pred_worker.train_feat, self.pred_worker.train_labels, self.pred_worker.update_epochs)
+            if self.training is None:
+                self.start_training(*training)
+            else:
+                self.pending_training = training
+                self.show_training_status("Collected samples will be trained on next...", "orange")
 
         elif (not self.pred_worker.stopped):
             self.warn_user("Unable to train on collected samples.")
 
+        if self.pred_worker.num_dropped > 0:
+            self.warn_user("{} repetition(s) were not trained on, their samples were no longer kept in memory (see "
+                           "\"MEMORY_WINDOW_SAMPLES\").".format(self.pred_worker.num_dropped))
+
+    ####################################################################################################################
+    ####################################################################################################################
+    ####################################################################################################################
+    #
+    # Background training
+    #
+    ####################################################################################################################
+    ####################################################################################################################
+    ####################################################################################################################
+
+    def start_training(self, train_feat, train_labels, update_epochs):
+        """
+            Update (a copy of) the selected model in a training process, while data collection (and the rest of the GUI)
+                continues. The updated model replaces the selected model once training completes.
+
+        :param train_feat: Training features, shape (N, number of features)
+        :param train_labels: Training labels, shape (N,)
+        :param update_epochs: Number of training epochs
+        """
+        self.show_training_status("Training model in the background...", "orange")
+        self.training_id   += 1
+        self.training       = TrainingProcess(self.classifier_model, train_feat, train_labels, update_epochs,
+                                              partial(self.training_signals.onProgress.emit, self.training_id),
+                                              partial(self.training_signals.onComplete.emit, self.training_id),
+                                              partial(self.training_signals.onError.emit, self.training_id))
+
+    def cancel_training(self):
+        """
+            Stop background training (e.g. another model is selected), samples collected meanwhile are dropped.
+        """
+        self.pending_training = None
+        if self.training is not None:
+            self.training.cancel()
+            self.training     = None
+            self.training_id += 1
+
+    def show_training_status(self, text, color):
+        """
+            Display the state of background training (unless training samples are being collected).
+        """
+        if self.collecting:
+            return
+        self.status_label.setText(text)
+        self.status_label.setStyleSheet("font-weight: bold; font-size: 16pt; color: {};".format(color))
+
+    def on_training_progress(self, training_id, elapsed):
+        if training_id != self.training_id:
+            return
+        self.show_training_status("Training model in the background... ({:.0f} s)".format(elapsed), "orange")
+
+    def on_training_complete(self, training_id, updated_model):
+        """
+            Swap the updated model in (the previous model is left unchanged), then train on samples collected meanwhile.
+
+        :param training_id: Identifies the TrainingProcess (see "start_training")
+        :param updated_model: The updated model (of type ClassifierModel)
+        """
+        if training_id != self.training_id:
+            return
+
+        self.training           = None
+        self.classifier_model   = updated_model
+        if updated_model.num_samples is not None:
+            self.samples_field.setText(str(updated_model.num_samples))
+
+        if self.on_model_trained is not None:
+            self.on_model_trained(updated_model)
+
+        if self.pending_training is not None:
+            training, self.pending_training = self.pending_training, None
+            self.start_training(*training)
+            return
+
+        self.show_training_status("Model updated, waiting to start...", "green")
+        if self.collecting:
+            return
+
+        response = QMessageBox.question(self, "Training Complete", "Would you like to save the updated model?",
+                                            QMessageBox.Yes | QMessageBox.No)
+
+        if response == QMessageBox.Yes:
+            dialog = QFileDialog()
+            dialog.setFileMode(QFileDialog.Directory)
+            dialog.setOption(QFileDialog.ShowDirsOnly)
+            self.data_directory = dialog.getExistingDirectory(self, 'Choose Directory', curdir)
+
+            if exists(self.data_directory):
+                self.classifier_model.save_model(self.data_directory)
+
+    def on_training_error(self, training_id, message):
+        """
+        :param training_id: Identifies the TrainingProcess (see "start_training")
+        :param message: Why training failed
+        """
+        if training_id != self.training_id:
+            return
+
+        self.training = None
+        self.warn_user("Unable to train on collected samples ({}).".format(message))
+
+        if self.pending_training is not None:
+            training, self.pending_training = self.pending_training, None
+            self.start_training(*training)
+        else:
+            self.show_training_status("Waiting to Start...", "green")
+
     def warn_user(self, message):
         """
             Generates a pop-up warning message
@@ -919,7 +1074,8 @@ class OnlineTraining(QWidget):
 
 class GestureTrainingWorker(QRunnable):
     """
-        Collects incoming data, refines signal start/end of a movement performed, and updates a previously trained model.
+        Collects incoming data, refines signal start/end of a movement performed, and extracts training features (a
+            previously trained model is then updated in the background, see "OnlineTraining.start_training").
     """
 
     #
@@ -1006,6 +1162,9 @@ class GestureTrainingWorker(QRunnable):
         self.rest_duration      = 3.0
         self.update_epochs      = 50
         self.use_imu            = False
+        self.sync_timeout       = 2.0   # Maximum time to wait for a repetition's samples to be synchronized (seconds)
+        self.emg_rate           = 200   # EMG samples per second (per device)
+        self.extraction_workers = None  # Number of processes refining repetitions/extracting features (None: all CPUs)
 
         # State variables
         self.state_time_remain  = 0  # seconds
@@ -1013,6 +1172,9 @@ class GestureTrainingWorker(QRunnable):
         self.stopped            = False
         self.current_label      = None
         self.complete           = False
+        self.train_feat         = None
+        self.train_labels       = None
+        self.num_dropped        = 0     # Repetitions whose samples were no longer kept (bounded memory mode)
         self.shutdown           = False
 
         self.video_player.mediaStatusChanged.connect(self.media_status_changed)
@@ -1075,14 +1237,21 @@ class GestureTrainingWorker(QRunnable):
             return self.stop_online_train()
 
 
-        # The start\end index in passed myo data, for the given movement and repetition
-        num_selected        = self.movements_selected.count()
-        start_end_indices   = []
-
-        first_myo_data  = self.myo_data.band_1
-        second_myo_data = self.myo_data.band_2
-        data_mapping    = self.myo_data.data_mapping
+        # Each repetition is processed (start/end refined, features extracted) in the background, as soon as it has
+        # been collected, i.e. during the following rest/preparation period: samples of the repetition are gathered
+        # (once synchronized) by a thread, then processed by a pool of worker processes
+        num_selected            = self.movements_selected.count()
+        gathering               = ThreadPoolExecutor(max_workers=1)
+        feature_cache           = None
+        if FEATURE_CACHE_DIR is not None:
+            feature_cache = FeatureCache(FEATURE_CACHE_DIR, int(FEATURE_CACHE_MB * 1024 * 1024))
+        self.repetition_pool    = RepetitionPool(self.pred_model.feat_extractor, refine_start_end,
+                                                 self.extraction_workers, feature_cache)
+        repetitions             = []    # A Future of the (pool) Future of each repetition, in order
 
+        # In bounded memory mode, keep (at least) the samples of a collect period until they are gathered (the previous
+        # repetition may still be waiting on its samples to be synchronized)
+        self.myo_data.preprocessed.retain(int((self.collect_duration + 2 * self.sync_timeout) * self.emg_rate))
 
         for i in range(num_selected):
 
@@ -1135,11 +1304,9 @@ class GestureTrainingWorker(QRunnable):
             #
             # Collecting\resting periods
             #
-            start_end_idx   = [label, None, None]
-
             for i in range(num_reps):
 
-                start_end_idx[1] = len(first_myo_data.timestamps) - 1
+                collect_start = time.time()
 
                 #
                 # Collect
@@ -1158,8 +1325,7 @@ class GestureTrainingWorker(QRunnable):
                 if self.stopped:
                     break
 
-                start_end_idx[2] = len(first_myo_data.timestamps) - 1
-                start_end_indices.append(start_end_idx)
+                repetitions.append(gathering.submit(self.queue_repetition, label, collect_start, time.time()))
 
                 #
                 # Rest
@@ -1183,98 +1349,96 @@ class GestureTrainingWorker(QRunnable):
                     break
 
         #
-        # Process all collected data to update the prediction model
+        # Update the prediction model, once all repetitions are processed
         #
         if not self.stopped:
             train_feat    = []
             train_labels  = []
 
-            #
-            # Reformat the raw data
-            #
-            all_emg_list = []
-            all_acc_list = []
-            all_gyro_list = []
-            for first_idx in range(len(first_myo_data.timestamps)):
+            for i, repetition in enumerate(repetitions):
 
                 if self.stopped:
                     break
 
-                sec_idx = data_mapping[first_idx]
-                if (sec_idx != self.myo_data.invalid_map) and (sec_idx < len(second_myo_data.timestamps)):
-                    # EMG
-                    first_emg   = [x[first_idx] for x in first_myo_data.emg]
-                    second_emg  = [x[sec_idx] for x in second_myo_data.emg]
-                    all_emg_list.append(first_emg + second_emg)
-
-                    if self.use_imu:
-                        # ACC
-                        first_acc   = [x[first_idx] for x in first_myo_data.accel]
-                        second_acc  = [x[sec_idx] for x in second_myo_data.accel]
-                        all_acc_list.append(first_acc + second_acc)
+                if not repetition.done():
+                    QMetaObject.invokeMethod(self.status_label, "setText", Qt.QueuedConnection,
+                                             Q_ARG(str, "Processing repetition {} of {}...".format(i + 1,
+                                                                                                 len(repetitions))))
+                    QMetaObject.invokeMethod(self.status_label, "setStyleSheet", Qt.QueuedConnection,
+                                             Q_ARG(str, "font-weight: bold; font-size: 18pt; color: orange;"))
 
-                        # GYRO
-                        first_gyro  = [x[first_idx] for x in first_myo_data.gyro]
-                        second_gyro = [x[sec_idx] for x in second_myo_data.gyro]
-                        all_gyro_list.append(first_gyro + second_gyro)
+                processed = repetition.result()
+                if processed is not None:
+                    processed = processed.result()
+                if processed is not None:
+                    train_labels.append(processed[0])
+                    train_feat.append(processed[1])
 
             #
-            # Process (each repetition) of each selected movement
+            # Training features, the model is updated (in a separate process) once this worker stops
             #
-            for i, start_end_idx in enumerate(start_end_indices):
+            if (not self.stopped) and (len(train_feat) != 0):
+                self.train_feat     = np.array(train_feat)
+                self.train_labels   = np.array(train_labels)
+                self.complete       = True
 
-                if self.stopped:
-                    break
+        for repetition in repetitions:
+            if (not repetition.cancel()) and (repetition.result() is not None):
+                repetition.result().cancel()
+        gathering.shutdown(wait=False)
+        self.repetition_pool.shutdown(wait=False)
 
-                label       = start_end_idx[0]
-                start_idx   = start_end_idx[1]
-                end_idx     = start_end_idx[2]
+        self.on_worker_stopped()
 
-                #
-                # Attempt to refine the start/end of a movement performed
-                #
-                best_start, best_end = refine_start_end(all_emg_list, start_idx, end_idx)
+    def queue_repetition(self, label, start_time, end_time):
+        """
+            Gather (synchronized) samples of a movement performed during a collect period, and queue them to be refined
+                and have features extracted (see "pymyolinux.train.RepetitionPool").
 
-                if (best_start is not None) and (best_end is not None):
-                    emg_window = np.array(all_emg_list[best_start: best_end])
+                > Runs in the background, while the next period is played.
 
-                    if self.use_imu:
-                        acc_window  = np.array(self.acc_list[best_start: best_end])
-                        gyro_window = np.array(self.gyro_list[best_start: best_end])
+        :param label: Label of the movement performed
+        :param start_time: Start of the collect period
+        :param end_time: End of the collect period
+        :return: [Future] (label, features), None if the movement was not found, or None if no samples were gathered
+        """
+        preprocessed = self.myo_data.preprocessed
 
-                        # Avoid using magnetometer (overfitting issue)
-                        # mag_samp   = np.array(self.mag_list[best_start: best_end])
-                        # combined_samples = [emg_samp, acc_samp, gyro_samp, mag_samp]
-                        combined_window = [emg_window, acc_window, gyro_window]
+        #
+        # Wait for samples of the collect period to be synchronized
+        #
+        wait_end = time.time() + self.sync_timeout
+        while (not self.stopped) and (time.time() < wait_end):
+            num_rows = preprocessed.num_rows
+            if (num_rows > 0) and (preprocessed.get("time", num_rows - 1, num_rows)[0] > end_time):
+                break
+            preprocessed.wait_for_rows(num_rows, wait_end - time.time())
 
-                        cur_feat = self.pred_model.feat_extractor.extract_feature_point(combined_window).reshape(-1)
-                    else:
-                        cur_feat = self.pred_model.feat_extractor.extract_feature_point(emg_window).reshape(-1)
+        if self.stopped:
+            return None
 
-                    train_labels.append(label)
-                    train_feat.append(cur_feat)
-                else:
-                    continue
+        start_row, end_row = preprocessed.rows_between(start_time, end_time)
+        try:
+            emg_samples = preprocessed.get("emg", start_row, end_row)
+            band_rows   = preprocessed.get("band_rows", start_row, end_row)
+        except IndexError:
+            self.num_dropped += 1   # Samples are no longer kept (bounded memory mode), reported once stopped
+            return None
 
-                QMetaObject.invokeMethod(self.status_label, "setText", Qt.QueuedConnection,
-                                         Q_ARG(str,
-                                               "Processing seleceted movement {} of {}...".format(i + 1,
-                                                                                                  len(start_end_indices))
-                                               )
-                                         )
-                QMetaObject.invokeMethod(self.status_label, "setStyleSheet", Qt.QueuedConnection,
-                                         Q_ARG(str, "font-weight: bold; font-size: 18pt; color: orange;"))
+        if not self.use_imu:
+            return self.repetition_pool.submit(label, [emg_samples])
 
-            #
-            # Perform the actual training, save the updated model
-            #
-            if (not self.stopped) and (len(train_feat) != 0):
-                train_feat      = np.array(train_feat)
-                train_labels    = np.array(train_labels)
-                self.pred_model.update_training(train_feat, train_labels, self.update_epochs)
-                self.complete = True
+        # IMU data is stored at its native rate, join it to the EMG samples
+        acc_samples, gyro_samples = [], []
+        for first_idx, sec_idx in band_rows.tolist():
+            first_mag, first_acc, first_gyro    = self.myo_data.band_1.imu_at(first_idx)
+            second_mag, second_acc, second_gyro = self.myo_data.band_2.imu_at(sec_idx)
+            acc_samples.append(first_acc + second_acc)
+            gyro_samples.append(first_gyro + second_gyro)
 
-        self.on_worker_stopped()
+        # Avoid using magnetometer (overfitting issue)
+        return self.repetition_pool.submit(label, [emg_samples, np.array(acc_samples).reshape(-1, 6),
+                                                   np.array(gyro_samples).reshape(-1, 6)])
 
     ################################################################################################################
     ################################################################################################################
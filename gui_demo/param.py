@@ -12,6 +12,63 @@ FILENAME_2      = "myo_2_data.csv"
 FILENAME_all    = "myo_all_data.csv"
 BUFFER_PERIOD   = 2                         # How many of the first few seconds of Myo data is ignored when saving
 COPY_THRESHOLD  = 30/1000                   # How much can timestamps of readings from both devices differ
+NUM_TRIM_SAMPLES = 400                      # On a disconnect, this many of the last samples collected are discarded
+
+#
+# Session data (continuously written to disk during data collection)
+#
+SESSION_SPOOL_DIR       = "session_spool"   # Sessions are written here until saved (and recovered from on a crash)
+SESSION_DIRNAME         = "session"         # On save, the session is copied to this subdirectory
+SESSION_FLUSH_SAMPLES   = 1000              # New samples are written to disk in chunks of (at least) this many
+SESSION_CODEC           = None              # Compress EMG/IMU data on disk: "zlib", "lzma" or None (uncompressed)
+SESSION_CATALOG         = "sessions.db"     # Saved sessions are indexed in this catalog (None: not indexed)
+
+#
+# Bounded memory mode (for long acquisitions): only the latest samples are kept in memory, older samples are spilled to
+#   disk (in SESSION_SPOOL_DIR), and remain accessible
+#
+MEMORY_WINDOW_SAMPLES   = None              # Samples kept in memory per device, e.g. 12000 (1 minute), None: all
+SPILL_CHUNK_SAMPLES     = 2000              # Samples are spilled to disk in chunks of (at least) this many
+
+#
+# Synchronized EMG samples are preprocessed (rectified, filtered) by a background thread, in batches
+#
+PREPROCESS_BATCH_SAMPLES    = 10            # Samples are preprocessed once (at least) this many are synchronized
+PREPROCESS_MAX_DELAY        = 50/1000       # ... or after at most this many seconds
+
+#
+# NinaPro-style export (NumPy and MATLAB files, the latter requires scipy)
+#
+NINAPRO_FILENAMES = ["myo_ninapro.npz", "myo_ninapro.mat"]
+
+#
+# Online testing: continuous (sliding window) classification mode, instead of classifying detected movements
+#
+SLIDING_WINDOW_MODE     = False             # Classify overlapping windows of the latest samples, continuously
+SLIDING_WINDOW_MS       = 1000              # Window length, at least 1000 ms (a single window of features)
+SLIDING_HOP_MS          = 50                # A window is classified every this many ms (of new samples)
+SLIDING_VOTE_WINDOWS    = 5                 # Majority vote over this many latest windows (1: no smoothing)
+
+#
+# Online testing: predictions are made in a separate process (windows are passed through shared memory, requires
+#   Python 3.8+), rather than in a thread of the GUI process
+#
+INFERENCE_PROCESS       = True
+
+#
+# Online training: features of each repetition are cached on disk (keyed by the repetition's samples, label and the
+#   feature extractor), shared with offline extraction ("python -m pymyolinux.train extract --cache ...")
+#
+FEATURE_CACHE_DIR       = "feature_cache"   # None: no cache
+FEATURE_CACHE_MB        = 256               # Least recently used features are removed beyond this size
+
+#
+# Model selection: models are loaded in the background, warmed up on a batch of synthetic windows (lazy initialization
+#   is paid before predictions are made), and profiled (latency of single windows)
+#
+MODEL_WARMUP_WINDOWS    = 8                 # Windows classified (at once) to warm up a model
+MODEL_PROFILE_RUNS      = 20                # Single windows classified to measure latency percentiles (0: none)
+MODEL_REGISTRY_SIZE     = 4                 # Loaded models kept, the least recently used are dropped beyond this
 
 #
 # (Myo data enforced) Rescaling parameters
@@ -6,7 +6,6 @@ from PyQt5.QtCore import (Qt, QRunnable, QMetaObject, Q_ARG, QObject, pyqtSignal
 #
 # Imports for online prediction tasks
 #
-from scipy.signal import butter, lfilter
 import numpy as np
 
 try:
@@ -18,12 +17,14 @@ except:
 # Miscellaneous imports
 #
 import time
+from collections import Counter
 
 #
 # Submodules in this repository
 #
 from movements import *
 from param import *
+from signal_processing import NoiseModel
 
 
 ########################################################################################################################
@@ -42,6 +43,32 @@ class NoiseUpdates(QObject):
     collectComplete = pyqtSignal()
     modelReady      = pyqtSignal()
 
+# Used by ModelRegistry (model selection, by online training/testing)
+class ModelUpdates(QObject):
+    modelLoaded     = pyqtSignal(object)    # ModelEntry
+    loadFailed      = pyqtSignal(str, str)  # (file path, error message)
+
+########################################################################################################################
+########################################################################################################################
+########################################################################################################################
+#
+# Classification (shared by background workers)
+#
+########################################################################################################################
+########################################################################################################################
+########################################################################################################################
+
+def majority_vote(predictions):
+    """
+    :param predictions: A list of (the latest) predictions
+    :return: The most frequent prediction (ties are broken by the most recent prediction)
+    """
+    counts      = Counter(predictions)
+    max_count   = max(counts.values())
+    for pred in reversed(predictions):
+        if counts[pred] == max_count:
+            return pred
+
 ########################################################################################################################
 ########################################################################################################################
 ########################################################################################################################
@@ -77,6 +104,10 @@ class NoiseCollectionWorker(QRunnable):
         # States
         self.start_time         = time.time() + self.buffer_time
         self.currrent_increment = 0
+        self.noise_model        = NoiseModel()
+        self.next_row           = 0     # First (preprocessed) row not yet added to the noise model
+        self.first_row          = None  # First (preprocessed) row added to the noise model, filtering starts there
+        self.prev_estimate      = None  # (smooth_avg, smooth_std) at the previous increment
 
         self.worker_updates = NoiseUpdates()
         self.worker_updates.workerStarted.connect(on_worker_started)
@@ -91,9 +122,10 @@ class NoiseCollectionWorker(QRunnable):
 
     def run(self):
         #
-        # Wait for data collection to finish
+        # Update the noise model as (synchronized) data arrives, until data collection is finished
         #
         time.sleep(self.buffer_time)
+
         while (time.time() - self.start_time) < self.noise_duration:
             QMetaObject.invokeMethod(self.progress_bar, "setValue", Qt.QueuedConnection,
                                      Q_ARG(int, self.currrent_increment))
@@ -103,62 +135,62 @@ class NoiseCollectionWorker(QRunnable):
             QMetaObject.invokeMethod(self.progress_label, "setText", Qt.QueuedConnection,
                                      Q_ARG(str, time_remaining))
 
-            time.sleep(self.noise_duration / self.noise_increments)
+            # Process new data until the next increment
+            increment_end = time.time() + self.noise_duration / self.noise_increments
+            while time.time() < increment_end:
+                self.myo_data.preprocessed.wait_for_rows(self.next_row, increment_end - time.time())
+                self.process_new_data(time.time())
+
+            QMetaObject.invokeMethod(self.progress_bar, "setLabelText", Qt.QueuedConnection,
+                                     Q_ARG(str, self.convergence_text()))
             self.currrent_increment += 1
 
         end_time = time.time()
         self.worker_updates.collectComplete.emit()
 
         #
-        # Extract data in time window
+        # Remaining (synchronized) data in time window
         #
-        first_myo_data  = self.myo_data.band_1
-        second_myo_data = self.myo_data.band_2
-        data_mapping    = self.myo_data.data_mapping
-
-        # Find start/end indices of first dataset
-        first_data_indices  = [None, None]
-        default_final       = len(first_myo_data.timestamps)
-
-        for i, data_time in enumerate(first_myo_data.timestamps):
-            if first_data_indices[0] is None:
-                if data_time > self.start_time:
-                    first_data_indices[0] = i
-            if first_data_indices[1] is None:
-                if data_time > end_time:
-                    first_data_indices[1] = i
-                    break
-
-        if first_data_indices[1] is None:
-            first_data_indices[1] = default_final
-
-        noise_samples = []
-        for first_idx in range(first_data_indices[0], first_data_indices[1]):
-            if ((data_mapping[first_idx] != self.myo_data.invalid_map) and
-                    (data_mapping[first_idx] < len(second_myo_data.timestamps))):
-                first_emg   = [x[first_idx] for x in first_myo_data.emg]
-                sec_idx     = data_mapping[first_idx]
-                second_emg  = [x[sec_idx] for x in second_myo_data.emg]
-                noise_samples.append(first_emg + second_emg)
+        self.process_new_data(end_time)
 
-        #
-        # Fit a noise model
-        #
-        noise_samples   = np.array(noise_samples)
-        self.noise_mean = np.mean(noise_samples, axis=0)
-        self.noise_cov  = np.cov(noise_samples, rowvar=False)
-
-        # Apply sixth-order digital butterworth lowpass filter with 50 Hz cutoff frequency to rectified signal (first)
-        fs              = 200
-        nyquist         = 0.5 * fs
-        cutoff          = 50
-        order           = 6
-        b, a            = butter(order, cutoff / nyquist, btype='lowpass')
-        noise_samples   = np.abs(noise_samples)
-        filt_data       = lfilter(b, a, noise_samples, axis=0)
-
-        self.smooth_avg  = np.mean(filt_data, axis=0)
-        self.smooth_std  = np.std(filt_data, axis=0)
+        self.noise_mean = self.noise_model.noise_mean
+        self.noise_cov  = self.noise_model.noise_cov
+        self.smooth_avg = self.noise_model.smooth_avg
+        self.smooth_std = self.noise_model.smooth_std
 
         self.worker_updates.modelReady.emit()
 
+    def process_new_data(self, end_time):
+        """
+            Add new (preprocessed) samples, received before "end_time", to the noise model.
+
+        :param end_time: Samples received after this time are not added
+        """
+        preprocessed        = self.myo_data.preprocessed
+        start_row, end_row  = preprocessed.rows_between(self.start_time, end_time)
+        start_row           = max(start_row, self.next_row)
+
+        if end_row > start_row:
+            if self.first_row is None:
+                self.first_row = start_row
+            self.noise_model.update(preprocessed.get("emg", start_row, end_row),
+                                    preprocessed.envelope(start_row, end_row, self.first_row))
+        self.next_row = max(self.next_row, end_row)
+
+    def convergence_text(self):
+        """
+        :return: [str] Progress dialog text, showing how much noise model estimates changed since the last increment
+        """
+        model = self.noise_model
+        if model.num_samples == 0:
+            return "Collecting Noise Data..."
+
+        estimate, self.prev_estimate = self.prev_estimate, (model.smooth_avg, model.smooth_std)
+        if estimate is None:
+            return "Collecting Noise Data... ({} samples)".format(model.num_samples)
+
+        change = max(np.max(np.abs(new - old) / np.maximum(np.abs(new), np.finfo(np.float64).eps))
+                     for new, old in zip(self.prev_estimate, estimate))
+        return "Collecting Noise Data... ({} samples, estimates changed by {:.1f}%)".format(model.num_samples,
+                                                                                        100 * change)
+
@@ -0,0 +1,491 @@
+#
+# Imports for online prediction tasks
+#
+from scipy.signal import butter, lfilter, lfiltic
+import numpy as np
+
+#
+# Miscellaneous imports
+#
+import threading
+
+
+########################################################################################################################
+########################################################################################################################
+########################################################################################################################
+#
+# Signal processing (shared by data collection, and background workers)
+#
+########################################################################################################################
+########################################################################################################################
+########################################################################################################################
+
+class StreamingFilter():
+    """
+        Rectifies, and applies a (sixth-order, 50 Hz cutoff) digital butterworth lowpass filter to, EMG samples as they
+            arrive: filter coefficients are computed once, and filter states are kept between calls, so only new
+            samples are filtered.
+
+            > Filtered samples are identical to filtering all samples at once, lfilter(b, a, np.abs(samples), axis=0).
+    """
+
+    def __init__(self, fs=200, cutoff=50, order=6):
+        """
+        :param fs: Sampling frequency (Hz)
+        :param cutoff: Cutoff frequency (Hz)
+        :param order: Order of the butterworth filter
+        """
+        nyquist         = 0.5 * fs
+        self.b, self.a  = butter(order, cutoff / nyquist, btype='lowpass')
+        self.reset()
+
+    def reset(self):
+        """
+            Remove all samples (filtering restarts from zero initial conditions).
+        """
+        self.rectified  = None  # All (rectified) samples, shape (N, number of channels)
+        self.filtered   = None  # All filtered samples, shape (N, number of channels)
+        self.zi         = None  # Filter states, after the last sample
+
+    def update(self, new_samples):
+        """
+        :param new_samples: New EMG samples, shape (number of new samples, number of channels)
+        :return: [np.ndarray] All filtered samples, shape (N, number of channels)
+        """
+        new_samples = np.abs(np.array(new_samples, dtype=np.float64))
+        if new_samples.shape[0] == 0:
+            return self.filtered if self.filtered is not None else np.zeros((0, 0))
+        new_samples = new_samples.reshape(new_samples.shape[0], -1)
+
+        if self.rectified is None:
+            self.rectified  = np.zeros((0, new_samples.shape[1]))
+            self.filtered   = np.zeros((0, new_samples.shape[1]))
+
+        new_filtered    = self.filter(new_samples)
+        self.rectified  = np.concatenate((self.rectified, new_samples))
+        self.filtered   = np.concatenate((self.filtered, new_filtered))
+        return self.filtered
+
+    def filter(self, new_samples):
+        """
+            Filter new samples, without keeping them (only filter states are updated).
+
+        :param new_samples: New EMG samples, shape (number of new samples, number of channels)
+        :return: [np.ndarray] Filtered new samples, shape (number of new samples, number of channels)
+        """
+        new_samples = np.abs(np.array(new_samples, dtype=np.float64))
+        new_samples = new_samples.reshape(new_samples.shape[0], -1)
+        if self.zi is None:
+            self.zi = np.zeros((max(len(self.a), len(self.b)) - 1, new_samples.shape[1]))
+
+        new_filtered, self.zi = lfilter(self.b, self.a, new_samples, axis=0, zi=self.zi)
+        return new_filtered
+
+    def trim(self, num_samples):
+        """
+            Remove the first "num_samples" samples, remaining samples are filtered again (as if filtering started at
+                the first remaining sample).
+
+        :param num_samples: Number of samples to remove
+        """
+        if self.rectified is None:
+            return
+
+        remaining = self.rectified[num_samples:]
+        self.reset()
+        self.update(remaining)
+
+
+class PreprocessingStage():
+    """
+        Synchronized EMG samples of both devices (first device channels, then second device channels), and their
+            rectified, filtered envelope (see "StreamingFilter"), computed once per block of newly synchronized samples,
+            and shared by all consumers (noise collection, movement detection, ...).
+
+            > Blocks are processed by a background thread (see "start"), in batches of (at least) "batch_rows" samples,
+                or every "max_delay" seconds, so that serial reader threads only record samples.
+            > Rows are numbered from the first synchronized sample. Consumers can look up rows by time
+                ("rows_between"), slice rows ("get"), wait for new rows ("wait_for_rows"), or subscribe to new rows
+                ("subscribe").
+            > Only (at least) the latest "max_rows" rows are kept, older rows can no longer be sliced.
+    """
+
+    # Columns -> (number of values per row, data type)
+    columns = {
+                "time":         (None, np.float64),   # Timestamp (first device)
+                "band_rows":    (2, np.int64),        # Sample indices of the first and second device
+                "emg":          (16, np.float64),     # EMG samples
+                "envelope":     (16, np.float64)      # Rectified, filtered EMG samples
+            }
+
+    def __init__(self, myo_data, max_rows=None, batch_rows=10, max_delay=0.05):
+        """
+        :param myo_data: A MyoData object, holding all data collected from both Myo armbands
+        :param max_rows: Number of rows to keep (None: all)
+        :param batch_rows: Newly synchronized samples are processed once there are (at least) this many
+        :param max_delay: Maximum time a synchronized sample waits to be processed (seconds)
+        """
+        self.myo_data       = myo_data
+        self.max_rows       = max_rows
+        self.batch_rows     = max(batch_rows, 1)
+        self.max_delay      = max_delay
+        self.lock           = threading.Lock()     # Held while rows are added/read
+        self.update_lock    = threading.Lock()     # Held while samples are processed (see "update"/"reset")
+        self.subscribers    = []
+        self.thread         = None
+        self.reset()
+
+    def start(self):
+        """
+            Start processing newly synchronized samples, in a background (daemon) thread.
+        """
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def run(self):
+        """
+            Wait for newly synchronized samples (see "MyoData.notify_synchronized"), and process them in batches.
+        """
+        sync_condition = self.myo_data.sync_condition
+        while True:
+            with sync_condition:
+                sync_condition.wait_for(lambda: self.myo_data.num_synchronized >= self.next_idx + self.batch_rows,
+                                        self.max_delay)
+                num_synchronized = self.myo_data.num_synchronized
+            self.update(num_synchronized)
+
+    def reset(self, next_idx=0):
+        """
+            Remove all rows (filtering restarts at the next synchronized sample).
+
+        :param next_idx: First sample (first device) to process
+        """
+        with self.update_lock, self.lock:
+            self.emg_filter = StreamingFilter()
+            self.next_idx   = next_idx  # First sample (first device) not yet processed
+            self.first_row  = 0         # First row kept (row self.first_row + i is held at index i of each buffer)
+            self.num_rows   = 0         # Number of rows processed
+            self.buffers    = {name: np.zeros((0,) if width is None else (0, width), dtype=dtype)
+                               for name, (width, dtype) in self.columns.items()}
+
+    def retain(self, num_rows):
+        """
+        :param num_rows: Keep (at least) this many of the latest rows, if fewer are kept (see "max_rows")
+        """
+        with self.lock:
+            if self.max_rows is not None:
+                self.max_rows = max(self.max_rows, num_rows)
+
+    def subscribe(self, callback):
+        """
+        :param callback: A function of (first new row, number of rows), called (by the background thread) as new
+                            rows are added
+        """
+        self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """
+        :param callback: A function passed to "subscribe"
+        """
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+
+    def update(self, num_synchronized):
+        """
+            Process newly synchronized samples (called by the background thread, see "run"), and wake up consumers
+                waiting on new rows.
+
+        :param num_synchronized: Number of first device samples with final synchronization mapping entries
+        """
+        with self.update_lock:
+            first_new_row, num_new_rows = self.process(num_synchronized)
+        if num_new_rows == 0:
+            return
+
+        with self.myo_data.sync_condition:
+            self.myo_data.sync_condition.notify_all()
+        for callback in list(self.subscribers):
+            callback(first_new_row, num_new_rows)
+
+    def process(self, num_synchronized):
+        """
+        :param num_synchronized: Number of first device samples with final synchronization mapping entries
+        :return: (first new row, number of new rows)
+        """
+        first_myo_data  = self.myo_data.band_1
+        second_myo_data = self.myo_data.band_2
+        data_mapping    = self.myo_data.data_mapping
+
+        start_idx       = self.next_idx
+        end_idx         = min(num_synchronized, len(first_myo_data.timestamps), len(data_mapping))
+        if end_idx <= start_idx:
+            return self.num_rows, 0
+        self.next_idx   = end_idx
+
+        mapping     = np.array(data_mapping[start_idx:end_idx], dtype=np.int64)
+        valid       = (mapping != self.myo_data.invalid_map) & (mapping < len(second_myo_data.timestamps))
+        sec_indices = mapping[valid]
+        if sec_indices.shape[0] == 0:
+            return self.num_rows, 0
+
+        # Columns of the first device (within range), and of the second device (mapped samples)
+        sec_start   = int(sec_indices.min())
+        sec_end     = int(sec_indices.max()) + 1
+        first_emg   = np.array([x[start_idx:end_idx] for x in first_myo_data.emg], dtype=np.float64).T[valid]
+        second_emg  = np.array([x[sec_start:sec_end] for x in second_myo_data.emg], dtype=np.float64).T
+        emg         = np.hstack((first_emg, second_emg[sec_indices - sec_start]))
+
+        first_rows  = np.arange(start_idx, end_idx)[valid]
+        new_rows    = {
+                        "time":         np.array(first_myo_data.timestamps[start_idx:end_idx], dtype=np.float64)[valid],
+                        "band_rows":    np.column_stack((first_rows, sec_indices)),
+                        "emg":          emg,
+                        "envelope":     self.emg_filter.filter(emg)
+                    }
+
+        with self.lock:
+            first_new_row = self.num_rows
+            self.append(new_rows)
+        return first_new_row, emg.shape[0]
+
+    def append(self, new_rows):
+        """
+            Add rows (to buffers with spare capacity), dropping the oldest rows beyond "max_rows" once buffers are full.
+
+        :param new_rows: A dictionary of column name -> new values
+        """
+        num_new     = new_rows["time"].shape[0]
+        num_kept    = self.num_rows - self.first_row
+        capacity    = self.buffers["time"].shape[0]
+
+        if num_kept + num_new > capacity:
+            num_dropped = 0 if self.max_rows is None else max(num_kept - self.max_rows, 0)
+            num_kept   -= num_dropped
+            capacity    = max(capacity, 2 * (num_kept + num_new), 1024)
+
+            for name, (width, dtype) in self.columns.items():
+                buffer                  = np.zeros((capacity,) if width is None else (capacity, width), dtype=dtype)
+                buffer[:num_kept]       = self.buffers[name][num_dropped:num_dropped + num_kept]
+                self.buffers[name]      = buffer
+            self.first_row += num_dropped
+
+        for name, values in new_rows.items():
+            self.buffers[name][num_kept:num_kept + num_new] = values
+        self.num_rows += num_new
+
+    def rows_between(self, start_time, end_time):
+        """
+        :param start_time: Rows must have a timestamp greater than this value
+        :param end_time: Rows must have a timestamp less than or equal to this value
+        :return: (start, end) -> Rows such that get(name, start, end) lies within the time window
+        """
+        with self.lock:
+            times = self.buffers["time"][:self.num_rows - self.first_row]
+            start = int(np.searchsorted(times, start_time, side="right"))
+            end   = int(np.searchsorted(times, end_time, side="right"))
+            return self.first_row + start, self.first_row + max(start, end)
+
+    def get(self, name, start, end=None):
+        """
+        :param name: Column name (see "columns")
+        :param start: First row
+        :param end: Last row (exclusive), None: all rows
+        :return: [np.ndarray] A copy of rows start ... end - 1 (of the column)
+        """
+        with self.lock:
+            if start < self.first_row:
+                raise IndexError("Row {} is no longer kept (first row: {}).".format(start, self.first_row))
+            end = self.num_rows if end is None else min(end, self.num_rows)
+            return self.buffers[name][start - self.first_row:max(end, start) - self.first_row].copy()
+
+    def envelope(self, start, end, origin):
+        """
+            Envelope of rows, as if filtering started (from zero initial conditions) at row "origin", e.g. the first
+                sample kept by a consumer, rather than at the first synchronized sample.
+
+                > The filter is linear: the response of the filter states at "origin" (to zero input) is removed. Filter
+                    states are recovered from the rows preceding "origin" (see "scipy.signal.lfiltic").
+
+        :param start: First row, at least "origin"
+        :param end: Last row (exclusive)
+        :param origin: Row at which filtering (re)starts
+        :return: [np.ndarray] Rectified, filtered EMG samples of rows start ... end - 1
+        """
+        envelope = self.get("envelope", start, end)
+        if (origin <= 0) or (envelope.shape[0] == 0):
+            return envelope
+
+        b, a        = self.emg_filter.b, self.emg_filter.a
+        order       = max(len(a), len(b)) - 1
+        past_start  = max(origin - order, self.first_row)
+        past_input  = np.abs(self.get("emg", past_start, origin))[::-1]
+        past_output = self.get("envelope", past_start, origin)[::-1]
+        zi          = np.column_stack([lfiltic(b, a, past_output[:, ch], past_input[:, ch])
+                                       for ch in range(envelope.shape[1])])
+
+        response = lfilter(b, a, np.zeros((start + envelope.shape[0] - origin, envelope.shape[1])), axis=0, zi=zi)[0]
+        return envelope - response[start - origin:]
+
+    def wait_for_rows(self, num_rows, timeout):
+        """
+            Block until there are more than "num_rows" rows.
+
+        :param num_rows: Number of rows already processed by the caller
+        :param timeout: Maximum time to wait (seconds)
+        :return: [bool] True if new rows are available
+        """
+        with self.myo_data.sync_condition:
+            return self.myo_data.sync_condition.wait_for(lambda: self.num_rows > num_rows, timeout)
+
+
+class NoiseModel():
+    """
+        Noise statistics of EMG samples, updated as samples arrive (streaming mean/covariance, as in Welford's
+            algorithm, merged one block of samples at a time):
+                > noise_mean, noise_cov: Mean and (sample) covariance of EMG samples
+                > smooth_avg, smooth_std: Mean and standard deviation of rectified, filtered EMG samples
+
+            > Statistics are identical (up to rounding) to computing them on all samples at once, i.e. np.mean,
+                np.cov and np.mean/np.std of the filtered samples.
+    """
+
+    def __init__(self):
+        self.num_samples = 0
+
+        self.mean       = None  # Mean of EMG samples
+        self.m2         = None  # Sum of outer products of deviations from the mean
+        self.filt_mean  = None  # Mean of filtered samples
+        self.filt_m2    = None  # Sum of squared deviations of filtered samples from their mean
+
+    @staticmethod
+    def merge(count, mean, m2, new_samples, outer):
+        """
+            Merge the statistics of a block of samples (Chan et al.) into the statistics of previous samples.
+
+        :param count: Number of previous samples
+        :param mean: Mean of previous samples (None if there are none)
+        :param m2: Sum of squared deviations of previous samples
+        :param new_samples: New samples, shape (number of new samples, number of channels)
+        :param outer: True/False: m2 holds outer products (covariance)/squares (variance) of deviations
+        :return: (mean, m2) of all samples
+        """
+        new_count   = new_samples.shape[0]
+        new_mean    = np.mean(new_samples, axis=0)
+        deviations  = new_samples - new_mean
+        new_m2      = np.dot(deviations.T, deviations) if outer else np.sum(deviations ** 2, axis=0)
+        if mean is None:
+            return new_mean, new_m2
+
+        total   = count + new_count
+        delta   = new_mean - mean
+        scale   = count * new_count / total
+        m2      = m2 + new_m2 + (scale * np.outer(delta, delta) if outer else scale * delta ** 2)
+        return mean + delta * (new_count / total), m2
+
+    def update(self, new_samples, filt_data):
+        """
+        :param new_samples: New EMG samples, shape (number of new samples, number of channels)
+        :param filt_data: New rectified, filtered EMG samples (see "PreprocessingStage"), shape as "new_samples"
+        """
+        new_samples = np.array(new_samples, dtype=np.float64)
+        if new_samples.shape[0] == 0:
+            return
+        new_samples = new_samples.reshape(new_samples.shape[0], -1)
+        filt_data   = np.array(filt_data, dtype=np.float64).reshape(new_samples.shape)
+
+        self.mean, self.m2              = self.merge(self.num_samples, self.mean, self.m2, new_samples, True)
+        self.filt_mean, self.filt_m2    = self.merge(self.num_samples, self.filt_mean, self.filt_m2, filt_data, False)
+        self.num_samples               += new_samples.shape[0]
+
+    @property
+    def noise_mean(self):
+        return self.mean
+
+    @property
+    def noise_cov(self):
+        if self.num_samples < 2:
+            return None
+        return self.m2 / (self.num_samples - 1)
+
+    @property
+    def smooth_avg(self):
+        return self.filt_mean
+
+    @property
+    def smooth_std(self):
+        if self.num_samples == 0:
+            return None
+        return np.sqrt(self.filt_m2 / self.num_samples)
+
+
+def threshold_scan(filt_data, first_idx, window_size, smooth_avg, smooth_std, h, min_samples, max_err, detect_start,
+                   cur_count, err_count):
+    """
+        Test all new samples at once for the onset (or end) of a movement, with the threshold algorithm:
+            1) Sample p succeeds if the mean of filt_data[p - window_size: p], normalized by the noise model, exceeds
+                "h" standard deviations on any channel (or on none of the channels, when detecting the end)
+            2) Successes/failures are counted, and both counts are reset once "max_err" failures are reached
+            3) The movement starts (ends) "min_samples" samples before both counts first add up to "min_samples"
+
+            > Sliding means are computed from a cumulative sum, and the counting is solved in closed form (the sum of
+                both counts grows by one per sample, until a reset), giving the same result as testing one sample at a
+                time.
+
+    :param filt_data: Filtered EMG samples, shape (N, number of channels)
+    :param first_idx: First (new) sample to test, samples first_idx ... N - 1 are tested
+    :param window_size: Number of samples averaged per test
+    :param smooth_avg: Mean of filtered noise samples, per channel
+    :param smooth_std: Standard deviation of filtered noise samples, per channel
+    :param h: Number of standard deviations to threshold with
+    :param min_samples: Number of counted samples required
+    :param max_err: Counts are reset once this many samples fail
+    :param detect_start: True/False: Start/End
+    :param cur_count: Number of successes, counted prior to "first_idx"
+    :param err_count: Number of failures, counted prior to "first_idx"
+    :return: (index, cur_count, err_count) -> Start/end index (None if not found), updated counts (if not found)
+    """
+    num_samples = filt_data.shape[0]
+    positions   = np.arange(first_idx, num_samples)
+    if positions.shape[0] == 0:
+        return None, cur_count, err_count
+
+    #
+    # Sliding means, of filt_data[p - window_size: p] (bounds follow Python slicing, as for a single test)
+    #
+    def slice_bound(idx):
+        return np.where(idx < 0, np.maximum(idx + num_samples, 0), np.minimum(idx, num_samples))
+
+    win_starts  = slice_bound(positions - window_size)
+    win_ends    = slice_bound(positions)
+    win_lengths = win_ends - win_starts
+
+    cum_sum     = np.concatenate((np.zeros((1, filt_data.shape[1])), np.cumsum(filt_data, axis=0)))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        win_means   = (cum_sum[win_ends] - cum_sum[win_starts]) / win_lengths[:, None]
+        win_means[win_lengths <= 0] = np.nan    # Empty windows never exceed the threshold
+        success     = np.any(np.greater((win_means - smooth_avg) / smooth_std, h), axis=1)
+    if not detect_start:
+        success = np.logical_not(success)
+
+    #
+    # Counting: counts are reset on every "max_err"-th failure (including failures counted prior to "first_idx")
+    #
+    steps       = np.arange(positions.shape[0])
+    num_errors  = np.cumsum(np.logical_not(success))
+    resets      = np.logical_not(success) & ((num_errors + err_count) % max_err == 0)
+    last_reset  = np.maximum.accumulate(np.where(resets, steps, -1))
+    total_count = np.where(last_reset >= 0, steps - last_reset, cur_count + err_count + steps + 1)
+
+    found = np.flatnonzero(total_count >= min_samples)
+    if found.shape[0] > 0:
+        return int(positions[found[0]]) - min_samples + 1, 0, 0
+
+    # Counts since the last reset
+    if last_reset[-1] >= 0:
+        err_count = int(num_errors[-1] - num_errors[last_reset[-1]])
+        cur_count = int(total_count[-1]) - err_count
+    else:
+        err_count += int(num_errors[-1])
+        cur_count += int(positions.shape[0] - num_errors[-1])
+    return None, cur_count, err_count
@@ -42,7 +42,10 @@ def on_receive_attribute_value(sender_obj, connection, atthandle, type, value):
         sender_obj.emg_event(emg_list = [sample_1_1, sample_1_2, sample_1_3, sample_1_4, sample_1_5,
                                                         sample_1_6, sample_1_7, sample_1_8], sample_num = sample_num)
 
-        # Trigger two joint IMU/EMG events:
+        # Trigger two joint IMU/EMG events (once an IMU packet has been received)
+        if sender_obj.current_imu_read is None:
+            return
+
         sample_num = 1
         sender_obj.joint_emg_imu_event(emg_list = [sample_0_1, sample_0_2, sample_0_3, sample_0_4, sample_0_5,
                                                         sample_0_6, sample_0_7, sample_0_8],
@@ -0,0 +1,7 @@
+from pymyolinux.session.timeline import LabelTimeline
+from pymyolinux.session.writer import SessionWriter, find_sessions, read_header, recover_session
+from pymyolinux.session.format import Session, load_session, read_session
+from pymyolinux.session.csv_io import csv_to_session, load_csv_session, read_csv, session_to_csv
+from pymyolinux.session.ninapro import ninapro_arrays, save_ninapro, session_to_ninapro
+from pymyolinux.session.catalog import SessionCatalog, summarize_session
+from pymyolinux.session.spill import SpillList
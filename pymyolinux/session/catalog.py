@@ -0,0 +1,251 @@
+import json
+import os
+import sqlite3
+import sys
+from os.path import abspath, exists, getmtime, getsize, join
+import numpy as np
+
+from pymyolinux.session.format import Session
+from pymyolinux.session.writer import SessionWriter
+
+
+def session_signature(path):
+    """
+    :param path: Session directory
+    :return: [str] Changes whenever data is added to the session (or its header changes)
+    """
+    file_paths  = ([join(path, "labels.bin"), join(path, "mapping.bin")] +
+                   [join(path, band_name, "chunks.bin") for band_name in SessionWriter.band_names])
+    signature   = [getmtime(join(path, SessionWriter.header_name))]
+    signature  += [getsize(file_path) if exists(file_path) else 0 for file_path in file_paths]
+    return json.dumps(signature)
+
+
+def summarize_session(path):
+    """
+        Summarize a session (only the chunk index, timestamps, labels and mapping are read).
+
+    :param path: Session directory
+    :return: [dict] -> "state", "created", "base_time", "codec", "source", "num_devices", "mac_1", "mac_2",
+                "samples_1", "samples_2", "duration" (seconds), "sync_coverage" (fraction of band_1 samples
+                synchronized with a band_2 sample, None with a single device), "labels" (label -> number of samples)
+    """
+    session = Session(path)
+    header  = session.header
+    devices = header.get("devices") or {}
+    summary = {
+                "state":        header.get("state"),
+                "created":      header.get("created"),
+                "base_time":    header.get("base_time"),
+                "codec":        header.get("codec"),
+                "source":       header.get("source"),
+                "duration":     0.0,
+                "labels":       {}
+            }
+
+    band_names = [band_name for band_name in SessionWriter.band_names if session.num_samples(band_name) > 0]
+    for i, band_name in enumerate(SessionWriter.band_names, 1):
+        chunks                              = session.chunks[band_name]
+        summary["samples_{}".format(i)]     = session.num_samples(band_name)
+        summary["mac_{}".format(i)]         = devices.get(band_name)
+        if chunks.shape[0] > 0:
+            summary["duration"] = max(summary["duration"], float(chunks["t_last"][-1] - chunks["t_first"][0]))
+    summary["num_devices"] = len(band_names)
+
+    # Number of samples of each label (samples of the first device, labelled as by exports and training)
+    if len(band_names) > 0:
+        labels, counts = np.unique(session.label_timeline.labels_at(session.bands[band_names[0]]["time"]),
+                                   return_counts=True)
+        summary["labels"] = dict(zip(labels.tolist(), counts.tolist()))
+
+    if len(band_names) == 2:
+        summary["sync_coverage"] = (float(np.count_nonzero(session.mapping != Session.invalid_map)) /
+                                    session.num_samples(band_names[0]))
+    else:
+        summary["sync_coverage"] = None
+
+    return summary
+
+
+class SessionCatalog():
+    """
+        An index (SQLite database) of recorded sessions, to select sessions by query without opening them, e.g.
+            catalog.find(num_devices=2, labels=[1, 2, 3], min_duration=60)
+
+            > Sessions are added when saved (see "add"), and existing directories can be (re)scanned incrementally:
+                only new or changed sessions are summarized again (see "scan"). Legacy CSV directories can be indexed
+                once converted to sessions (see "pymyolinux.session.csv_io.load_csv_session").
+    """
+
+    schema = """
+                CREATE TABLE IF NOT EXISTS sessions (
+                    path            TEXT PRIMARY KEY,
+                    signature       TEXT,
+                    state           TEXT,
+                    created         REAL,
+                    base_time       REAL,
+                    codec           TEXT,
+                    source          TEXT,
+                    num_devices     INTEGER,
+                    mac_1           TEXT,
+                    mac_2           TEXT,
+                    samples_1       INTEGER,
+                    samples_2       INTEGER,
+                    duration        REAL,
+                    sync_coverage   REAL
+                );
+                CREATE TABLE IF NOT EXISTS labels (
+                    path            TEXT REFERENCES sessions(path) ON DELETE CASCADE,
+                    label           INTEGER,
+                    num_samples     INTEGER,
+                    PRIMARY KEY (path, label)
+                );
+                CREATE INDEX IF NOT EXISTS labels_label ON labels(label);
+                CREATE INDEX IF NOT EXISTS sessions_duration ON sessions(duration);
+            """
+
+    session_columns = ["state", "created", "base_time", "codec", "source", "num_devices", "mac_1", "mac_2",
+                       "samples_1", "samples_2", "duration", "sync_coverage"]
+
+    def __init__(self, db_path):
+        """
+        :param db_path: Database file (created if it does not exist)
+        """
+        self.db_path    = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(self.schema)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def add(self, path, signature=None):
+        """
+            Add (or update) a session.
+
+        :param path: Session directory
+        :param signature: Signature of the session (see "session_signature"), None: computed
+        """
+        path        = abspath(path)
+        signature   = session_signature(path) if signature is None else signature
+        summary     = summarize_session(path)
+        columns     = ["path", "signature"] + self.session_columns
+        values      = [path, signature] + [summary[column] for column in self.session_columns]
+
+        with self.connection:
+            self.connection.execute("DELETE FROM sessions WHERE path = ?", (path,))
+            self.connection.execute("INSERT INTO sessions ({}) VALUES ({})".format(", ".join(columns),
+                                                                                   ", ".join("?" * len(columns))),
+                                    values)
+            self.connection.executemany("INSERT INTO labels (path, label, num_samples) VALUES (?, ?, ?)",
+                                        [(path, label, num_samples)
+                                         for label, num_samples in sorted(summary["labels"].items())])
+
+    def remove(self, path):
+        """
+        :param path: Session directory
+        """
+        with self.connection:
+            self.connection.execute("DELETE FROM sessions WHERE path = ?", (abspath(path),))
+
+    def scan(self, directory):
+        """
+            Index all sessions within a directory (recursively).
+
+                > Sessions that have not changed since they were last indexed are skipped, and sessions that no longer
+                    exist (within the directory) are removed.
+
+        :param directory: Directory to scan
+        :return: (number of sessions added/updated, number of sessions removed)
+        """
+        directory   = abspath(directory)
+        rows        = self.connection.execute("SELECT path, signature FROM sessions")
+        known       = {path: signature for path, signature in rows
+                       if (path == directory) or path.startswith(join(directory, ""))}
+        found       = set()
+        num_updated = 0
+
+        for root, dir_names, file_names in os.walk(directory):
+            if SessionWriter.header_name not in file_names:
+                continue
+            dir_names[:] = []  # Sessions are not nested
+
+            try:
+                signature = session_signature(root)
+                found.add(root)
+                if known.get(root) != signature:
+                    self.add(root, signature)
+                    num_updated += 1
+            except (OSError, ValueError):
+                continue  # Not a (readable) session
+
+        removed = [path for path in known if path not in found]
+        with self.connection:
+            self.connection.executemany("DELETE FROM sessions WHERE path = ?", [(path,) for path in removed])
+        return num_updated, len(removed)
+
+    def find(self, num_devices=None, labels=None, min_duration=None, max_duration=None, mac=None, state=None,
+             min_sync_coverage=None):
+        """
+        :param num_devices: Number of devices data was collected from
+        :param labels: A list of labels that must all be present (e.g. a movement set)
+        :param min_duration: Minimum duration (seconds)
+        :param max_duration: Maximum duration (seconds)
+        :param mac: Address of a device used (either band)
+        :param state: Session state (see "SessionWriter.STATE_*")
+        :param min_sync_coverage: Minimum fraction of synchronized samples (two devices)
+        :return: [list] Matching session directories
+        """
+        conditions, params = [], []
+        for condition, value in (("num_devices = ?", num_devices), ("duration >= ?", min_duration),
+                                 ("duration <= ?", max_duration), ("state = ?", state),
+                                 ("sync_coverage >= ?", min_sync_coverage)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+
+        if mac is not None:
+            conditions.append("(mac_1 = ? OR mac_2 = ?)")
+            params += [mac, mac]
+
+        if labels:
+            labels = sorted(set(int(label) for label in labels))
+            conditions.append("path IN (SELECT path FROM labels WHERE num_samples > 0 AND label IN ({}) "
+                              "GROUP BY path HAVING COUNT(*) = ?)".format(", ".join("?" * len(labels))))
+            params += labels + [len(labels)]
+
+        query = "SELECT path FROM sessions"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        return [row[0] for row in self.connection.execute(query + " ORDER BY path", params)]
+
+    def summary(self, path):
+        """
+        :param path: Session directory
+        :return: [dict] Indexed summary of the session (see "summarize_session"), None if not indexed
+        """
+        path    = abspath(path)
+        row     = self.connection.execute("SELECT {} FROM sessions WHERE path = ?".format(
+                                          ", ".join(self.session_columns)), (path,)).fetchone()
+        if row is None:
+            return None
+
+        summary             = dict(zip(self.session_columns, row))
+        summary["labels"]   = dict(self.connection.execute("SELECT label, num_samples FROM labels WHERE path = ?",
+                                                           (path,)))
+        return summary
+
+
+if __name__ == "__main__":
+    #
+    # Usage: python -m pymyolinux.session.catalog <catalog file> <directory> [<directory> ...]
+    #
+    with SessionCatalog(sys.argv[1]) as catalog:
+        for scan_dir in sys.argv[2:]:
+            print("{}: {} sessions added/updated, {} removed".format(scan_dir, *catalog.scan(scan_dir)))
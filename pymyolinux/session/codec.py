@@ -0,0 +1,206 @@
+import lzma
+import sys
+import time
+import zlib
+from collections import OrderedDict
+import numpy as np
+
+#
+# Compression methods (stdlib), and their default compression levels
+#
+CODECS = {
+            "zlib": (lambda data, level: zlib.compress(data, level), zlib.decompress, 6),
+            "lzma": (lambda data, level: lzma.compress(data, preset=level), lzma.decompress, 6)
+        }
+
+# Per compressed column, location of each chunk in the compressed file (one entry per chunk index entry)
+offsets_dtype = np.dtype([("offset", "<i8"), ("nbytes", "<i8")])
+
+
+def delta_encode(values):
+    """
+        Replace each row by its difference from the previous row (integer overflow wraps around, so this is lossless).
+
+    :param values: Integer array, first axis is time
+    :return: [np.ndarray] Deltas, same shape and dtype as "values" (the first row is kept as is)
+    """
+    deltas      = np.array(values)
+    deltas[1:]  = deltas[1:] - deltas[:-1]
+    return deltas
+
+
+def delta_decode(deltas):
+    """
+    :param deltas: An array returned by "delta_encode"
+    :return: [np.ndarray] The original values
+    """
+    return np.cumsum(deltas, axis=0, dtype=deltas.dtype)
+
+
+def encode(values, method, level=None):
+    """
+    :param values: Integer array (a chunk of a column), first axis is time
+    :param method: A key of CODECS, "zlib"/"lzma"
+    :param level: Compression level (None: default level of the method)
+    :return: [bytes] Compressed chunk
+    """
+    compress, decompress, default_level = CODECS[method]
+    deltas = delta_encode(np.ascontiguousarray(values))
+    return compress(deltas.tobytes(), default_level if level is None else level)
+
+
+def decode(data, dtype, row_shape, method):
+    """
+    :param data: A compressed chunk returned by "encode"
+    :param dtype: Data type of the column
+    :param row_shape: Shape of a single row of the column, e.g. (8,)
+    :param method: A key of CODECS, "zlib"/"lzma"
+    :return: [np.ndarray] The chunk of the column
+    """
+    compress, decompress, default_level = CODECS[method]
+    deltas = np.frombuffer(decompress(data), dtype=dtype).reshape((-1,) + tuple(row_shape))
+    return delta_decode(deltas)
+
+
+class CompressedColumn():
+    """
+        A read-only column stored as compressed chunks, that supports (NumPy-style) row indexing.
+
+            > Only the chunks containing the requested rows are read and decompressed (a few decoded chunks are
+                cached), allowing random access into compressed sessions.
+    """
+
+    def __init__(self, file_path, offsets, row_starts, row_ends, dtype, row_shape, method, cache_size=8):
+        """
+        :param file_path: File containing compressed chunks
+        :param offsets: Location of each chunk in the file (offsets_dtype)
+        :param row_starts: First row of each chunk
+        :param row_ends: Last row (exclusive) of each chunk
+        :param dtype: Data type of the column
+        :param row_shape: Shape of a single row of the column, e.g. (8,)
+        :param method: A key of CODECS, "zlib"/"lzma"
+        :param cache_size: Number of decoded chunks to keep in memory
+        """
+        self.file_path  = file_path
+        self.offsets    = offsets
+        self.row_starts = np.asarray(row_starts, dtype=np.int64)
+        self.row_ends   = np.asarray(row_ends, dtype=np.int64)
+        self.dtype      = np.dtype(dtype)
+        self.row_shape  = tuple(row_shape)
+        self.method     = method
+        self.cache_size = cache_size
+        self.cache      = OrderedDict()
+
+        num_rows    = int(self.row_ends[-1]) if self.row_ends.shape[0] > 0 else 0
+        self.shape  = (num_rows,) + self.row_shape
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __array__(self, dtype=None):
+        values = self[:]
+        return values if dtype is None else values.astype(dtype)
+
+    def __getitem__(self, key):
+        num_rows = self.shape[0]
+
+        if isinstance(key, slice):
+            start, stop, step = key.indices(num_rows)
+            if stop <= start:
+                return np.zeros((0,) + self.row_shape, dtype=self.dtype)
+            first_chunk = int(np.searchsorted(self.row_starts, start, side="right")) - 1
+            last_chunk  = int(np.searchsorted(self.row_starts, stop - 1, side="right")) - 1
+            values      = np.concatenate([self.decode_chunk(i) for i in range(first_chunk, last_chunk + 1)])
+            offset      = int(self.row_starts[first_chunk])
+            return values[start - offset:stop - offset:step]
+
+        rows        = np.asarray(key, dtype=np.int64)
+        scalar      = rows.ndim == 0
+        rows        = np.where(rows < 0, rows + num_rows, rows).reshape(-1)
+        if np.any((rows < 0) | (rows >= num_rows)):
+            raise IndexError("Row index out of range.")
+
+        values      = np.zeros((rows.shape[0],) + self.row_shape, dtype=self.dtype)
+        chunk_ids   = np.searchsorted(self.row_starts, rows, side="right") - 1
+        for chunk_idx in np.unique(chunk_ids):
+            selected            = chunk_ids == chunk_idx
+            values[selected]    = self.decode_chunk(chunk_idx)[rows[selected] - self.row_starts[chunk_idx]]
+
+        return values[0] if scalar else values
+
+    def decode_chunk(self, chunk_idx):
+        chunk_idx = int(chunk_idx)
+        if chunk_idx in self.cache:
+            self.cache.move_to_end(chunk_idx)
+            return self.cache[chunk_idx]
+
+        with open(self.file_path, "rb") as fd:
+            fd.seek(int(self.offsets["offset"][chunk_idx]))
+            data = fd.read(int(self.offsets["nbytes"][chunk_idx]))
+        values = decode(data, self.dtype, self.row_shape, self.method)
+
+        self.cache[chunk_idx] = values
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return values
+
+
+def benchmark(path, methods=None, level=None):
+    """
+        Measure compression ratio, and encode/decode throughput, of each compression method on a recorded session.
+
+            > Chunks are compressed as written by the session writer (per column, per chunk).
+
+    :param path: Session directory
+    :param methods: A list of keys of CODECS (None: all)
+    :param level: Compression level (None: default level of each method)
+    :return: [dict] Per method -> "ratio", "encode_mb_s", "decode_mb_s", "raw_bytes", "compressed_bytes",
+                "bytes_per_sample" (per EMG sample, of all compressed columns)
+    """
+    from pymyolinux.session.format import load_session
+    from pymyolinux.session.writer import SessionWriter
+
+    session = load_session(path)
+    chunks  = []
+    for band_name in SessionWriter.band_names:
+        band = session.bands[band_name]
+        for chunk in session.chunks[band_name]:
+            start, end, imu_start, imu_end = chunk["start"], chunk["end"], chunk["imu_start"], chunk["imu_end"]
+            chunks += [np.asarray(band["emg"][start:end]), np.asarray(band["imu_index"][start:end]),
+                       np.asarray(band["imu"][imu_start:imu_end])]
+
+    num_samples = sum(session.num_samples(band_name) for band_name in SessionWriter.band_names)
+    raw_bytes   = sum(chunk.nbytes for chunk in chunks)
+    results     = {}
+
+    for method in (sorted(CODECS.keys()) if methods is None else methods):
+        start_time  = time.perf_counter()
+        encoded     = [encode(chunk, method, level) for chunk in chunks]
+        encode_time = time.perf_counter() - start_time
+
+        start_time  = time.perf_counter()
+        for data, chunk in zip(encoded, chunks):
+            decode(data, chunk.dtype, chunk.shape[1:], method)
+        decode_time = time.perf_counter() - start_time
+
+        compressed_bytes    = sum(len(data) for data in encoded)
+        results[method]     = {
+                                "raw_bytes":        raw_bytes,
+                                "compressed_bytes": compressed_bytes,
+                                "ratio":            raw_bytes / max(compressed_bytes, 1),
+                                "bytes_per_sample": compressed_bytes / max(num_samples, 1),
+                                "encode_mb_s":      raw_bytes / 1e6 / max(encode_time, 1e-9),
+                                "decode_mb_s":      raw_bytes / 1e6 / max(decode_time, 1e-9)
+                            }
+    return results
+
+
+if __name__ == "__main__":
+    #
+    # Usage: python -m pymyolinux.session.codec <session directory> [<session directory> ...]
+    #
+    for session_path in sys.argv[1:]:
+        print(session_path)
+        for method, result in benchmark(session_path).items():
+            print("    {:<5} ratio: {:6.2f}x  ({:.2f} bytes/sample)  encode: {:8.1f} MB/s  decode: {:8.1f} MB/s".format(
+                  method, result["ratio"], result["bytes_per_sample"], result["encode_mb_s"], result["decode_mb_s"]))
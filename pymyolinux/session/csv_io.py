@@ -0,0 +1,419 @@
+import io
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from os.path import abspath, exists, getmtime, getsize, join
+import numpy as np
+
+from pymyolinux.session.format import Session, load_session
+from pymyolinux.session.timeline import LabelTimeline
+from pymyolinux.session.writer import SessionWriter, read_header
+
+#
+# CSV layouts, as written by the GUI demonstration (see "DataTools.save_clicked")
+#
+FILENAME_1          = "myo_1_data.csv"
+FILENAME_2          = "myo_2_data.csv"
+FILENAME_ALL        = "myo_all_data.csv"
+SINGLE_MYO_FILENAME = "myodata.csv"
+
+SINGLE_HEADER   = ("Time, Label, EMG_1, EMG_2, EMG_3, EMG_4, EMG_5, EMG_6, EMG_7, EMG_8, OR_W, OR_X, OR_Y, OR_Z,"
+                   "ACC_1, ACC_2, ACC_3, GYRO_1, GYRO_2, GYRO_3\n")
+ALL_HEADER      = ("Time_1, Time_2, Label, D1_EMG_1, D1_EMG_2, D1_EMG_3, D1_EMG_4, D1_EMG_5, D1_EMG_6, D1_EMG_7,"
+                   " D1_EMG_8, D1_OR_W, D1_OR_X, D1_OR_Y, D1_OR_Z, D1_ACC_1, D1_ACC_2, D1_ACC_3, D1_GYRO_1,"
+                   " D1_GYRO_2, D1_GYRO_3,"
+                   " D2_EMG_1, D2_EMG_2, D2_EMG_3, D2_EMG_4, D2_EMG_5, D2_EMG_6, D2_EMG_7, D2_EMG_8, D2_OR_W,"
+                   " D2_OR_X, D2_OR_Y, D2_OR_Z, D2_ACC_1, D2_ACC_2, D2_ACC_3, D2_GYRO_1, D2_GYRO_2, D2_GYRO_3\n")
+
+# Equivalent to the "{:.4f}"/"{}" formatting of each row (floats are formatted with "%d" for integer columns)
+DEVICE_FORMAT       = ",".join(["%d"] * 8 + ["%.4f"] * 10)
+SINGLE_ROW_FORMAT   = "%.4f,%d," + DEVICE_FORMAT + "\n"
+ALL_ROW_FORMAT      = "%.4f,%.4f,%d," + DEVICE_FORMAT + "," + DEVICE_FORMAT + "\n"
+
+IMU_SCALES      = np.array(SessionWriter.header_defaults["imu_scales"], dtype=np.float64)
+ROWS_PER_BLOCK  = 8192  # Rows formatted at once
+
+#
+# Column layouts, for loading CSV files -> (name, first column, number of columns, dtype, scale)
+#   > IMU values are restored to raw (int16) values, as stored by SessionWriter
+#
+SINGLE_LAYOUT   = [("time", 0, 1, np.float64, None), ("label", 1, 1, np.int64, None),
+                   ("emg", 2, 8, np.int8, None), ("imu", 10, 10, np.int16, IMU_SCALES)]
+ALL_LAYOUT      = [("time_1", 0, 1, np.float64, None), ("time_2", 1, 1, np.float64, None),
+                   ("label", 2, 1, np.int64, None),
+                   ("emg_1", 3, 8, np.int8, None), ("imu_1", 11, 10, np.int16, IMU_SCALES),
+                   ("emg_2", 21, 8, np.int8, None), ("imu_2", 29, 10, np.int16, IMU_SCALES)]
+LAYOUTS         = {SINGLE_HEADER.strip(): SINGLE_LAYOUT, ALL_HEADER.strip(): ALL_LAYOUT}
+
+CSV_CHUNK_BYTES     = 1 << 22           # CSV files are parsed in chunks of (about) this many bytes
+CSV_CACHE_DIRNAME   = "csv_session"     # Loaded CSV files are cached (as a session) in this subdirectory
+
+
+def format_rows(row_format, block):
+    """
+        Format a block of rows at once (a single string formatting operation).
+
+    :param row_format: Format of a single row, e.g. SINGLE_ROW_FORMAT
+    :param block: A 2D array of values (float64)
+    :return: [str] Formatted rows
+    """
+    return (row_format * block.shape[0]) % tuple(block.ravel().tolist())
+
+
+def device_columns(band, rows, imu_scales=IMU_SCALES):
+    """
+    :param band: A dictionary of EMG/IMU data of a single device -> "emg" (N, 8), "imu_index" (N,), "imu" (M, 10) raw
+    :param rows: Rows (EMG samples) to select, a slice or an array of indices
+    :return: [np.ndarray] EMG samples and (joined, rescaled) IMU samples (float64), shape (len(rows), 18)
+    """
+    emg = np.asarray(band["emg"][rows], dtype=np.float64)
+    imu = np.asarray(band["imu"][np.asarray(band["imu_index"][rows])], dtype=np.float64) / imu_scales
+    return np.hstack((emg.reshape(-1, SessionWriter.emg_channels), imu.reshape(-1, SessionWriter.imu_channels)))
+
+
+def write_single_csv(fd, band, label_timeline, base_time, imu_scales=IMU_SCALES, progress=None):
+    """
+        Write all data of a single device (rows of "Time, Label, EMG_1 ... GYRO_3", without a header).
+
+    :param fd: A file descriptor (opened for writing)
+    :param band: A dictionary of data of a single device -> "time" (N,), "emg" (N, 8), "imu_index" (N,), "imu" (M, 10)
+    :param label_timeline: A LabelTimeline, used to label each sample
+    :param base_time: Saved times are relative to this time
+    :param imu_scales: OR/ACC/GYRO = raw IMU / scale
+    :param progress: If not None, a function called with the number of rows written so far
+    """
+    timestamps  = band["time"]
+    num_rows    = len(timestamps)
+
+    for start in range(0, num_rows, ROWS_PER_BLOCK):
+        end         = min(start + ROWS_PER_BLOCK, num_rows)
+        block_time  = np.asarray(timestamps[start:end], dtype=np.float64)
+        block       = np.column_stack((block_time - base_time, label_timeline.labels_at(block_time),
+                                       device_columns(band, slice(start, end), imu_scales)))
+        fd.write(format_rows(SINGLE_ROW_FORMAT, block))
+
+        if progress is not None:
+            progress(end)
+
+
+def synchronized_rows(time_1, time_2, mapping, buffer_period, invalid_map=Session.invalid_map):
+    """
+        Find the pairs of synchronized samples, saved to a file containing data from both devices.
+
+    :param time_1: Sample timestamps of the first device
+    :param time_2: Sample timestamps of the second device
+    :param mapping: Synchronization mapping, first device sample index -> second device sample index
+    :param buffer_period: How many of the first few seconds (of data from both devices) are ignored
+    :param invalid_map: Mapping entry of a sample without a synchronized sample
+    :return: (rows_1, rows_2) -> Synchronized sample indices of both devices
+    """
+    num_rows_1  = len(time_1)
+    num_rows_2  = len(time_2)
+    max_first   = max(time_1[0], time_2[0])
+    min_last    = min(time_1[num_rows_1 - 1], time_2[num_rows_2 - 1])
+
+    # Define time of first data point (using a buffer period)
+    start_time = max_first + buffer_period
+    if start_time > min_last:
+        raise ValueError("Less than {} seconds worth of data collected.".format(buffer_period))
+
+    # Closest sample of the first device (the earlier sample on ties)
+    first_idx = int(np.searchsorted(time_1, start_time, side="left"))
+    if first_idx == num_rows_1:
+        first_idx = num_rows_1 - 1
+    elif (first_idx > 0) and (abs(start_time - time_1[first_idx - 1]) <= abs(time_1[first_idx] - start_time)):
+        first_idx -= 1
+
+    rows_1      = np.arange(first_idx, num_rows_1)
+    rows_2      = np.full(rows_1.shape[0], invalid_map, dtype=np.int64)
+    num_mapped  = max(min(num_rows_1, len(mapping)) - first_idx, 0)
+    rows_2[:num_mapped] = np.asarray(mapping[first_idx:first_idx + num_mapped], dtype=np.int64)
+
+    # Impossible to synchronize data (adequately)
+    valid = (rows_2 != invalid_map) & (rows_2 < num_rows_2)
+    return rows_1[valid], rows_2[valid]
+
+
+def write_all_csv(fd, band_1, band_2, rows_1, rows_2, label_timeline, base_time, imu_scales=IMU_SCALES,
+                  progress=None):
+    """
+        Write synchronized data of both devices (rows of "Time_1, Time_2, Label, D1_EMG_1 ... D2_GYRO_3", without a
+            header). The label of each row is the label of the first device's sample.
+
+    :param fd: A file descriptor (opened for writing)
+    :param band_1: Data of the first device, see "write_single_csv"
+    :param band_2: Data of the second device
+    :param rows_1: Synchronized sample indices of the first device (see "synchronized_rows")
+    :param rows_2: Synchronized sample indices of the second device
+    :param label_timeline: A LabelTimeline, used to label each sample
+    :param base_time: Saved times are relative to this time
+    :param imu_scales: OR/ACC/GYRO = raw IMU / scale
+    :param progress: If not None, a function called with the number of rows written so far
+    """
+    num_rows = len(rows_1)
+
+    for start in range(0, num_rows, ROWS_PER_BLOCK):
+        block_rows_1    = rows_1[start:start + ROWS_PER_BLOCK]
+        block_rows_2    = rows_2[start:start + ROWS_PER_BLOCK]
+        block_time_1    = np.asarray(band_1["time"][block_rows_1], dtype=np.float64)
+        block_time_2    = np.asarray(band_2["time"][block_rows_2], dtype=np.float64)
+        block           = np.column_stack((block_time_1 - base_time, block_time_2 - base_time,
+                                           label_timeline.labels_at(block_time_1),
+                                           device_columns(band_1, block_rows_1, imu_scales),
+                                           device_columns(band_2, block_rows_2, imu_scales)))
+        fd.write(format_rows(ALL_ROW_FORMAT, block))
+
+        if progress is not None:
+            progress(start + block_rows_1.shape[0])
+
+
+def session_to_csv(path, directory, buffer_period=2):
+    """
+        Convert a session to the CSV files written by the GUI demonstration.
+
+    :param path: Session directory
+    :param directory: Directory in which to write the CSV files
+    :param buffer_period: How many of the first few seconds are ignored, in the file containing data from both devices
+    :return: A list of files written
+    """
+    session     = load_session(path)
+    band_1      = session.bands["band_1"]
+    band_2      = session.bands["band_2"]
+    base_time   = session.base_time
+    timeline    = session.label_timeline
+
+    # A single device
+    if (len(band_1["time"]) == 0) or (len(band_2["time"]) == 0):
+        file_path = join(directory, SINGLE_MYO_FILENAME)
+        with open(file_path, "w") as fd:
+            fd.write(SINGLE_HEADER)
+            write_single_csv(fd, band_1 if len(band_1["time"]) > 0 else band_2, timeline, base_time,
+                             session.imu_scales)
+        return [file_path]
+
+    rows_1, rows_2  = synchronized_rows(band_1["time"], band_2["time"], session.mapping, buffer_period)
+    file_paths      = [join(directory, FILENAME_1), join(directory, FILENAME_2), join(directory, FILENAME_ALL)]
+
+    for file_path, band in zip(file_paths, (band_1, band_2)):
+        with open(file_path, "w") as fd:
+            fd.write(SINGLE_HEADER)
+            write_single_csv(fd, band, timeline, base_time, session.imu_scales)
+
+    with open(file_paths[2], "w") as fd:
+        fd.write(ALL_HEADER)
+        write_all_csv(fd, band_1, band_2, rows_1, rows_2, timeline, base_time, session.imu_scales)
+    return file_paths
+
+
+def read_chunks(file_path, chunk_bytes=CSV_CHUNK_BYTES):
+    """
+    :param file_path: A CSV file
+    :param chunk_bytes: Approximate size of each chunk
+    :return: [generator] (header line, then) chunks of whole lines (bytes)
+    """
+    with open(file_path, "rb") as fd:
+        yield fd.readline()
+        remainder = b""
+        while True:
+            data = fd.read(chunk_bytes)
+            if not data:
+                if remainder.strip():
+                    yield remainder
+                return
+
+            data        = remainder + data
+            line_end    = data.rfind(b"\n") + 1
+            remainder   = data[line_end:]
+            if line_end > 0:
+                yield data[:line_end]
+
+
+def count_rows(file_path, chunk_bytes=CSV_CHUNK_BYTES):
+    """
+    :param file_path: A CSV file (with a header line)
+    :param chunk_bytes: Size of each chunk read
+    :return: [int] Number of rows (excluding the header)
+    """
+    chunks = read_chunks(file_path, chunk_bytes)
+    next(chunks)
+    return sum(chunk.count(b"\n") + (0 if chunk.endswith(b"\n") else 1) for chunk in chunks)
+
+
+def read_csv(file_path, chunk_bytes=CSV_CHUNK_BYTES):
+    """
+        Load a CSV file written by the GUI demonstration into columnar arrays.
+
+            > The layout is known from the header (SINGLE_LAYOUT/ALL_LAYOUT): the file is parsed in chunks, and each
+                chunk is converted to the dtype of each column, straight into preallocated arrays.
+
+    :param file_path: A CSV file written by the GUI demonstration
+    :param chunk_bytes: Approximate number of bytes parsed at once
+    :return: [dict] Column name -> np.ndarray, e.g. "time" (N,), "label" (N,), "emg" (N, 8), "imu" (N, 10) raw
+    """
+    chunks      = read_chunks(file_path, chunk_bytes)
+    header      = next(chunks).decode("ascii").strip()
+    if header not in LAYOUTS:
+        raise ValueError("Unknown CSV layout in \"{}\".".format(file_path))
+
+    layout      = LAYOUTS[header]
+    num_rows    = count_rows(file_path, chunk_bytes)
+    num_columns = sum(num_cols for name, first_col, num_cols, dtype, scale in layout)
+    columns     = {name: np.empty((num_rows,) if num_cols == 1 else (num_rows, num_cols), dtype=dtype)
+                   for name, first_col, num_cols, dtype, scale in layout}
+
+    row = 0
+    for chunk in chunks:
+        values  = np.loadtxt(io.BytesIO(chunk), delimiter=",", dtype=np.float64, ndmin=2)
+        end     = row + values.shape[0]
+        if values.shape[1] != num_columns:
+            raise ValueError("Expected {} columns in \"{}\".".format(num_columns, file_path))
+
+        for name, first_col, num_cols, dtype, scale in layout:
+            block = values[:, first_col:first_col + num_cols]
+            if scale is not None:
+                block = np.rint(block * scale)
+            columns[name][row:end] = block[:, 0] if num_cols == 1 else block
+        row = end
+
+    return columns
+
+
+def read_csv_files(file_paths, parallel=True):
+    """
+    :param file_paths: A list of CSV files written by the GUI demonstration
+    :param parallel: Load files in separate processes (if multiple CPUs are available)
+    :return: [list] Columns of each file (see "read_csv")
+    """
+    max_workers = min(len(file_paths), os.cpu_count() or 1)
+    if (not parallel) or (max_workers < 2):
+        return [read_csv(file_path) for file_path in file_paths]
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(read_csv, file_paths))
+
+
+def csv_files(directory):
+    """
+    :param directory: Directory containing CSV files written by the GUI demonstration
+    :return: [list] Files of each device, followed by the synchronized file if it exists
+    """
+    if exists(join(directory, FILENAME_1)) and exists(join(directory, FILENAME_2)):
+        file_paths = [join(directory, FILENAME_1), join(directory, FILENAME_2)]
+        if exists(join(directory, FILENAME_ALL)):
+            file_paths.append(join(directory, FILENAME_ALL))
+        return file_paths
+    elif exists(join(directory, SINGLE_MYO_FILENAME)):
+        return [join(directory, SINGLE_MYO_FILENAME)]
+    raise FileNotFoundError("No CSV files found in \"{}\".".format(directory))
+
+
+def csv_signature(file_paths):
+    """
+    :param file_paths: A list of files
+    :return: [dict] File name -> [size, modification time], used to detect changes to cached files
+    """
+    return {os.path.basename(file_path): [getsize(file_path), getmtime(file_path)] for file_path in file_paths}
+
+
+def label_transitions(times, labels):
+    """
+        Find ground truth label transitions in per-sample labels (as recorded by "LabelTimeline.record", one sample at
+            a time).
+
+    :param times: Sample timestamps, shape (N,)
+    :param labels: Label of each sample, shape (N,)
+    :return: (timestamps, labels) -> Transitions, shape (number of transitions,)
+    """
+    times   = np.asarray(times, dtype=np.float64)
+    labels  = np.asarray(labels, dtype=np.int64)
+    if labels.shape[0] == 0:
+        return times, labels
+
+    rows = np.concatenate(([0], np.flatnonzero(np.diff(labels)) + 1))
+    if labels[0] == LabelTimeline.default_label:
+        rows = rows[1:]     # Unlabelled samples precede the first transition
+
+    # Transition timestamps are kept increasing (see "LabelTimeline.record")
+    return np.maximum.accumulate(times[rows]), labels[rows]
+
+
+def csv_to_session(directory, path, codec=None, parallel=True):
+    """
+        Convert CSV files written by the GUI demonstration (either myo_1_data.csv, myo_2_data.csv and optionally
+            myo_all_data.csv, or myodata.csv) to a session.
+
+            > Times are stored relative to a base time of 0, IMU samples are restored at their native rate (a new IMU
+                sample begins wherever IMU values change), and label transitions are taken from the first device.
+
+    :param directory: Directory containing CSV files
+    :param path: Session directory to create
+    :param codec: Compression method of the session ("zlib"/"lzma"), None: uncompressed
+    :param parallel: Load CSV files in parallel (see "read_csv_files")
+    :return: [SessionWriter] The (closed) writer of the new session
+    """
+    file_paths  = csv_files(directory)
+    contents    = read_csv_files(file_paths, parallel)
+    device_data = contents[:2] if len(file_paths) > 1 else contents
+    metadata    = {"source": abspath(directory), "source_files": csv_signature(file_paths)}
+    writer      = SessionWriter(path, base_time=0.0, metadata=metadata, codec=codec)
+
+    for band_num, data in enumerate(device_data, 1):
+        imu = data["imu"]
+
+        # Collapse repeated IMU values (joined to consecutive EMG samples) into IMU samples
+        new_imu             = np.ones(imu.shape[0], dtype=bool)
+        new_imu[1:]         = np.any(imu[1:] != imu[:-1], axis=1)
+        imu_index           = np.cumsum(new_imu) - 1
+
+        writer.append_band(band_num, data["time"], data["emg"], imu_index, data["time"][new_imu], imu[new_imu])
+
+    # Label transitions
+    writer.append_labels(*label_transitions(device_data[0]["time"], device_data[0]["label"]))
+
+    # Synchronization mapping (samples are matched by their saved times)
+    if len(contents) == 3:
+        all_data    = contents[2]
+        time_1      = device_data[0]["time"]
+        time_2      = device_data[1]["time"]
+        mapping     = np.full(time_1.shape[0], Session.invalid_map, dtype=np.int64)
+        rows_1      = np.searchsorted(time_1, all_data["time_1"])
+        rows_2      = np.searchsorted(time_2, all_data["time_2"])
+        valid       = (rows_1 < time_1.shape[0]) & (rows_2 < time_2.shape[0])
+        mapping[rows_1[valid]] = rows_2[valid]
+        writer.append_mapping(mapping)
+
+    writer.set_state(SessionWriter.STATE_FINALIZED)
+    writer.close()
+    return writer
+
+
+def load_csv_session(directory, codec=None, parallel=True):
+    """
+        Load CSV files written by the GUI demonstration, as a (memory-mapped) session.
+
+            > On the first load, the CSV files are converted to a session in CSV_CACHE_DIRNAME (next to the CSV files),
+                later loads open the cached session directly (unless the CSV files have changed).
+
+    :param directory: Directory containing CSV files
+    :param codec: Compression method of a new cached session ("zlib"/"lzma"), None: uncompressed
+    :param parallel: Load CSV files in parallel (see "read_csv_files")
+    :return: [Session]
+    """
+    cache_path = join(directory, CSV_CACHE_DIRNAME)
+    if exists(cache_path):
+        try:
+            header = read_header(cache_path)
+        except (OSError, ValueError):
+            header = {}
+        if ((header.get("state") == SessionWriter.STATE_FINALIZED) and
+                (header.get("source_files") == csv_signature(csv_files(directory)))):
+            return load_session(cache_path)
+
+    # (Re)create the cached session, then replace any previous one
+    temp_path = cache_path + ".tmp"
+    for old_path in (temp_path, cache_path):
+        if exists(old_path):
+            shutil.rmtree(old_path)
+    csv_to_session(directory, temp_path, codec, parallel)
+    os.replace(temp_path, cache_path)
+    return load_session(cache_path)
@@ -0,0 +1,209 @@
+from os.path import exists, getsize, join
+import numpy as np
+
+from pymyolinux.session.codec import CompressedColumn, offsets_dtype
+from pymyolinux.session.timeline import LabelTimeline
+from pymyolinux.session.writer import SessionWriter, read_header, recover_session
+
+
+def load_session(path):
+    """
+        Open a session directory (written by SessionWriter) for reading.
+
+            > All columns are memory-mapped, e.g. "load_session(path)[t0:t1]" only reads the pages holding samples
+                between t0 and t1 (seconds since the session's base time, as in the "Time" column of saved CSV files).
+
+    :param path: Session directory
+    :return: [Session]
+    """
+    return Session(path)
+
+
+def read_session(path):
+    """
+        Read all (complete) data of a session directory into memory, after repairing it (see "recover_session").
+
+    :param path: Session directory
+    :return: [dict] -> {"header": dict, "mapping": np.ndarray, "labels": np.ndarray (time, label),
+                        "band_1": {"time", "emg", "imu_index", "imu_time", "imu", "chunks"}, "band_2": {...}}
+    """
+    recover_session(path)
+    session     = Session(path)
+    contents    = {"header": session.header, "mapping": np.array(session.mapping), "labels": session.labels}
+
+    for band_name in SessionWriter.band_names:
+        band                = {column: np.array(values) for column, values in session.bands[band_name].items()}
+        band["chunks"]      = session.all_chunks[band_name]
+        contents[band_name] = band
+    return contents
+
+
+class Session():
+    """
+        A read-only, memory-mapped view of a session directory.
+
+            > Compressed columns (see "pymyolinux.session.codec") are decompressed chunk-wise, on access.
+    """
+
+    invalid_map = -1    # Mapping entry of a band_1 sample without a synchronized band_2 sample
+
+    def __init__(self, path):
+        """
+        :param path: Session directory
+        """
+        self.path       = path
+        self.header     = read_header(path)
+        self.base_time  = self.header.get("base_time") or 0.0
+        self.imu_scales = np.array(self.header.get("imu_scales", SessionWriter.header_defaults["imu_scales"]),
+                                   dtype=np.float64)
+
+        #
+        # Only rows marked as complete by the chunk index are visible (the session may still be written to)
+        #
+        self.all_chunks = {}
+        self.chunks     = {}    # Excluding chunks without EMG samples
+        self.bands      = {}
+        for band_name in SessionWriter.band_names:
+            chunks                      = self.read_file(join(path, band_name, "chunks.bin"),
+                                                         SessionWriter.band_dtypes["chunks"])
+            self.all_chunks[band_name]  = chunks
+            self.chunks[band_name]      = chunks[chunks["end"] > chunks["start"]]
+            self.bands[band_name]       = {column: self.open_column(band_name, column, chunks)
+                                           for column in ("time", "emg", "imu_index", "imu_time", "imu")}
+
+        self.mapping = self.read_file(join(path, "mapping.bin"), SessionWriter.mapping_dtype)
+        self.labels  = self.read_file(join(path, "labels.bin"), SessionWriter.labels_dtype)
+
+        self.label_timeline = LabelTimeline()
+        for transition in self.labels:
+            self.label_timeline.record(float(transition["time"]), int(transition["label"]))
+
+    def __getitem__(self, key):
+        """
+        :param key: A time range, session[t0:t1] (seconds since the base time, either bound may be omitted)
+        :return: [dict] -> {"band_1": dict, "band_2": dict}, see "band_range"
+        """
+        if (not isinstance(key, slice)) or (key.step is not None):
+            raise TypeError("Sessions are indexed by a time range, e.g. session[t0:t1].")
+
+        return {band_name: self.band_range(band_name, key.start, key.stop) for band_name in SessionWriter.band_names}
+
+    def num_samples(self, band_name):
+        """
+        :param band_name: "band_1"/"band_2"
+        :return: [int] Number of EMG samples
+        """
+        return self.bands[band_name]["time"].shape[0]
+
+    def rows_between(self, band_name, start_time=None, end_time=None):
+        """
+            Find the EMG samples within a time range, via the chunk index (then a binary search within chunks).
+
+        :param band_name: "band_1"/"band_2"
+        :param start_time: Samples must have a time greater than or equal to this value (None: no bound)
+        :param end_time: Samples must have a time less than this value (None: no bound)
+        :return: (start, end) -> Rows of samples within the time range
+        """
+        timestamps  = self.bands[band_name]["time"]
+        chunks      = self.chunks[band_name]
+
+        def find_row(time_point):
+            chunk_idx = np.searchsorted(chunks["t_last"], time_point, side="left")
+            if chunk_idx == chunks.shape[0]:
+                return timestamps.shape[0]
+            chunk_start, chunk_end = int(chunks["start"][chunk_idx]), int(chunks["end"][chunk_idx])
+            return chunk_start + int(np.searchsorted(timestamps[chunk_start:chunk_end], time_point, side="left"))
+
+        start   = 0 if start_time is None else find_row(self.base_time + start_time)
+        end     = timestamps.shape[0] if end_time is None else find_row(self.base_time + end_time)
+        return start, max(start, end)
+
+    def band_range(self, band_name, start_time=None, end_time=None):
+        """
+        :param band_name: "band_1"/"band_2"
+        :param start_time: See "rows_between"
+        :param end_time: See "rows_between"
+        :return: [dict] Samples within the time range ->
+                    "start"/"end": Rows selected,
+                    "time": Time of each sample, since the base time,
+                    "label": Ground truth label of each sample,
+                    "emg": EMG samples (N, 8),
+                    "imu": Raw IMU samples (M, 10), "imu_time": IMU sample timestamps,
+                    "imu_index": Row of "imu" joined to each EMG sample, "imu_start": First IMU row selected,
+                    "mapping": (band_1 only) Synchronized band_2 row of each sample, or invalid_map
+        """
+        band        = self.bands[band_name]
+        start, end  = self.rows_between(band_name, start_time, end_time)
+
+        if end > start:
+            imu_start   = int(band["imu_index"][start])
+            imu_end     = int(band["imu_index"][end - 1]) + 1
+        else:
+            imu_start, imu_end = 0, 0
+
+        selected = {
+                    "start":        start,
+                    "end":          end,
+                    "time":         band["time"][start:end] - self.base_time,
+                    "label":        self.label_timeline.labels_at(band["time"][start:end]),
+                    "emg":          band["emg"][start:end],
+                    "imu_index":    band["imu_index"][start:end] - imu_start,
+                    "imu_start":    imu_start,
+                    "imu_time":     band["imu_time"][imu_start:imu_end],
+                    "imu":          band["imu"][imu_start:imu_end]
+                }
+
+        if band_name == SessionWriter.band_names[0]:
+            mapping             = np.full(end - start, self.invalid_map, dtype=np.int64)
+            num_mapped          = max(min(end, self.mapping.shape[0]) - start, 0)
+            mapping[:num_mapped] = self.mapping[start:start + num_mapped]
+            selected["mapping"] = mapping
+
+        return selected
+
+    def joined_imu(self, selected):
+        """
+        :param selected: A dictionary returned by "band_range"
+        :return: [np.ndarray] IMU data joined to each EMG sample (N, 10), with correct rescaling
+        """
+        return selected["imu"][selected["imu_index"]] / self.imu_scales
+
+    ####################################################################################################################
+    # Helper functions
+    ####################################################################################################################
+
+    def open_column(self, band_name, column, chunks):
+        """
+        :param band_name: "band_1"/"band_2"
+        :param column: A column of SessionWriter.band_dtypes
+        :param chunks: All entries of the band's chunk index
+        :return: A read-only column (np.memmap, or CompressedColumn)
+        """
+        dtype   = SessionWriter.band_dtypes[column]
+        codec   = self.header.get("codec")
+        if column in ("imu_time", "imu"):
+            row_starts, row_ends = chunks["imu_start"], chunks["imu_end"]
+        else:
+            row_starts, row_ends = chunks["start"], chunks["end"]
+        num_rows = int(row_ends[-1]) if chunks.shape[0] > 0 else 0
+
+        if (codec is None) or (column not in SessionWriter.compressed_columns):
+            return self.map_file(join(self.path, band_name, column + ".bin"), dtype, num_rows)
+
+        # Chunk locations may be written ahead of the chunk index
+        locations = self.read_file(join(self.path, band_name, column + ".zidx"), offsets_dtype)[:chunks.shape[0]]
+        return CompressedColumn(join(self.path, band_name, column + ".z"), locations, row_starts, row_ends,
+                                dtype.base, dtype.shape, codec)
+
+    @staticmethod
+    def read_file(file_path, dtype):
+        if not exists(file_path):
+            return np.zeros(0, dtype=dtype)
+        return np.fromfile(file_path, dtype=dtype, count=getsize(file_path) // dtype.itemsize)
+
+    @staticmethod
+    def map_file(file_path, dtype, num_rows):
+        shape = (num_rows,) + dtype.shape
+        if num_rows == 0:
+            return np.zeros(shape, dtype=dtype.base)
+        return np.memmap(file_path, dtype=dtype.base, mode="r", shape=shape)
@@ -0,0 +1,120 @@
+import numpy as np
+
+from pymyolinux.session.csv_io import IMU_SCALES, synchronized_rows
+from pymyolinux.session.format import load_session
+from pymyolinux.session.timeline import LabelTimeline
+
+
+def repetition_timeline(label_timeline):
+    """
+        Number the repetitions of each movement, from ground truth label transitions.
+
+            > A transition to a movement label (> 0) begins a new repetition of that movement (numbered from 1, per
+                movement), unless the movement continues after unlabelled samples (-1, e.g. the ground truth helper
+                was paused). Rest (0) and unlabelled samples have a repetition of 0.
+
+    :param label_timeline: A LabelTimeline
+    :return: [LabelTimeline] Repetition number transitions
+    """
+    repetitions                 = LabelTimeline()
+    repetitions.default_label   = 0
+    rep_counts                  = {}
+    last_movement               = None  # Movement label of the current repetition (None: after a rest)
+
+    for timestamp, label in label_timeline.transitions():
+        if label > 0:
+            if label != last_movement:
+                rep_counts[label]   = rep_counts.get(label, 0) + 1
+                last_movement       = label
+            repetitions.record(timestamp, rep_counts[label])
+        else:
+            if label == 0:
+                last_movement = None
+            repetitions.record(timestamp, 0)
+    return repetitions
+
+
+def ninapro_arrays(bands, rows, label_timeline, base_time, imu_scales=IMU_SCALES, frequency=200):
+    """
+        Create NinaPro-style arrays (one row per synchronized sample, devices side by side, as in NinaPro DB5).
+
+            > Unlabelled samples (label of -1) are labelled as rest (0), as NinaPro has no such label. "stimulus" and
+                "restimulus" (and "repetition"/"rerepetition") are identical, refine them offline if needed.
+
+    :param bands: A list of data of one or two devices, each a dictionary -> "time" (N,), "emg" (N, 8),
+                    "imu_index" (N,), "imu" (M, 10) raw (see "pymyolinux.session.SessionWriter")
+    :param rows: A list of (synchronized) sample indices of each device (see "csv_io.synchronized_rows")
+    :param label_timeline: A LabelTimeline, labels follow the first device's samples
+    :param base_time: Saved times are relative to this time
+    :param imu_scales: OR/ACC/GYRO = raw IMU / scale
+    :param frequency: Sampling frequency (Hz)
+    :return: [dict] -> "emg" (N, 8 per device), "acc" (N, 3 per device), "gyro" (N, 3 per device),
+                "ori" (N, 4 per device), "time" (N, 1 per device), "stimulus"/"restimulus" (N, 1),
+                "repetition"/"rerepetition" (N, 1), "frequency"
+    """
+    emg, acc, gyro, ori, times = [], [], [], [], []
+    for band, band_rows in zip(bands, rows):
+        band_times  = np.asarray(band["time"][band_rows], dtype=np.float64)
+        imu         = np.asarray(band["imu"][np.asarray(band["imu_index"][band_rows])], dtype=np.float64) / imu_scales
+
+        emg.append(np.asarray(band["emg"][band_rows], dtype=np.float64))
+        ori.append(imu[:, 0:4])
+        acc.append(imu[:, 4:7])
+        gyro.append(imu[:, 7:10])
+        times.append((band_times - base_time).reshape(-1, 1))
+
+    first_times = times[0][:, 0] + base_time
+    stimulus    = np.maximum(label_timeline.labels_at(first_times), 0).reshape(-1, 1)
+    repetition  = repetition_timeline(label_timeline).labels_at(first_times).reshape(-1, 1)
+
+    return {
+            "emg":          np.hstack(emg),
+            "acc":          np.hstack(acc),
+            "gyro":         np.hstack(gyro),
+            "ori":          np.hstack(ori),
+            "time":         np.hstack(times),
+            "stimulus":     stimulus,
+            "restimulus":   stimulus.copy(),
+            "repetition":   repetition,
+            "rerepetition": repetition.copy(),
+            "frequency":    frequency
+        }
+
+
+def save_ninapro(file_path, arrays):
+    """
+    :param file_path: A .npz (NumPy) or .mat (MATLAB, requires scipy) file to create
+    :param arrays: A dictionary returned by "ninapro_arrays"
+    """
+    if file_path.endswith(".mat"):
+        try:
+            from scipy.io import savemat
+        except ImportError:
+            raise ImportError("scipy is required to save MATLAB (.mat) files.")
+        savemat(file_path, arrays, do_compression=True)
+    else:
+        np.savez_compressed(file_path, **arrays)
+
+
+def session_to_ninapro(path, file_paths, buffer_period=2):
+    """
+        Convert a session to NinaPro-style files (without a CSV round trip).
+
+    :param path: Session directory
+    :param file_paths: A list of .npz/.mat files to create
+    :param buffer_period: With two devices, how many of the first few seconds are ignored (see "synchronized_rows")
+    :return: [dict] Arrays written (see "ninapro_arrays")
+    """
+    session = load_session(path)
+    bands   = [session.bands[band_name] for band_name in ("band_1", "band_2") if session.num_samples(band_name) > 0]
+
+    if len(bands) == 2:
+        rows = list(synchronized_rows(bands[0]["time"], bands[1]["time"], session.mapping, buffer_period))
+    else:
+        rows = [np.arange(len(band["time"])) for band in bands]
+
+    arrays = ninapro_arrays(bands, rows, session.label_timeline, session.base_time, session.imu_scales,
+                            session.header.get("emg_rate", 200))
+    for file_path in file_paths:
+        save_ninapro(file_path, arrays)
+    return arrays
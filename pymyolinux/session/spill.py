@@ -0,0 +1,223 @@
+import os
+import numpy as np
+
+
+class SpillFile():
+    """
+        Backing file of a SpillList, shared with its read-only views (see "SpillList.frozen"). Once released (see
+            "SpillList.close"), the file is closed and removed as soon as no view uses it.
+    """
+
+    def __init__(self, file_path):
+        """
+        :param file_path: Backing file (created, or overwritten)
+        """
+        self.file_path  = file_path
+        self.fd         = open(file_path, "w+b")
+        self.remove     = False     # Remove the file once closed
+
+    def __del__(self):
+        if hasattr(self, "fd"):
+            self.close()
+
+    def close(self):
+        if self.fd.closed:
+            return
+
+        self.fd.close()
+        if self.remove:
+            try:
+                os.remove(self.file_path)
+            except OSError:
+                pass
+
+
+class SpillList():
+    """
+        A list-like column that keeps only its most recent items in memory: older items are spilled (appended) to a
+            backing file, and read back through a memory map.
+
+            > Supports the list operations used on collected data: len(), indexing and slicing (returning lists),
+                append/extend, item assignment, and bisection (e.g. bisect.bisect_left).
+            > Spilling replaces (never modifies) the list of recent items, so reads from other threads remain
+                consistent while items are appended or spilled by a single writing thread.
+    """
+
+    def __init__(self, file_path, dtype):
+        """
+        :param file_path: Backing file (created, or overwritten)
+        :param dtype: Data type of items, once spilled
+        """
+        self.file_path  = file_path
+        self.dtype      = np.dtype(dtype)
+        self.backing    = SpillFile(file_path)
+        self.mapped     = None  # Memory map of (at least) all spilled items, recreated as more items are spilled
+
+        # (number of spilled items, recent items), always replaced as a whole
+        self.state = (0, [])
+
+    def __len__(self):
+        num_spilled, recent = self.state
+        return num_spilled + len(recent)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __getitem__(self, key):
+        num_spilled, recent = self.state
+
+        if isinstance(key, slice):
+            start, stop, step = key.indices(num_spilled + len(recent))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            if stop <= start:
+                return []
+            if start >= num_spilled:
+                return recent[start - num_spilled:stop - num_spilled]
+            return (self.spilled(num_spilled)[start:min(stop, num_spilled)].tolist() +
+                    recent[:max(stop - num_spilled, 0)])
+
+        if key < 0:
+            key += num_spilled + len(recent)
+            if key < 0:
+                raise IndexError("SpillList index out of range")
+        if key >= num_spilled:
+            return recent[key - num_spilled]
+        return self.spilled(num_spilled)[key].item()
+
+    def __setitem__(self, key, value):
+        num_spilled, recent = self.state
+        if key < 0:
+            key += num_spilled + len(recent)
+
+        if key >= num_spilled:
+            recent[key - num_spilled] = value
+        elif key >= 0:
+            self.backing.fd.seek(key * self.dtype.itemsize)
+            self.backing.fd.write(np.array([value], dtype=self.dtype).tobytes())
+            self.backing.fd.flush()
+        else:
+            raise IndexError("SpillList assignment index out of range")
+
+    def append(self, value):
+        self.state[1].append(value)
+
+    def extend(self, values):
+        self.state[1].extend(values)
+
+    def to_array(self, stop=None):
+        """
+        :param stop: Number of (leading) items to return, None: all
+        :return: [np.ndarray] Items (of self.dtype)
+        """
+        num_spilled, recent = self.state
+        stop                = num_spilled + len(recent) if stop is None else stop
+        spilled             = self.spilled(num_spilled)[:min(stop, num_spilled)]
+        return np.concatenate((spilled, np.array(recent[:max(stop - num_spilled, 0)], dtype=self.dtype)))
+
+    def spill(self, keep):
+        """
+            Write all but the most recent items to the backing file (called by the writing thread).
+
+        :param keep: Number of (most recent) items to keep in memory
+        """
+        num_spilled, recent = self.state
+        num_items           = len(recent) - keep
+        if num_items <= 0:
+            return
+
+        self.backing.fd.seek(num_spilled * self.dtype.itemsize)
+        self.backing.fd.write(np.array(recent[:num_items], dtype=self.dtype).tobytes())
+        self.backing.fd.flush()
+        self.state = (num_spilled + num_items, recent[num_items:])
+
+    def truncate(self, length):
+        """
+            Remove all items from index "length" onwards (spilled items are overwritten by later spills).
+
+        :param length: Number of items to keep
+        :return: [SpillList] self
+        """
+        num_spilled, recent = self.state
+        if length >= num_spilled:
+            self.state = (num_spilled, recent[:length - num_spilled])
+        else:
+            self.state = (max(length, 0), [])
+        return self
+
+    def frozen(self):
+        """
+        :return: [SpillList] A read-only view of the current items (unaffected by later truncation)
+        """
+        view = SpillList.__new__(SpillList)
+        view.__dict__.update(self.__dict__)
+        return view
+
+    def close(self, remove=True):
+        """
+            Release the backing file, once this list is no longer used (views keep it open until they are dropped).
+
+        :param remove: Remove the backing file, once closed
+        """
+        backing, self.backing   = self.backing, None
+        self.mapped             = None
+        self.state              = (0, [])
+        if backing is not None:
+            backing.remove = remove
+
+    def spilled(self, num_spilled):
+        """
+        :param num_spilled: Number of spilled items required
+        :return: [np.memmap] Spilled items (at least "num_spilled" items)
+        """
+        if num_spilled == 0:
+            return np.zeros(0, dtype=self.dtype)
+
+        mapped = self.mapped
+        if (mapped is None) or (mapped.shape[0] < num_spilled):
+            mapped      = np.memmap(self.file_path, dtype=self.dtype, mode="r", shape=(num_spilled,))
+            self.mapped = mapped
+        return mapped
+
+
+def truncate(column, length):
+    """
+    :param column: A list, or SpillList
+    :param length: Number of items to keep
+    :return: The column without items from index "length" onwards
+    """
+    if isinstance(column, SpillList):
+        return column.truncate(length)
+    return column[:length]
+
+
+def frozen(column):
+    """
+    :param column: A list, or SpillList
+    :return: The column, or a view of a SpillList's current items (lists are only appended to, or replaced)
+    """
+    if isinstance(column, SpillList):
+        return column.frozen()
+    return column
+
+
+def close(column):
+    """
+    :param column: A list, or SpillList, no longer used (the backing file of a SpillList is removed)
+    """
+    if isinstance(column, SpillList):
+        column.close()
+
+
+def as_array(column, stop=None, dtype=None):
+    """
+    :param column: A list, or SpillList
+    :param stop: Number of (leading) items to return, None: all
+    :param dtype: Data type of the array
+    :return: [np.ndarray] Items of the column
+    """
+    if isinstance(column, SpillList):
+        values = column.to_array(stop)
+        return values if dtype is None else values.astype(dtype, copy=False)
+    return np.array(column if stop is None else column[:stop], dtype=dtype)
@@ -0,0 +1,113 @@
+import threading
+from bisect import bisect_right
+import numpy as np
+
+
+class LabelTimeline():
+    """
+        Stores ground truth labels as a series of (timestamp, label) transitions.
+
+            > Labels only change a few times per minute, so a label is recorded once per transition, rather than once
+                per sample. The label of any sample is the label of the last transition at or before its timestamp.
+            > Transitions may be recorded from several threads (see "record"), readers never block.
+    """
+
+    default_label = -1  # Label of samples received before the first transition
+
+    def __init__(self):
+        self.timestamps = []
+        self.labels     = []
+        self.lock       = threading.RLock()     # Held by writers (see "record")
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
+
+    def clear(self):
+        with self.lock:
+            self.timestamps = []
+            self.labels     = []
+
+    def copy(self):
+        """
+        :return: [LabelTimeline] A copy of all transitions recorded so far
+        """
+        num_labels          = len(self.labels)
+        timeline            = LabelTimeline()
+        timeline.timestamps = self.timestamps[:num_labels]
+        timeline.labels     = self.labels[:num_labels]
+        return timeline
+
+    def record(self, timestamp, label):
+        """
+            Record a label transition (ignored if the label has not changed).
+
+            > Thread-safe. A timestamp earlier than the last transition (e.g. taken by a thread that was preempted
+                before recording) is moved up to it, so that timestamps stay increasing. To read the current label
+                and record it atomically, hold "lock" around both.
+
+        :param timestamp: Time of the transition, in the same time base as the sample timestamps
+        :param label: New ground truth label (None is treated as the default label)
+        """
+        if label is None:
+            label = self.default_label
+
+        with self.lock:
+            num_labels = len(self.labels)
+            if (num_labels > 0) and (self.labels[num_labels - 1] == label):
+                return
+            if (num_labels == 0) and (label == self.default_label):
+                return
+            if num_labels > 0:
+                timestamp = max(timestamp, self.timestamps[num_labels - 1])
+
+            # Timestamps are appended first, readers only trust the first len(self.labels) entries
+            self.timestamps.append(timestamp)
+            self.labels.append(label)
+
+    def label_at(self, timestamp):
+        """
+        :param timestamp: Time at which to look up the ground truth label
+        :return: [int] Ground truth label at the given time
+        """
+        num_labels  = len(self.labels)
+        idx         = bisect_right(self.timestamps, timestamp, 0, num_labels) - 1
+
+        if idx < 0:
+            return self.default_label
+        return self.labels[idx]
+
+    def labels_at(self, timestamps):
+        """
+            Vectorized label lookup, for a range of samples.
+
+        :param timestamps: A sequence of (increasing) sample timestamps
+        :return: [np.ndarray] Ground truth label of each sample (int64)
+        """
+        num_labels  = len(self.labels)
+        timestamps  = np.asarray(timestamps, dtype=np.float64)
+
+        if num_labels == 0:
+            return np.full(timestamps.shape[0], self.default_label, dtype=np.int64)
+
+        transition_times    = np.array(self.timestamps[:num_labels], dtype=np.float64)
+        labels              = np.array([self.default_label] + self.labels[:num_labels], dtype=np.int64)
+
+        # Index 0 corresponds to the default label (no transition yet)
+        indices = np.searchsorted(transition_times, timestamps, side="right")
+        return labels[indices]
+
+    def transitions(self):
+        """
+        :return: A list of (timestamp, label) tuples, one per recorded transition
+        """
+        num_labels = len(self.labels)
+        return list(zip(self.timestamps[:num_labels], self.labels[:num_labels]))
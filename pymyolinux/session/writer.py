@@ -0,0 +1,318 @@
+import json
+import os
+import time
+from os.path import exists, getsize, isdir, join
+import numpy as np
+
+from pymyolinux.session.codec import encode, offsets_dtype
+
+
+class SessionWriter():
+    """
+        Appends data collected from (up to) two Myo armband devices to an on-disk session directory.
+
+            > Every column is stored in its own append-only file of fixed-width (little-endian) rows, so a session can
+                be read back with np.memmap/np.fromfile, and data written before a crash is never lost.
+
+            > Each append to a band ends with a record in that band's chunk index (row range, IMU row range, time
+                range). Rows not covered by the chunk index are incomplete, and discarded by "recover_session".
+
+        Layout:
+            header.json                         -> Session metadata (see "header_defaults")
+            labels.bin                          -> Ground truth label transitions (time, label)
+            mapping.bin                         -> Synchronization mapping, band_1 sample index -> band_2 sample index
+            band_1/, band_2/
+                time.bin, emg.bin, imu_index.bin    -> One row per EMG sample
+                imu_time.bin, imu.bin               -> One row per IMU sample (raw values)
+                chunks.bin                          -> Chunk index
+
+            > Optionally, integer columns (see "compressed_columns") are delta-encoded and compressed per chunk
+                (see "pymyolinux.session.codec"), and stored as <column>.z, with chunk locations in <column>.zidx.
+    """
+
+    header_name     = "header.json"
+    band_names      = ("band_1", "band_2")
+    emg_channels    = 8
+    imu_channels    = 10    # OR_W, OR_X, OR_Y, OR_Z, ACC_1, ACC_2, ACC_3, GYRO_1, GYRO_2, GYRO_3
+
+    #
+    # Fixed-width row formats of all files
+    #
+    band_dtypes = {
+                    "time":         np.dtype("<f8"),
+                    "emg":          np.dtype(("<i1", (emg_channels,))),
+                    "imu_index":    np.dtype("<i8"),
+                    "imu_time":     np.dtype("<f8"),
+                    "imu":          np.dtype(("<i2", (imu_channels,))),
+                    "chunks":       np.dtype([("start", "<i8"), ("end", "<i8"), ("imu_start", "<i8"),
+                                              ("imu_end", "<i8"), ("t_first", "<f8"), ("t_last", "<f8")])
+                }
+    labels_dtype        = np.dtype([("time", "<f8"), ("label", "<i8")])
+    mapping_dtype       = np.dtype("<i8")
+    compressed_columns  = ("emg", "imu_index", "imu")
+
+    # Session states, stored in the header
+    STATE_ACTIVE    = "active"      # Data is being collected (or the program exited/crashed before a save)
+    STATE_FINALIZED = "finalized"   # All data was flushed on a save
+    STATE_RECOVERED = "recovered"   # Data was recovered into a new session
+
+    header_defaults = {
+                        "format":       "pymyolinux-session",
+                        "version":      1,
+                        "state":        STATE_ACTIVE,
+                        "emg_rate":     200,
+                        "base_time":    None,   # Timestamps in saved (CSV) files are relative to this time
+                        "codec":        None,   # Compression method of compressed_columns (None: uncompressed)
+                        "codec_level":  None,
+                        "imu_scales":   [16384.0] * 4 + [2048.0] * 3 + [16.0] * 3,  # OR/ACC/GYRO = raw IMU / scale
+                    }
+
+    def __init__(self, path, base_time=None, metadata=None, sync=True, codec=None, codec_level=None):
+        """
+        :param path: Session directory (created if it does not exist, appended to otherwise)
+        :param base_time: Reference time of the session, stored in the header
+        :param metadata: A dictionary of additional header fields
+        :param sync: Force data to disk (os.fsync) on every flush
+        :param codec: Compression method ("zlib"/"lzma") of new sessions, None: uncompressed
+        :param codec_level: Compression level (None: default level of the method)
+        """
+        self.path   = path
+        self.sync   = sync
+
+        for band_name in self.band_names:
+            os.makedirs(join(path, band_name), exist_ok=True)
+
+        if exists(join(path, self.header_name)):
+            self.header = read_header(path)
+        else:
+            self.header                 = dict(self.header_defaults)
+            self.header["created"]      = time.time()
+            self.header["base_time"]    = base_time
+            self.header["codec"]        = codec
+            self.header["codec_level"]  = codec_level
+            self.header["bands"]        = list(self.band_names)
+            self.header["columns"]      = {name: dtype.descr for name, dtype in self.band_dtypes.items()}
+        if metadata is not None:
+            self.header.update(metadata)
+        self.write_header()
+
+        # Append-only file descriptors, opened on first use
+        self.files = {}
+
+    def close(self):
+        for fd in self.files.values():
+            fd.close()
+        self.files = {}
+
+    def write_header(self):
+        """
+            Atomically (re)write the session header.
+        """
+        temp_path = join(self.path, self.header_name + ".tmp")
+        with open(temp_path, "w") as fd:
+            json.dump(self.header, fd, indent=4)
+            fd.flush()
+            os.fsync(fd.fileno())
+        os.replace(temp_path, join(self.path, self.header_name))
+
+    def set_state(self, state):
+        """
+        :param state: One of STATE_ACTIVE, STATE_FINALIZED, STATE_RECOVERED
+        """
+        if self.header["state"] != state:
+            self.header["state"] = state
+            self.write_header()
+
+    def append_band(self, band_num, timestamps, emg, imu_index, imu_timestamps, imu):
+        """
+            Append a chunk of samples from a single Myo armband device.
+
+        :param band_num: 1/2
+        :param timestamps: EMG sample timestamps, shape (N,)
+        :param emg: EMG samples, shape (N, 8)
+        :param imu_index: Index of the (latest) IMU sample of each EMG sample, shape (N,)
+        :param imu_timestamps: IMU sample timestamps, shape (M,)
+        :param imu: Raw IMU samples (OR_W/X/Y/Z, ACC_1/2/3, GYRO_1/2/3), shape (M, 10)
+        """
+        timestamps      = np.asarray(timestamps, dtype=np.float64)
+        imu_timestamps  = np.asarray(imu_timestamps, dtype=np.float64)
+        num_rows        = timestamps.shape[0]
+        num_imu_rows    = imu_timestamps.shape[0]
+        if (num_rows == 0) and (num_imu_rows == 0):
+            return
+
+        band_name   = self.band_names[band_num - 1]
+        start       = self.num_rows(band_name, "time")
+        imu_start   = self.num_rows(band_name, "imu_time")
+
+        self.append_column(band_name, "time", timestamps)
+        self.append_column(band_name, "emg", np.asarray(emg).reshape(num_rows, self.emg_channels))
+        self.append_column(band_name, "imu_index", imu_index)
+        self.append_column(band_name, "imu_time", imu_timestamps)
+        self.append_column(band_name, "imu", np.asarray(imu).reshape(num_imu_rows, self.imu_channels))
+        self.flush_files()
+
+        # The chunk index is written last, it marks the rows above as complete
+        chunk = np.zeros(1, dtype=self.band_dtypes["chunks"])
+        chunk["start"]      = start
+        chunk["end"]        = start + num_rows
+        chunk["imu_start"]  = imu_start
+        chunk["imu_end"]    = imu_start + num_imu_rows
+        chunk["t_first"]    = timestamps[0] if num_rows > 0 else np.nan
+        chunk["t_last"]     = timestamps[num_rows - 1] if num_rows > 0 else np.nan
+        self.append(join(band_name, "chunks"), chunk, self.band_dtypes["chunks"])
+        self.flush_files()
+
+    def append_mapping(self, mapping):
+        """
+        :param mapping: Synchronization mapping entries (final values only), appended to those written previously
+        """
+        if len(mapping) > 0:
+            self.append("mapping", mapping, self.mapping_dtype)
+            self.flush_files()
+
+    def append_labels(self, timestamps, labels):
+        """
+        :param timestamps: Times of ground truth label transitions
+        :param labels: Ground truth labels (from each transition onwards)
+        """
+        if len(labels) > 0:
+            transitions             = np.zeros(len(labels), dtype=self.labels_dtype)
+            transitions["time"]     = timestamps
+            transitions["label"]    = labels
+            self.append("labels", transitions, self.labels_dtype)
+            self.flush_files()
+
+    ####################################################################################################################
+    # Helper functions
+    ####################################################################################################################
+
+    def num_rows(self, band_name, column):
+        file_path = join(self.path, band_name, column + ".bin")
+        if not exists(file_path):
+            return 0
+        return getsize(file_path) // self.band_dtypes[column].itemsize
+
+    def append_column(self, band_name, column, values):
+        name    = join(band_name, column)
+        dtype   = self.band_dtypes[column].base
+        codec   = self.header.get("codec")
+
+        if (codec is None) or (column not in self.compressed_columns):
+            self.append(name, values, dtype)
+            return
+
+        data                = encode(np.asarray(values, dtype=dtype), codec, self.header.get("codec_level"))
+        location            = np.zeros(1, dtype=offsets_dtype)
+        location["offset"]  = self.num_bytes(name + ".z")
+        location["nbytes"]  = len(data)
+        self.write_bytes(name + ".z", data)
+        self.write_bytes(name + ".zidx", location.tobytes())
+
+    def num_bytes(self, file_name):
+        file_path = join(self.path, file_name)
+        return getsize(file_path) if exists(file_path) else 0
+
+    def append(self, name, values, dtype):
+        self.write_bytes(name + ".bin", np.ascontiguousarray(values, dtype=dtype).tobytes())
+
+    def write_bytes(self, file_name, data):
+        if file_name not in self.files:
+            self.files[file_name] = open(join(self.path, file_name), "ab")
+        self.files[file_name].write(data)
+
+    def flush_files(self):
+        for fd in self.files.values():
+            fd.flush()
+            if self.sync:
+                os.fsync(fd.fileno())
+
+
+def read_header(path):
+    """
+    :param path: Session directory
+    :return: [dict] Session header
+    """
+    with open(join(path, SessionWriter.header_name), "r") as fd:
+        return json.load(fd)
+
+
+def find_sessions(spool_dir, states=None):
+    """
+    :param spool_dir: A directory containing session directories
+    :param states: If not None, a list of session states to select
+    :return: A list of session directories, in order of creation (oldest first)
+    """
+    if not isdir(spool_dir):
+        return []
+
+    sessions = []
+    for name in os.listdir(spool_dir):
+        path = join(spool_dir, name)
+        if not exists(join(path, SessionWriter.header_name)):
+            continue
+        try:
+            header = read_header(path)
+        except ValueError:
+            continue
+        if (states is None) or (header.get("state") in states):
+            sessions.append((header.get("created", 0), path))
+
+    return [path for created, path in sorted(sessions)]
+
+
+def recover_session(path):
+    """
+        Repair a session directory that may not have been closed properly (e.g. after a crash), by truncating every
+            file to the rows marked as complete.
+
+    :param path: Session directory
+    :return: [dict] -> Number of complete rows, {"band_1": (num_emg_rows, num_imu_rows), "band_2": ..., "mapping": int,
+                        "labels": int}
+    """
+
+    def truncate(file_path, num_bytes):
+        if exists(file_path) and (getsize(file_path) > num_bytes):
+            with open(file_path, "r+b") as fd:
+                fd.truncate(num_bytes)
+
+    def whole_rows(file_path, dtype):
+        if not exists(file_path):
+            return 0
+        num_rows = getsize(file_path) // dtype.itemsize
+        truncate(file_path, num_rows * dtype.itemsize)
+        return num_rows
+
+    row_counts  = {}
+    dtypes      = SessionWriter.band_dtypes
+    compressed  = read_header(path).get("codec") is not None
+
+    for band_name in SessionWriter.band_names:
+        band_path   = join(path, band_name)
+        num_chunks  = whole_rows(join(band_path, "chunks.bin"), dtypes["chunks"])
+
+        num_rows, num_imu_rows = 0, 0
+        if num_chunks > 0:
+            last_chunk      = np.fromfile(join(band_path, "chunks.bin"), dtype=dtypes["chunks"])[num_chunks - 1]
+            num_rows        = int(last_chunk["end"])
+            num_imu_rows    = int(last_chunk["imu_end"])
+
+        for column in ("time", "emg", "imu_index", "imu_time", "imu"):
+            if compressed and (column in SessionWriter.compressed_columns):
+                # Compressed chunks, as located by the (first num_chunks) chunk locations
+                locations_path = join(band_path, column + ".zidx")
+                truncate(locations_path, num_chunks * offsets_dtype.itemsize)
+                locations = np.fromfile(locations_path, dtype=offsets_dtype) if exists(locations_path) else []
+                if len(locations) > 0:
+                    last_location = locations[len(locations) - 1]
+                    truncate(join(band_path, column + ".z"), int(last_location["offset"] + last_location["nbytes"]))
+            else:
+                num_column_rows = num_imu_rows if column in ("imu_time", "imu") else num_rows
+                truncate(join(band_path, column + ".bin"), num_column_rows * dtypes[column].itemsize)
+
+        row_counts[band_name] = (num_rows, num_imu_rows)
+
+    row_counts["mapping"]   = whole_rows(join(path, "mapping.bin"), SessionWriter.mapping_dtype)
+    row_counts["labels"]    = whole_rows(join(path, "labels.bin"), SessionWriter.labels_dtype)
+    return row_counts
+
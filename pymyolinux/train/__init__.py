@@ -0,0 +1,4 @@
+from pymyolinux.train.cache import FeatureCache
+from pymyolinux.train.pool import RepetitionPool, SharedWindow, process_repetition
+from pymyolinux.train.extract import extract_sessions, labelled_repetitions, load_features, open_session
+from pymyolinux.train.background import TrainingProcess
@@ -0,0 +1,39 @@
+import argparse
+
+from pymyolinux.train.cache import FeatureCache
+from pymyolinux.train.extract import default_refine, extract_sessions, load_feature_extractor, whole_repetition
+
+#
+# Usage: python -m pymyolinux.train extract --model <model file> --output <directory> <session> [<session> ...]
+#
+parser      = argparse.ArgumentParser(prog="python -m pymyolinux.train")
+commands    = parser.add_subparsers(dest="command")
+
+extract = commands.add_parser("extract", help="Extract features of each labelled repetition of sessions.")
+extract.add_argument("sessions", nargs="+", help="Session directories, or directories of CSV files")
+extract.add_argument("--model", required=True, help="A pickled prediction model (or feature extractor)")
+extract.add_argument("--output", required=True, help="Directory of feature files (one .npz per session)")
+extract.add_argument("--imu", action="store_true", help="Include ACC/GYRO samples in windows")
+extract.add_argument("--no-refine", action="store_true", help="Use all samples of each repetition")
+extract.add_argument("--buffer-period", type=float, default=2, help="Seconds ignored at the start of sessions")
+extract.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: all CPUs)")
+extract.add_argument("--cache", default=None, help="Feature cache directory (default: no cache)")
+extract.add_argument("--cache-mb", type=float, default=256, help="Maximum size of the feature cache (MB)")
+
+
+def print_progress(directory, file_path, num_used, num_repetitions):
+    print("{}: {} of {} repetitions -> {}".format(directory, num_used, num_repetitions, file_path))
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    if args.command == "extract":
+        cache = None if args.cache is None else FeatureCache(args.cache, int(args.cache_mb * 1024 * 1024))
+        extract_sessions(args.sessions, load_feature_extractor(args.model),
+                         whole_repetition if args.no_refine else default_refine(), args.output, args.imu,
+                         args.buffer_period, args.workers, print_progress, cache)
+        if cache is not None:
+            print("Feature cache: {} hits, {} misses".format(cache.hits, cache.misses))
+    else:
+        parser.print_help()
@@ -0,0 +1,136 @@
+import multiprocessing
+import pickle
+import threading
+import time
+
+
+def training_server(pickled_model, features, labels, epochs, connection, progress_period):
+    """
+        The training process: updates a prediction model, reporting progress until the updated model is sent back.
+
+            > Messages are ("progress", seconds elapsed), then either ("done", pickled model) or ("error", message).
+
+    :param pickled_model: A pickled prediction model (of type ClassifierModel)
+    :param features: Training features, shape (N, number of features)
+    :param labels: Training labels, shape (N,)
+    :param epochs: Number of training epochs (see "ClassifierModel.update_training")
+    :param connection: A multiprocessing Connection, messages are sent through it
+    :param progress_period: Progress is reported every this many seconds
+    """
+    send_lock   = threading.Lock()
+    finished    = threading.Event()
+    start_time  = time.time()
+
+    def report_progress():
+        while not finished.wait(progress_period):
+            with send_lock:
+                connection.send(("progress", time.time() - start_time))
+
+    reporter = threading.Thread(target=report_progress, daemon=True)
+    reporter.start()
+
+    try:
+        pred_model = pickle.loads(pickled_model)
+        pred_model.update_training(features, labels, epochs)
+        message = ("done", pickle.dumps(pred_model))
+    except Exception as e:
+        message = ("error", "{}: {}".format(e.__class__.__name__, e))
+
+    finished.set()
+    reporter.join()
+    with send_lock:
+        connection.send(message)
+    connection.close()
+
+
+class TrainingProcess():
+    """
+        Updates (a copy of) a prediction model in a separate process, so that training does not hold the GIL of the
+            calling process (data collection, GUI).
+
+            > Callbacks are called from a background thread of the calling process. The model passed in is never
+                modified, the updated model is a new object (swap references to use it).
+    """
+
+    def __init__(self, pred_model, features, labels, epochs, on_progress=None, on_complete=None, on_error=None,
+                 progress_period=0.5):
+        """
+        :param pred_model: The prediction model to update (of type ClassifierModel)
+        :param features: Training features, shape (N, number of features)
+        :param labels: Training labels, shape (N,)
+        :param epochs: Number of training epochs
+        :param on_progress: If not None, a function called with the number of seconds elapsed (periodically)
+        :param on_complete: If not None, a function called with the updated model
+        :param on_error: If not None, a function called with an error message (training failed, or was cancelled)
+        :param progress_period: Progress is reported every this many seconds
+        """
+        self.on_progress    = on_progress
+        self.on_complete    = on_complete
+        self.on_error       = on_error
+        self.updated_model  = None
+        self.error          = None
+        self.cancelled      = False
+
+        # Avoid forking the calling process (threads, Qt), the training process starts from scratch
+        context                     = multiprocessing.get_context("spawn")
+        self.connection, child_conn = context.Pipe(duplex=False)
+        self.process                = context.Process(target=training_server, daemon=True,
+                                                      args=(pickle.dumps(pred_model), features, labels, epochs,
+                                                            child_conn, progress_period))
+        self.process.start()
+        child_conn.close()
+
+        self.reader = threading.Thread(target=self.read_messages, daemon=True)
+        self.reader.start()
+
+    def read_messages(self):
+        """
+            Forward messages of the training process to callbacks (in a background thread).
+        """
+        while True:
+            try:
+                kind, value = self.connection.recv()
+            except (EOFError, OSError):
+                kind, value = "error", "Training was cancelled." if self.cancelled else "The training process exited."
+
+            if kind == "progress":
+                if self.on_progress is not None:
+                    self.on_progress(value)
+                continue
+
+            if kind == "done":
+                try:
+                    self.updated_model = pickle.loads(value)
+                except Exception as e:
+                    kind, value = "error", "{}: {}".format(e.__class__.__name__, e)
+
+            if kind == "done":
+                if self.on_complete is not None:
+                    self.on_complete(self.updated_model)
+            else:
+                self.error = value
+                if self.on_error is not None:
+                    self.on_error(value)
+            break
+
+        self.connection.close()
+        self.process.join()
+
+    def running(self):
+        return self.reader.is_alive()
+
+    def wait(self, timeout=None):
+        """
+        :param timeout: Maximum time to wait (seconds), None: until training finishes
+        :return: [ClassifierModel] The updated model, None if training failed (or is not finished)
+        """
+        self.reader.join(timeout)
+        return self.updated_model
+
+    def cancel(self):
+        """
+            Stop training (the error callback is called).
+        """
+        self.cancelled = True
+        if self.process.is_alive():
+            self.process.terminate()
@@ -0,0 +1,136 @@
+import hashlib
+import os
+import pickle
+import threading
+from os.path import exists, join
+import numpy as np
+
+
+def extractor_key(feat_extractor, refine):
+    """
+    :param feat_extractor: A feature extractor (with an "extract_feature_point" method)
+    :param refine: A refinement function (see "pool.process_repetition")
+    :return: [str] Identifies the extractor's class and parameters, and the refinement function
+    """
+    digest = hashlib.sha1()
+    for name in (type(feat_extractor).__module__, type(feat_extractor).__name__,
+                 getattr(refine, "__module__", ""), getattr(refine, "__name__", repr(refine))):
+        digest.update(name.encode("utf-8") + b"\0")
+    digest.update(pickle.dumps(feat_extractor, protocol=2))
+    return digest.hexdigest()
+
+
+def repetition_key(extractor_id, label, arrays):
+    """
+    :param extractor_id: Key of the feature extractor/refinement function (see "extractor_key")
+    :param label: Label of the repetition
+    :param arrays: Samples of the repetition (see "pool.process_repetition"), its bounds are implied by their contents
+    :return: [str] Content address of the repetition's features
+    """
+    digest = hashlib.sha1(extractor_id.encode("ascii"))
+    digest.update(str(int(label)).encode("ascii"))
+    for samples in arrays:
+        samples = np.ascontiguousarray(samples, dtype=np.float64)
+        digest.update(str(samples.shape).encode("ascii"))
+        digest.update(samples.data)
+    return digest.hexdigest()
+
+
+class FeatureCache():
+    """
+        An on-disk cache of features of repetitions, one .npy file per content address (see "repetition_key"), so
+            that only repetitions (or extractor parameters) that changed are processed again.
+
+            > Least recently used files are removed once the cache exceeds "max_bytes" (files are touched on each hit).
+            > Files are written atomically, several processes may share a cache directory.
+    """
+
+    suffix = ".npy"
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        """
+        :param directory: Cache directory (created if it does not exist)
+        :param max_bytes: Maximum total size of cached files
+        """
+        self.directory  = directory
+        self.max_bytes  = max_bytes
+        self.lock       = threading.Lock()
+        self.hits       = 0
+        self.misses     = 0
+
+        if not exists(directory):
+            os.makedirs(directory)
+        self.total_bytes = sum(num_bytes for file_path, mtime, num_bytes in self.entries())
+
+    def file_path(self, key):
+        return join(self.directory, key + self.suffix)
+
+    def get(self, key):
+        """
+        :param key: Content address (see "repetition_key")
+        :return: [np.ndarray] Cached features (empty if the movement was not found), None if not cached
+        """
+        file_path = self.file_path(key)
+        try:
+            features = np.load(file_path)
+            os.utime(file_path, None)
+        except (OSError, ValueError):
+            with self.lock:
+                self.misses += 1
+            return None
+
+        with self.lock:
+            self.hits += 1
+        return features
+
+    def put(self, key, features):
+        """
+        :param key: Content address (see "repetition_key")
+        :param features: Features of the repetition, None if the movement was not found
+        """
+        features    = np.zeros(0) if features is None else np.asarray(features)
+        file_path   = self.file_path(key)
+        if exists(file_path):
+            return      # Same key, same contents
+        temp_path   = "{}.{}.{}.tmp".format(file_path, os.getpid(), threading.get_ident())
+
+        with open(temp_path, "wb") as f:
+            np.save(f, features)
+            num_bytes = f.tell()
+        os.replace(temp_path, file_path)
+
+        with self.lock:
+            self.total_bytes += num_bytes
+            if self.total_bytes > self.max_bytes:
+                self.evict()
+
+    def entries(self):
+        """
+        :return: [list] (file path, last access time, size) of each cached file
+        """
+        entries = []
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith(self.suffix):
+                file_path = join(self.directory, file_name)
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue    # Removed (by another process)
+                entries.append((file_path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def evict(self):
+        """
+            Remove least recently used files, until the cache is within (90% of) "max_bytes".
+        """
+        entries             = sorted(self.entries(), key=lambda entry: entry[1])
+        self.total_bytes    = sum(num_bytes for file_path, mtime, num_bytes in entries)
+
+        for file_path, mtime, num_bytes in entries:
+            if self.total_bytes <= 0.9 * self.max_bytes:
+                break
+            try:
+                os.remove(file_path)
+            except OSError:
+                continue
+            self.total_bytes -= num_bytes
@@ -0,0 +1,158 @@
+import os
+import pickle
+from collections import deque
+from os.path import abspath, basename, exists, join
+import numpy as np
+
+from pymyolinux.session.csv_io import load_csv_session, synchronized_rows
+from pymyolinux.session.format import load_session
+from pymyolinux.session.writer import SessionWriter
+from pymyolinux.train.pool import RepetitionPool
+
+
+def whole_repetition(emg_list, start_idx, end_idx):
+    """
+        A refinement function keeping all samples of a repetition (see "pool.process_repetition").
+    """
+    return start_idx, end_idx + 1
+
+
+def default_refine():
+    """
+    :return: The refinement function used by online training ("ninaeval.utils.gt_tools.refine_start_end")
+    """
+    from ninaeval.utils.gt_tools import refine_start_end
+    return refine_start_end
+
+
+def load_feature_extractor(file_path):
+    """
+    :param file_path: A pickled prediction model (of type ClassifierModel), or a pickled feature extractor
+    :return: The feature extractor (with an "extract_feature_point" method)
+    """
+    with open(file_path, "rb") as f:
+        loaded = pickle.load(f)
+    return getattr(loaded, "feat_extractor", loaded)
+
+
+def open_session(directory):
+    """
+    :param directory: A session directory, or a directory of CSV files written by the GUI demonstration
+    :return: [Session]
+    """
+    if exists(join(directory, SessionWriter.header_name)):
+        return load_session(directory)
+    return load_csv_session(directory)
+
+
+def labelled_repetitions(session, use_imu=False, buffer_period=2):
+    """
+        Rebuild windows of synchronized samples, for each repetition of a movement (consecutive samples of a movement
+            label, > 0), as collected by online training.
+
+    :param session: A Session
+    :param use_imu: Include ACC and GYRO samples (of each device) in windows
+    :param buffer_period: With two devices, how many of the first few seconds are ignored (see "synchronized_rows")
+    :return: [list] (label, arrays) of each repetition, in order, arrays -> [EMG (N, 8 per device)], or
+                [EMG, ACC (N, 3 per device), GYRO (N, 3 per device)]
+    """
+    bands = [session.bands[band_name] for band_name in SessionWriter.band_names if session.num_samples(band_name) > 0]
+    if len(bands) == 0:
+        return []
+
+    if len(bands) == 2:
+        rows = list(synchronized_rows(bands[0]["time"], bands[1]["time"], session.mapping, buffer_period))
+    else:
+        rows = [np.arange(session.num_samples(SessionWriter.band_names[0]))]
+
+    labels  = session.label_timeline.labels_at(np.asarray(bands[0]["time"][rows[0]], dtype=np.float64))
+    bounds  = np.concatenate(([0], np.flatnonzero(np.diff(labels)) + 1, [labels.shape[0]]))
+
+    repetitions = []
+    for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        if labels[start] <= 0:
+            continue    # Rest, or unlabelled samples
+
+        arrays = [np.hstack([np.asarray(band["emg"][band_rows[start:end]], dtype=np.float64)
+                             for band, band_rows in zip(bands, rows)])]
+        if use_imu:
+            imu = [np.asarray(band["imu"][np.asarray(band["imu_index"][band_rows[start:end]])],
+                              dtype=np.float64) / session.imu_scales for band, band_rows in zip(bands, rows)]
+            arrays.append(np.hstack([samples[:, 4:7] for samples in imu]))
+            arrays.append(np.hstack([samples[:, 7:10] for samples in imu]))
+
+        repetitions.append((int(labels[start]), arrays))
+    return repetitions
+
+
+def save_features(file_path, features, labels):
+    """
+    :param file_path: A .npz (NumPy) file to create
+    :param features: Features of each repetition, shape (N, number of features)
+    :param labels: Label of each repetition, shape (N,)
+    """
+    np.savez(file_path, features=features, labels=labels)
+
+
+def load_features(file_path):
+    """
+    :param file_path: A file written by "save_features"
+    :return: (features, labels), e.g. for "ClassifierModel.update_training(features, labels, epochs)"
+    """
+    with np.load(file_path) as contents:
+        return contents["features"], contents["labels"]
+
+
+def extract_sessions(directories, feat_extractor, refine, output_dir, use_imu=False, buffer_period=2,
+                     max_workers=None, progress=None, cache=None):
+    """
+        Refine each labelled repetition of sessions, and extract their features (repetitions of all sessions are
+            processed by a single pool of worker processes, see "RepetitionPool", with a bounded number of
+            repetitions in flight).
+
+    :param directories: A list of session directories (or directories of CSV files, see "open_session")
+    :param feat_extractor: A feature extractor (with an "extract_feature_point" method)
+    :param refine: A refinement function (see "pool.process_repetition")
+    :param output_dir: Directory of the files written, "<session directory name>.npz" per session (see "save_features")
+    :param use_imu: Include ACC and GYRO samples in windows (as with "use_imu" during online training)
+    :param buffer_period: With two devices, how many of the first few seconds are ignored (see "synchronized_rows")
+    :param max_workers: Number of worker processes (None: number of CPUs)
+    :param progress: If not None, a function called with (directory, file written, number of repetitions used, total)
+    :param cache: A FeatureCache, only repetitions not processed before are refined/have features extracted
+    :return: [list] Files written, for each session
+    """
+    if not exists(output_dir):
+        os.makedirs(output_dir)
+
+    file_paths = []
+
+    def write(directory, futures):
+        processed   = [future.result() for future in futures]
+        processed   = [result for result in processed if result is not None]
+        features    = np.array([result[1] for result in processed], dtype=np.float64)
+        labels      = np.array([result[0] for result in processed], dtype=np.int64)
+
+        file_path   = join(output_dir, basename(abspath(directory)) + ".npz")
+        save_features(file_path, features, labels)
+        file_paths.append(file_path)
+
+        if progress is not None:
+            progress(directory, file_path, len(processed), len(futures))
+
+    with RepetitionPool(feat_extractor, refine, max_workers, cache) as pool:
+        # Sessions are loaded one at a time, submitting a repetition blocks while the pool is busy (see
+        # "RepetitionPool"), and each session is written once its repetitions are processed (in order)
+        pending = deque()
+        for directory in directories:
+            repetitions = labelled_repetitions(open_session(directory), use_imu, buffer_period)
+            futures     = [pool.submit(label, arrays) for label, arrays in repetitions]
+            del repetitions
+            pending.append((directory, futures))
+
+            while (len(pending) > 0) and all(future.done() for future in pending[0][1]):
+                write(*pending.popleft())
+
+        while len(pending) > 0:
+            write(*pending.popleft())
+
+    return file_paths
@@ -0,0 +1,228 @@
+import multiprocessing
+import os
+import pickle
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+import numpy as np
+
+from pymyolinux.train.cache import extractor_key, repetition_key
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None    # Python < 3.8, repetitions are processed in the calling process
+
+# Feature extractor and refinement function of a worker process (see "init_worker")
+worker_state = {}
+
+
+def process_repetition(refine, feat_extractor, label, arrays):
+    """
+        Refine the start/end of a movement performed (in a repetition), and extract its features.
+
+    :param refine: A function of (list of EMG samples, start index, end index) -> (best start, best end), either None if
+                    no movement is found, e.g. "ninaeval.utils.gt_tools.refine_start_end"
+    :param feat_extractor: A feature extractor (with an "extract_feature_point" method)
+    :param label: Label of the movement performed
+    :param arrays: A list of EMG samples (N, number of channels), and optionally ACC and GYRO samples (N, ...)
+    :return: (label, features), None if the movement was not found
+    """
+    emg_samples = arrays[0]
+    if emg_samples.shape[0] < 2:
+        return None
+
+    best_start, best_end = refine(emg_samples.tolist(), 0, emg_samples.shape[0] - 1)
+    if (best_start is None) or (best_end is None):
+        return None
+
+    window = [samples[best_start:best_end] for samples in arrays]
+    return label, feat_extractor.extract_feature_point(window if len(window) > 1 else window[0]).reshape(-1)
+
+
+def init_worker(refine, pickled_extractor):
+    """
+    :param refine: The refinement function (see "process_repetition")
+    :param pickled_extractor: The pickled feature extractor, loaded once per worker process
+    """
+    worker_state["refine"]          = refine
+    worker_state["feat_extractor"]  = pickle.loads(pickled_extractor)
+
+
+def run_task(label, window):
+    """
+        Process a repetition in a worker process.
+
+    :param label: Label of the movement performed
+    :param window: A window of samples (with a "load" method returning a list of arrays, e.g. SharedWindow)
+    :return: See "process_repetition"
+    """
+    return process_repetition(worker_state["refine"], worker_state["feat_extractor"], label, window.load())
+
+
+class SharedWindow():
+    """
+        A window of samples (EMG, optionally ACC and GYRO) copied into a shared memory block, so that only the name of
+            the block is pickled when passed to a worker process.
+    """
+
+    def __init__(self, arrays):
+        """
+        :param arrays: A list of arrays of samples, each of shape (N, ...)
+        """
+        arrays          = [np.asarray(samples, dtype=np.float64).reshape(len(samples), -1) for samples in arrays]
+        joined          = np.hstack(arrays)
+        self.shape      = joined.shape
+        self.splits     = np.cumsum([samples.shape[1] for samples in arrays])[:-1].tolist()
+        self.shm        = shared_memory.SharedMemory(create=True, size=max(joined.nbytes, 1))
+        self.name       = self.shm.name
+        np.ndarray(self.shape, dtype=np.float64, buffer=self.shm.buf)[:] = joined
+
+    def __getstate__(self):
+        return {"name": self.name, "shape": self.shape, "splits": self.splits, "shm": None}
+
+    def load(self):
+        """
+        :return: [list] A copy of each array of samples
+        """
+        shm = shared_memory.SharedMemory(name=self.name)
+        try:
+            joined = np.array(np.ndarray(self.shape, dtype=np.float64, buffer=shm.buf))
+        finally:
+            shm.close()
+        return np.split(joined, self.splits, axis=1)
+
+    def release(self):
+        """
+            Free the shared memory block (by the process that created it, once the window is processed).
+        """
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+
+class RepetitionPool():
+    """
+        Refines repetitions and extracts their features (see "process_repetition") in worker processes, so that
+            repetitions are processed on all cores.
+
+            > Windows are passed to workers through shared memory, the feature extractor is only pickled once per
+                worker. Results are returned as Futures, gather them in submission order (see "map").
+            > At most "max_in_flight" repetitions are queued/processed at a time, "submit" blocks until one is done
+                (bounding the shared memory held by windows).
+            > Without multiprocessing.shared_memory (Python < 3.8), or with a single worker, repetitions are
+                processed in the calling thread.
+            > With a FeatureCache, repetitions processed before (same samples, label, extractor and refinement
+                function) are not processed again.
+    """
+
+    def __init__(self, feat_extractor, refine, max_workers=None, cache=None, max_in_flight=None):
+        """
+        :param feat_extractor: A feature extractor (with an "extract_feature_point" method)
+        :param refine: The refinement function (see "process_repetition"), must be importable by worker processes
+        :param max_workers: Number of worker processes (None: number of CPUs)
+        :param cache: A FeatureCache (None: no caching)
+        :param max_in_flight: Number of repetitions queued/processed at a time (None: twice the number of workers)
+        """
+        self.feat_extractor = feat_extractor
+        self.refine         = refine
+        self.max_workers    = (os.cpu_count() or 1) if max_workers is None else max_workers
+        self.cache          = cache
+        self.extractor_id   = None if cache is None else extractor_key(feat_extractor, refine)
+        self.executor       = None
+        self.in_flight      = threading.BoundedSemaphore(2 * self.max_workers if max_in_flight is None
+                                                         else max(max_in_flight, 1))
+
+        if (shared_memory is not None) and (self.max_workers > 1):
+            # Avoid forking the calling process (threads, Qt), workers start from scratch
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                mp_context=multiprocessing.get_context("spawn"),
+                                                initializer=init_worker,
+                                                initargs=(refine, pickle.dumps(feat_extractor)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+
+    def submit(self, label, arrays):
+        """
+        :param label: Label of the movement performed
+        :param arrays: A list of EMG samples (N, number of channels), and optionally ACC and GYRO samples (N, ...)
+        :return: [Future] (label, features), None if the movement was not found (see "process_repetition")
+        """
+        key = None
+        if self.cache is not None:
+            key         = repetition_key(self.extractor_id, label, arrays)
+            features    = self.cache.get(key)
+            if features is not None:
+                future = Future()
+                future.set_result(None if features.size == 0 else (label, features))
+                return future
+
+        if self.executor is None:
+            future = Future()
+            try:
+                future.set_result(process_repetition(self.refine, self.feat_extractor, label,
+                                                     [np.asarray(samples) for samples in arrays]))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            self.in_flight.acquire()
+            try:
+                window = SharedWindow(arrays)
+                try:
+                    future = self.executor.submit(run_task, label, window)
+                except Exception:
+                    window.release()
+                    raise
+            except Exception:
+                self.in_flight.release()
+                raise
+            future.add_done_callback(partial(self.finish, window))
+
+        if key is not None:
+            future.add_done_callback(partial(self.store, key))
+        return future
+
+    def finish(self, window, future):
+        """
+            Release the shared memory of a processed (or cancelled) repetition, and its in-flight slot.
+
+        :param window: The SharedWindow of the repetition
+        :param future: The (done) Future of the repetition
+        """
+        window.release()
+        self.in_flight.release()
+
+    def store(self, key, future):
+        """
+            Cache the features of a processed repetition.
+
+        :param key: Content address of the repetition (see "repetition_key")
+        :param future: The (done) Future of the repetition
+        """
+        if future.cancelled() or (future.exception() is not None):
+            return
+
+        processed = future.result()
+        try:
+            self.cache.put(key, None if processed is None else processed[1])
+        except OSError:
+            pass    # Caching is best effort
+
+    def map(self, repetitions):
+        """
+        :param repetitions: An iterable of (label, arrays) of each repetition (see "submit")
+        :return: [list] (label, features) of each repetition (in order), None if the movement was not found
+        """
+        return [future.result() for future in [self.submit(label, arrays) for label, arrays in repetitions]]
+
+    def shutdown(self, wait=True):
+        """
+        :param wait: Wait for submitted repetitions to be processed
+        """
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait)
@@ -0,0 +1,5 @@
+import sys
+from os.path import abspath, dirname, join
+
+# GUI demonstration modules import each other by name (as when run from gui_demo)
+sys.path.insert(0, join(dirname(dirname(abspath(__file__))), "gui_demo"))
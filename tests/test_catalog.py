@@ -0,0 +1,30 @@
+from os.path import join
+
+import numpy as np
+
+from pymyolinux.session import SessionWriter
+from pymyolinux.session.catalog import summarize_session
+from pymyolinux.session.format import Session
+
+
+def test_label_counts_match_samples(tmp_path):
+    path        = join(str(tmp_path), "session")
+    num_samples = 400
+    times       = 100 + np.arange(num_samples) * 0.005
+
+    writer = SessionWriter(path, base_time=0.0)
+    for band_num in (1, 2):
+        writer.append_band(band_num, times, np.zeros((num_samples, 8), dtype=np.int8), np.arange(num_samples) // 4,
+                           times[::4], np.zeros((num_samples // 4, 10), dtype=np.int16))
+    # Transitions fall exactly on sample timestamps, and between samples
+    writer.append_labels([times[10], times[100], times[250] + 0.001, times[300]], [0, 2, 0, 3])
+    writer.append_mapping(np.arange(num_samples))
+    writer.set_state(SessionWriter.STATE_FINALIZED)
+    writer.close()
+
+    session         = Session(path)
+    labels, counts  = np.unique(session.label_timeline.labels_at(session.bands["band_1"]["time"]),
+                                return_counts=True)
+    summary         = summarize_session(path)
+    assert summary["labels"] == dict(zip(labels.tolist(), counts.tolist()))
+    assert summary["labels"] == {-1: 10, 0: 90 + 49, 2: 151, 3: 100}
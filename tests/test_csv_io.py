@@ -0,0 +1,120 @@
+import io
+import numpy as np
+import pytest
+
+from pymyolinux.session import LabelTimeline, Session
+from pymyolinux.session import csv_io
+from pymyolinux.session.csv_io import IMU_SCALES, label_transitions
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_label_transitions_match_timeline(seed):
+    rng     = np.random.default_rng(seed)
+    num     = int(rng.integers(0, 2000))
+    labels  = np.repeat(rng.integers(-1, 5, num // 20 + 1), rng.integers(1, 40, num // 20 + 1))[:num]
+    times   = np.cumsum(rng.uniform(0, 0.01, num)) + rng.normal(0, 0.002, num)     # Not always increasing
+
+    timeline = LabelTimeline()
+    for timestamp, label in zip(times.tolist(), labels.tolist()):
+        timeline.record(timestamp, label)
+
+    timestamps, transitions = label_transitions(times, labels)
+    assert timestamps.tolist() == timeline.timestamps
+    assert transitions.tolist() == timeline.labels
+
+
+
+#
+# Rows as formatted before "format_rows", one sample at a time ("write_single" and the synchronized file loop of
+# DataTools.save_clicked, from per-sample lists of labels and scaled IMU values)
+#
+def baseline_single_rows(band, base_time):
+    rows = []
+    for index in range(len(band["timestamps"])):
+        emg_list    = [x[index] for x in band["emg"]]
+        orient_list = [x[index] for x in band["orient"]]
+        accel_list  = [x[index] for x in band["accel"]]
+        gyro_list   = [x[index] for x in band["gyro"]]
+        rows.append("{:.4f},{},{},{},{},{},{},{},{},{},{:.4f},{:.4f},{:.4f},{:.4f},{:.4f},{:.4f},{:.4f},{:.4f},"
+                    "{:.4f},{:.4f}\n".format(band["timestamps"][index] - base_time, band["labels"][index],
+                                             *(emg_list + orient_list + accel_list + gyro_list)))
+    return "".join(rows)
+
+
+def baseline_all_rows(band_1, band_2, data_mapping, base_time, buffer_period, invalid_map):
+    start_time      = max(band_1["timestamps"][0], band_2["timestamps"][0]) + buffer_period
+    min_first_dist  = float("inf")
+    first_idx       = None
+    for i, time in enumerate(band_1["timestamps"]):
+        if abs(start_time - time) < min_first_dist:
+            min_first_dist  = abs(start_time - time)
+            first_idx       = i
+
+    rows = []
+    for first_offset in range(first_idx, len(band_1["timestamps"])):
+        second_offset = data_mapping[first_offset]
+        if (second_offset == invalid_map) or (second_offset >= len(band_2["timestamps"])):
+            continue
+
+        values = [band_1["timestamps"][first_offset] - base_time, band_2["timestamps"][second_offset] - base_time,
+                  band_1["labels"][first_offset]]
+        for band, offset in ((band_1, first_offset), (band_2, second_offset)):
+            values += [x[offset] for x in band["emg"] + band["orient"] + band["accel"] + band["gyro"]]
+        rows.append("{:.4f},{:.4f},{},{},{},{},{},{},{},{},{},{:.4f},{:.4f},{:.4f},{:.4f},{:.4f},{:.4f},"
+                    "{:.4f},{:.4f},{:.4f},{:.4f},{},{},{},{},{},{},{},{},{:.4f},{:.4f},{:.4f},{:.4f},{:.4f},"
+                    "{:.4f},{:.4f},{:.4f},{:.4f},{:.4f}\n".format(*values))
+    return "".join(rows)
+
+
+def synthetic_device(rng, start_time, num_samples):
+    """
+    :return: (arrays, as passed to write_single_csv, LabelTimeline, per-sample lists, as collected before arrays)
+    """
+    times       = start_time + np.cumsum(rng.uniform(0.001, 0.01, num_samples))
+    labels      = np.repeat(rng.integers(-1, 6, num_samples), rng.integers(1, 100, num_samples))[:num_samples]
+    emg         = rng.integers(-128, 128, (num_samples, 8)).astype(np.int8)
+    imu_index   = np.sort(rng.integers(0, num_samples // 4 + 1, num_samples))
+    imu         = rng.integers(-32768, 32768, (num_samples // 4 + 1, 10)).astype(np.int16)
+
+    label_timeline = LabelTimeline()
+    for timestamp, label in zip(times.tolist(), labels.tolist()):
+        label_timeline.record(timestamp, label)
+
+    scales  = IMU_SCALES.tolist()
+    samples = imu[imu_index].tolist()
+    lists   = {
+                "timestamps":   times.tolist(),
+                "labels":       labels.tolist(),
+                "emg":          [emg[:, i].tolist() for i in range(8)],
+                "orient":       [[sample[i] / scales[i] for sample in samples] for i in range(0, 4)],
+                "accel":        [[sample[i] / scales[i] for sample in samples] for i in range(4, 7)],
+                "gyro":         [[sample[i] / scales[i] for sample in samples] for i in range(7, 10)]
+            }
+    return {"time": times, "emg": emg, "imu_index": imu_index, "imu": imu}, label_timeline, lists
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_csv_rows_match_baseline(seed, monkeypatch):
+    rng = np.random.default_rng(seed)
+    monkeypatch.setattr(csv_io, "ROWS_PER_BLOCK", int(rng.integers(1, 700)))     # Rows span several blocks
+
+    base_time                   = 1.7e9 + rng.uniform(0, 1e6)
+    band_1, timeline_1, lists_1 = synthetic_device(rng, base_time + rng.uniform(0, 1), int(rng.integers(500, 3000)))
+    band_2, timeline_2, lists_2 = synthetic_device(rng, base_time + rng.uniform(0, 1), int(rng.integers(500, 3000)))
+    num_rows_1                  = band_1["time"].shape[0]
+
+    # Files of a single device
+    for band, label_timeline, lists in ((band_1, timeline_1, lists_1), (band_2, timeline_2, lists_2)):
+        fd = io.StringIO()
+        csv_io.write_single_csv(fd, band, label_timeline, base_time)
+        assert fd.getvalue() == baseline_single_rows(lists, base_time)
+
+    # Synchronized file (unsynchronized samples, and samples not yet received from the second device, are skipped)
+    data_mapping = rng.integers(0, band_2["time"].shape[0] + 50, num_rows_1)
+    data_mapping[rng.random(num_rows_1) < 0.2] = Session.invalid_map
+
+    rows_1, rows_2  = csv_io.synchronized_rows(band_1["time"], band_2["time"], data_mapping, 0.5)
+    fd              = io.StringIO()
+    csv_io.write_all_csv(fd, band_1, band_2, rows_1, rows_2, timeline_1, base_time)
+    assert fd.getvalue() == baseline_all_rows(lists_1, lists_2, data_mapping.tolist(), base_time, 0.5,
+                                              Session.invalid_map)
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from features import TimeDomainFeatures
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_incremental_features_match_windows(seed):
+    rng = np.random.default_rng(seed)
+
+    # 10 random extractors per seed (window lengths, thresholds, histogram ranges narrower than samples)
+    for i in range(10):
+        window          = int(rng.integers(3, 300))
+        extractor       = TimeDomainFeatures(window, zc_threshold=int(rng.integers(0, 20)),
+                                             ssc_threshold=int(rng.integers(0, 200)),
+                                             hist_bins=int(rng.integers(1, 20)), hist_range=(-100, 100))
+        num_channels    = int(rng.integers(1, 17))
+        samples         = rng.integers(-128, 128, (int(rng.integers(1, 3 * window + 50)), num_channels))
+        assert extractor.features() is None
+
+        # Samples arrive in blocks of random sizes (empty blocks, and blocks longer than a window, included)
+        sizes           = rng.integers(0, max(window // 2, 2), samples.shape[0])
+        long_blocks     = rng.random(samples.shape[0]) < 0.05
+        sizes[long_blocks] = rng.integers(window, 2 * window, np.count_nonzero(long_blocks))
+        ends            = np.cumsum(sizes)
+        ends            = ends[ends < samples.shape[0]].tolist() + [samples.shape[0]]
+
+        start = 0
+        for end in ends:
+            extractor.update(samples[start:end])
+            start = end
+            if end == 0:
+                continue
+
+            expected = extractor.extract_feature_point(samples[max(end - window, 0):end])
+            np.testing.assert_array_equal(extractor.features(), expected)
+
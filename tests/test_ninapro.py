@@ -0,0 +1,25 @@
+from pymyolinux.session import LabelTimeline
+from pymyolinux.session.ninapro import repetition_timeline
+
+
+def timeline(transitions):
+    label_timeline = LabelTimeline()
+    for timestamp, label in transitions:
+        label_timeline.record(timestamp, label)
+    return label_timeline
+
+
+def test_repetitions_counted_per_movement():
+    repetitions = repetition_timeline(timeline([(0, 0), (1, 3), (2, 0), (3, 5), (4, 0), (5, 3), (6, -1)]))
+    assert repetitions.labels_at([0.5, 1.5, 2.5, 3.5, 4.5, 5.5, 6.5]).tolist() == [0, 1, 0, 1, 0, 2, 0]
+
+
+def test_pause_continues_repetition():
+    # Pausing the ground truth helper mid-movement labels samples as -1, the movement then resumes
+    repetitions = repetition_timeline(timeline([(0, 0), (1, 3), (2, -1), (3, 3), (4, 0), (5, 3), (6, -1), (7, 3)]))
+    assert repetitions.labels_at([0.5, 1.5, 2.5, 3.5, 4.5, 5.5, 6.5, 7.5]).tolist() == [0, 1, 0, 1, 0, 2, 0, 2]
+
+
+def test_movement_change_after_pause():
+    repetitions = repetition_timeline(timeline([(1, 3), (2, -1), (3, 4), (4, -1), (5, 3)]))
+    assert repetitions.labels_at([1.5, 2.5, 3.5, 4.5, 5.5]).tolist() == [1, 0, 1, 0, 2]
@@ -0,0 +1,85 @@
+import threading
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from scipy.signal import lfilter
+
+from signal_processing import PreprocessingStage, StreamingFilter
+
+
+def random_blocks(rng, num_samples, max_block):
+    """
+    :return: [list] Block boundaries (including empty blocks), from 0 to num_samples
+    """
+    ends = np.cumsum(rng.integers(0, max_block + 1, num_samples))
+    return [0] + ends[ends < num_samples].tolist() + [num_samples]
+
+
+def synthetic_myo_data(rng, num_samples):
+    """
+    :return: The attributes of a MyoData object used by PreprocessingStage (band_1/band_2 EMG samples and timestamps,
+                a synchronization mapping with unsynchronized samples)
+    """
+    bands = []
+    for i in range(2):
+        emg = rng.integers(-128, 128, (num_samples, 8))
+        bands.append(SimpleNamespace(timestamps=np.cumsum(rng.uniform(0.004, 0.006, num_samples)).tolist(),
+                                     emg=[emg[:, ch].tolist() for ch in range(8)]))
+
+    data_mapping = np.minimum(np.arange(num_samples) + rng.integers(-3, 4, num_samples), num_samples + 5)
+    data_mapping[(data_mapping < 0) | (rng.random(num_samples) < 0.1)] = -1
+    return SimpleNamespace(band_1=bands[0], band_2=bands[1], data_mapping=data_mapping.tolist(), invalid_map=-1,
+                           num_synchronized=0, sync_condition=threading.Condition())
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_streaming_filter_matches_lfilter(seed):
+    rng             = np.random.default_rng(seed)
+    samples         = rng.integers(-128, 128, (int(rng.integers(1, 2000)), 16)).astype(np.float64)
+    emg_filter      = StreamingFilter()
+    b, a            = emg_filter.b, emg_filter.a
+    blocks          = random_blocks(rng, samples.shape[0], 60)
+
+    for start, end in zip(blocks[:-1], blocks[1:]):
+        emg_filter.update(samples[start:end])
+    np.testing.assert_allclose(emg_filter.filtered, lfilter(b, a, np.abs(samples), axis=0), rtol=0, atol=1e-9)
+
+    # Filtering without keeping samples (non-empty blocks, as passed by PreprocessingStage)
+    emg_filter  = StreamingFilter()
+    filtered    = []
+    for start, end in zip(blocks[:-1], blocks[1:]):
+        if end > start:
+            filtered.append(emg_filter.filter(samples[start:end]))
+    np.testing.assert_allclose(np.concatenate(filtered), lfilter(b, a, np.abs(samples), axis=0), rtol=0, atol=1e-9)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_envelope_matches_lfilter_from_origin(seed):
+    rng         = np.random.default_rng(seed)
+    num_samples = int(rng.integers(50, 1500))
+    myo_data    = synthetic_myo_data(rng, num_samples)
+    stage       = PreprocessingStage(myo_data, max_rows=None if seed % 2 else int(rng.integers(20, 200)))
+    b, a        = stage.emg_filter.b, stage.emg_filter.a
+    order       = max(len(a), len(b)) - 1
+
+    # Samples are synchronized (and processed) in random blocks
+    for num_synchronized in random_blocks(rng, num_samples, 40)[1:]:
+        stage.process(num_synchronized)
+
+        # Filter states at the origin are recovered from the rows preceding it (unless all rows are kept)
+        min_origin = 0 if stage.first_row == 0 else stage.first_row + order
+        if stage.num_rows <= min_origin:
+            continue
+        emg     = stage.get("emg", stage.first_row)
+        origin  = int(rng.integers(min_origin, stage.num_rows))
+        start   = int(rng.integers(origin, stage.num_rows))
+        end     = int(rng.integers(start, stage.num_rows + 1))
+
+        expected = lfilter(b, a, np.abs(emg[origin - stage.first_row:]), axis=0)
+        np.testing.assert_allclose(stage.envelope(start, end, origin), expected[start - origin:end - origin],
+                                   rtol=0, atol=1e-8)
+
+    # From the first synchronized sample, the envelope is the filtered signal of all rows
+    if stage.first_row == 0:
+        np.testing.assert_allclose(stage.get("envelope", 0), lfilter(b, a, np.abs(stage.get("emg", 0)), axis=0),
+                                   rtol=0, atol=1e-9)
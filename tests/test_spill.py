@@ -0,0 +1,40 @@
+import gc
+from os.path import exists, join
+
+from pymyolinux.session import SpillList
+from pymyolinux.session import spill
+
+
+def spilled_list(directory, name, num_items=100, keep=10):
+    column = SpillList(join(str(directory), name), "int64")
+    column.extend(range(num_items))
+    column.spill(keep)
+    return column
+
+
+def test_spill_list(tmp_path):
+    column = spilled_list(tmp_path, "a.bin")
+    assert len(column) == 100
+    assert column[5] == 5 and column[95] == 95
+    assert column[85:95] == list(range(85, 95))
+    assert spill.as_array(column).tolist() == list(range(100))
+
+
+def test_close_removes_file(tmp_path):
+    column = spilled_list(tmp_path, "a.bin")
+    spill.close(column)
+    gc.collect()
+    assert not exists(join(str(tmp_path), "a.bin"))
+
+
+def test_close_keeps_file_for_views(tmp_path):
+    # Snapshots (views) captured before the column is released remain readable
+    column  = spilled_list(tmp_path, "a.bin")
+    view    = spill.frozen(column)
+    column.close()
+    assert exists(join(str(tmp_path), "a.bin"))
+    assert spill.as_array(view).tolist() == list(range(100))
+
+    del view
+    gc.collect()
+    assert not exists(join(str(tmp_path), "a.bin"))
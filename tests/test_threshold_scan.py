@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+
+from signal_processing import NoiseModel, StreamingFilter, threshold_scan
+
+
+def loop_scan(filt_data, first_idx, window_size, smooth_avg, smooth_std, h, min_samples, max_err, detect_start,
+              cur_count, err_count):
+    """
+        The threshold algorithm testing one sample at a time (as detect_movement did before "threshold_scan").
+    """
+    max_idx     = filt_data.shape[0] - 1
+    cur_idx     = first_idx
+    start_idx   = None
+    max_count   = 0
+
+    while (start_idx is None) and (cur_idx <= max_idx):
+        cur_test_func = (np.mean(filt_data[cur_idx - window_size: cur_idx], axis=0) - smooth_avg) / smooth_std
+
+        success = np.any(np.greater(cur_test_func, h))
+        if not detect_start:
+            success = not success
+
+        if success:
+            cur_count += 1
+        else:
+            err_count += 1
+
+        if err_count >= max_err:
+            err_count = 0
+            cur_count = 0
+
+        if (cur_count + err_count) > max_count:
+            max_count = cur_count + err_count
+
+        if max_count >= min_samples:
+            start_idx = cur_idx - min_samples + 1
+        else:
+            cur_idx += 1
+
+    if start_idx is not None:
+        return start_idx, 0, 0
+    return None, cur_count, err_count
+
+
+def synthetic_session(rng, num_samples=3000, num_channels=16):
+    """
+    :return: (noise samples, EMG samples with movement bursts), of a simulated recording
+    """
+    noise   = rng.normal(0, 3, (1000, num_channels)).round()
+    emg     = rng.normal(0, 3, (num_samples, num_channels))
+    for i in range(rng.integers(1, 6)):
+        start       = rng.integers(0, num_samples - 100)
+        duration    = rng.integers(50, 600)
+        channels    = rng.random(num_channels) < 0.5
+        emg[start:start + duration, channels] *= rng.uniform(2, 15)
+    return noise, np.clip(emg.round(), -128, 127)
+
+
+def detect(filt_data, scan, smooth_avg, smooth_std, h, window_size, min_samples, max_err, detect_start, chunks):
+    """
+        Scan samples as they arrive (in chunks, counts carried between calls), as detect_movement does.
+
+    :return: [list] (index, cur_count, err_count) after each chunk
+    """
+    results     = []
+    cur_count   = 0
+    err_count   = 0
+    cur_idx     = window_size
+    for end in chunks:
+        index, cur_count, err_count = scan(filt_data[:end], cur_idx, window_size, smooth_avg, smooth_std, h,
+                                           min_samples, max_err, detect_start, cur_count, err_count)
+        results.append((index, cur_count, err_count))
+        if index is not None:
+            break
+        cur_idx = max(cur_idx, end)
+    return results
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_threshold_scan_matches_loop(seed):
+    rng             = np.random.default_rng(seed)
+    noise, emg      = synthetic_session(rng)
+    noise_model     = NoiseModel()
+    noise_model.update(noise, StreamingFilter().filter(noise))
+    filt_data       = StreamingFilter().update(emg)
+
+    h               = rng.uniform(1, 6)
+    window_size     = int(rng.integers(10, 80))
+    min_samples     = int(rng.integers(20, 250))
+    max_err         = int(rng.integers(1, 30))
+    chunks          = np.cumsum(rng.integers(1, 120, 200))
+    chunks          = chunks[chunks <= emg.shape[0]].tolist() + [emg.shape[0]]
+
+    for detect_start in (True, False):
+        expected    = detect(filt_data, loop_scan, noise_model.smooth_avg, noise_model.smooth_std, h, window_size,
+                             min_samples, max_err, detect_start, chunks)
+        actual      = detect(filt_data, threshold_scan, noise_model.smooth_avg, noise_model.smooth_std, h,
+                             window_size, min_samples, max_err, detect_start, chunks)
+        assert actual == expected
+
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+@pytest.mark.parametrize("first_idx", [0, 1, 5, 30])
+def test_threshold_scan_short_windows(first_idx):
+    # Windows reaching before the first sample follow Python slicing (e.g. empty windows never succeed)
+    rng         = np.random.default_rng(first_idx)
+    filt_data   = np.abs(rng.normal(0, 10, (60, 4)))
+    for detect_start in (True, False):
+        for cur_count, err_count in ((0, 0), (3, 2), (10, 4)):
+            expected    = loop_scan(filt_data, first_idx, 20, 2.0, 1.5, 2, 25, 5, detect_start, cur_count, err_count)
+            actual      = threshold_scan(filt_data, first_idx, 20, 2.0, 1.5, 2, 25, 5, detect_start, cur_count,
+                                         err_count)
+            assert actual == expected